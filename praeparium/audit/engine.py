@@ -3,6 +3,8 @@ from pathlib import Path
 from typing import Dict, Any, List
 import yaml
 
+from ..qa.packs import discover as discover_packs
+
 # Method pack filenames expected to live in the same folder as the bundle
 REQUIRED_METHOD_FILES: Dict[str, str] = {
     "objectives": "objectives.yaml",
@@ -91,6 +93,11 @@ def audit_bundle(bundle_path: str | Path) -> Dict[str, Any]:
             # Encourage explicit pack list even if empty
             if "domain_validation_packs" not in req:
                 results["warnings"].append("requirements.yaml: domain_validation_packs missing")
+            else:
+                known = discover_packs()
+                for name in req.get("domain_validation_packs") or []:
+                    if name not in known:
+                        results["errors"].append(f"requirements.yaml: unknown domain validation pack '{name}'")
 
     # ---- deployment.yaml sanity
     if "deployment" in files:
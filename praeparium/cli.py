@@ -1,31 +1,124 @@
 from __future__ import annotations
-import typer, os
+import typer, os, time
 from .sop3.render import render_bundle
-from .qa.checks import audit_path
+from .audit.engine import audit_bundle
+from .qa.cache import QAResultCache
+from .qa.claims import check_claims
+from .qa.report import QAReport
+from .qa.checks import audit_path, iter_markdown, ruleset_digest
+from .qa.dupes import SignatureCache, find_duplicate_sections
+from .qa.linkindex import SlugIndex
+from .qa.packs import PackRunner, discover as discover_packs
+from .qa.style import run_style_checks, score_corpus
 from .writer import write_from_sourcepack  # NEW
+from .llm.cache import ResponseCache
+from .llm.batch import expand_sourcepacks, generate_batch, is_batch_spec
+from .serve import Worker, serve_socket, serve_stdio
+from .sop3.engine import DEFAULT_MODULE_DIR, get_engine
 
 app = typer.Typer(help="Praeparium content automation CLI")
 
 @app.command("bundle-generate")
-def bundle_generate(plan: str, out: str = "out"):
+def bundle_generate(
+    plan: str,
+    out: str = "out",
+    no_cache: bool = typer.Option(False, "--no-cache", help="Bypass the LLM response cache entirely."),
+    refresh: bool = typer.Option(False, "--refresh", help="Ignore cached responses but store fresh ones."),
+    concurrency: int = typer.Option(4, help="Max in-flight model requests in batch mode."),
+    rpm: float = typer.Option(0, help="Requests-per-minute limit in batch mode (0 = unlimited)."),
+    tpm: float = typer.Option(0, help="Tokens-per-minute limit in batch mode (0 = unlimited)."),
+    retries: int = typer.Option(4, help="Max attempts per model call (transient errors only)."),
+    hedge: bool = typer.Option(False, "--hedge", help="Fire a second request when a call outlives the p95 latency."),
+    stream: bool = typer.Option(False, "--stream", help="Stream a single Source Pack to <slug>.md.partial and abort early on fatal QA."),
+    template_report: bool = typer.Option(False, "--template-report", help="Print per-template compile/render timings (bundle YAML only)."),
+    incremental: bool = typer.Option(False, "--incremental", help="Re-render only bundle items whose inputs changed since the last build in OUT."),
+    jobs: int = typer.Option(1, "--jobs", "-j", help="Worker processes for bundle rendering."),
+):
     """
     If 'plan' ends with .json, treat it as a Source Pack and generate a single article.
+    If 'plan' is a directory or glob of Source Packs, generate them concurrently.
     Otherwise treat as YAML bundle with items[] and render templates.
     """
     ext = os.path.splitext(plan)[1].lower()
-    if ext == ".json":
-        ok = write_from_sourcepack(plan, out)
+    if is_batch_spec(plan):
+        paths = expand_sourcepacks(plan)
+        if not paths:
+            typer.echo(f"No Source Packs matched {plan}")
+            raise typer.Exit(code=1)
+        cache = ResponseCache(enabled=not no_cache, refresh=refresh)
+        started = time.monotonic()
+        results = generate_batch(paths, out, concurrency=concurrency,
+                                 rpm=rpm or None, tpm=tpm or None, cache=cache,
+                                 max_retries=retries, hedge=hedge)
+        failed = [p for p, good in results.items() if not good]
+        for p in failed:
+            typer.echo(f" - failed: {p}")
+        elapsed = time.monotonic() - started
+        typer.echo(f"{len(results) - len(failed)}/{len(results)} article(s) generated in {elapsed:.1f}s "
+                   f"({len(results) / max(elapsed, 1e-9):.2f}/s); {cache.summary()}")
+        ok = not failed
+    elif ext == ".json":
+        cache = ResponseCache(enabled=not no_cache, refresh=refresh)
+        ok = write_from_sourcepack(plan, out, cache=cache, stream=stream,
+                                   retries=retries, hedge=hedge)
+        typer.echo(cache.summary())
     else:
-        ok = render_bundle(plan, out)
+        ok = render_bundle(plan, out, incremental=incremental, jobs=jobs)
+        if template_report:
+            typer.echo(get_engine().report())
 
     if not ok:
         raise typer.Exit(code=1)
     typer.echo(f"✅ Generated to {out}")
 
 @app.command("qa-report")
-def qa_report(path: str = "out"):
-    """Run QA checks over generated markdown files."""
-    failed = audit_path(path)
+def qa_report(
+    path: str = "out",
+    jobs: int = typer.Option(1, "--jobs", "-j", help="Check files in this many processes."),
+    no_cache: bool = typer.Option(False, "--no-cache", help="Re-check every file, ignoring cached results."),
+    style: bool = typer.Option(False, "--style", help="Also run the style gate (run_style_checks) on every file."),
+    claims: str = typer.Option("", "--claims", help="Also check every file's claims against this Source Pack."),
+    bundle: str = typer.Option("", "--bundle", help="Also audit the methodology files next to this bundle YAML."),
+    jsonl: str = typer.Option("", "--jsonl", help="Write per-file, per-check results and timings as JSON Lines."),
+    junit: str = typer.Option("", "--junit", help="Write the results as JUnit XML."),
+    top: int = typer.Option(10, "--top", help="Slowest checks/files kept in the report summary."),
+    timings: bool = typer.Option(False, "--timings", help="Print the slowest checks and files."),
+):
+    """
+    Run QA checks over generated markdown files (recursively). Results are
+    cached per file content and ruleset under PRAEPARIUM_QA_CACHE_DIR
+    (default .praeparium/cache/qa), so unchanged files are not re-checked.
+    """
+    report = QAReport(top=top)
+    cache = QAResultCache(ruleset_digest(), enabled=not no_cache)
+    failed = audit_path(path, jobs=jobs, cache=cache, report=report)
+    if style or claims:
+        for p in iter_markdown(path):
+            with open(p, "r", encoding="utf-8") as f:
+                md = f.read()
+            errs = []
+            if style:
+                errs += report.timed("style", p, "style", lambda: _style_errors(md))
+            if claims:
+                errs += report.timed("claims", p, "claims", lambda: check_claims(md, claims))
+            if errs:
+                failed[p] = failed.get(p, []) + errs
+    if bundle:
+        started = time.perf_counter()
+        audit = audit_bundle(bundle)
+        report.add("bundle", audit["bundle"], "methodology", time.perf_counter() - started,
+                   audit["errors"], warnings=audit["warnings"])
+        if audit["errors"]:
+            failed[bundle] = audit["errors"]
+    if jsonl:
+        report.write_jsonl(jsonl)
+        typer.echo(f"[OK] Wrote {jsonl}")
+    if junit:
+        report.write_junit(junit)
+        typer.echo(f"[OK] Wrote {junit}")
+    if timings:
+        for line in report.timing_lines():
+            typer.echo(line)
     if failed:
         typer.echo("❌ QA failures detected:")
         for f, errs in failed.items():
@@ -33,3 +126,149 @@ def qa_report(path: str = "out"):
                 typer.echo(f" - {f}: {e}")
         raise typer.Exit(code=2)
     typer.echo("✅ QA passed")
+
+def _style_errors(md: str) -> list:
+    verdict = run_style_checks(md)
+    return [] if verdict["qa_pass"] else verdict["notes"]
+
+@app.command("qa-dupes")
+def qa_dupes(
+    path: str = "out",
+    threshold: float = typer.Option(0.8, "--threshold", help="Minimum estimated Jaccard similarity to report."),
+    limit: int = typer.Option(50, "--limit", help="Show at most this many pairs (0 = all)."),
+    no_cache: bool = typer.Option(False, "--no-cache", help="Re-shingle every file, ignoring cached signatures."),
+):
+    """
+    Report near-duplicate sections (split at H2) across markdown files using
+    MinHash/LSH. Signatures are cached per file content under
+    PRAEPARIUM_DUPES_CACHE_DIR (default .praeparium/cache/dupes).
+    """
+    cache = SignatureCache(enabled=not no_cache)
+    pairs = find_duplicate_sections(path, iter_markdown(path), threshold=threshold, cache=cache)
+    for p in pairs[:limit or None]:
+        typer.echo(f" - {p.similarity:.2f} {p.a.path}:{p.a.line} \"{p.a.title}\" ~ "
+                   f"{p.b.path}:{p.b.line} \"{p.b.title}\"")
+    if limit and len(pairs) > limit:
+        typer.echo(f"   ... {len(pairs) - limit} more")
+    if pairs:
+        typer.echo(f"[WARN] {len(pairs)} near-duplicate section pair(s) at similarity >= {threshold}")
+    else:
+        typer.echo("✅ No near-duplicate sections")
+
+@app.command("qa-links")
+def qa_links(
+    path: str = "out",
+    manifest: str = typer.Option("", "--manifest", help="Also load slugs and links from an exported site-manifest.json (or its directory)."),
+    bundle: str = typer.Option("", "--bundle", help="Also count the slugs planned in this bundle YAML as existing."),
+    sourcepacks: str = typer.Option("", "--sourcepacks", help="Also count Source Pack slugs (file, directory or glob) as existing."),
+):
+    """
+    Resolve every internal link in the markdown files under PATH against
+    the slugs of those files plus any manifest/bundle/Source Packs given,
+    and report dangling links and orphan pages.
+    """
+    started = time.perf_counter()
+    index = SlugIndex()
+    if manifest:
+        index.add_manifest(manifest)
+    if bundle:
+        index.add_bundle(bundle)
+    if sourcepacks:
+        for sp in expand_sourcepacks(sourcepacks):
+            index.add_sourcepack(sp)
+    report = index.resolve(path if os.path.isdir(path) else os.path.dirname(path) or ".", iter_markdown(path))
+    for slug in report.orphans:
+        typer.echo(f"[WARN] Orphan page (no inbound internal links): {slug}")
+    typer.echo(f"[QA] {report.links} internal link(s) across {report.pages} known page(s) resolved "
+               f"in {time.perf_counter() - started:.2f}s")
+    if report.dangling:
+        typer.echo("❌ Dangling internal links:")
+        for f, line, target in report.dangling:
+            typer.echo(f" - {f}:{line}: {target}")
+        raise typer.Exit(code=2)
+    typer.echo("✅ All internal links resolve")
+
+@app.command("qa-packs")
+def qa_packs(
+    path: str = "out",
+    packs: str = typer.Option("", "--packs", help="Comma-separated pack names (default: every discovered pack)."),
+    requirements: str = typer.Option("", "--requirements", help="Take the packs from this requirements.yaml's domain_validation_packs."),
+):
+    """
+    Run domain validation packs (praeparium/qa/packs, plus the
+    praeparium.validation_packs entry points) over markdown files. Each pack
+    only runs on files that contain one of its trigger keywords.
+    """
+    names = [n.strip() for n in packs.split(",") if n.strip()] or None
+    if requirements:
+        import yaml
+        with open(requirements, "r", encoding="utf-8-sig") as f:
+            names = list((yaml.safe_load(f) or {}).get("domain_validation_packs") or [])
+    try:
+        runner = PackRunner(names)
+    except KeyError as e:
+        typer.echo(f"[FAIL] {e.args[0]}; available: {', '.join(discover_packs()) or 'none'}")
+        raise typer.Exit(code=1)
+    failed = runner.run_corpus(iter_markdown(path))
+    typer.echo(runner.report())
+    if failed:
+        typer.echo("❌ Domain validation failures:")
+        for f, by_pack in failed.items():
+            for pack, errs in by_pack.items():
+                for e in errs:
+                    typer.echo(f" - {f} [{pack}]: {e}")
+        raise typer.Exit(code=2)
+    typer.echo("✅ Domain validation passed")
+
+@app.command("style-report")
+def style_report(
+    path: str = "out",
+    out: str = typer.Option("", "--out", help="Write the per-article metrics table (.csv, or .jsonl)."),
+):
+    """Score readability/style for every markdown file and summarise the corpus."""
+    started = time.perf_counter()
+    result = score_corpus(iter_markdown(path), out=out or None)
+    s = result["summary"]
+    if not s["files"]:
+        typer.echo(f"[WARN] No .md files found in {path}")
+        return
+    for col in ("fk_grade", "active_voice_ratio", "narrative_style_score"):
+        typer.echo(f"{col}: mean {s[col]['mean']:.2f}, p50 {s[col]['p50']:.2f}, p90 {s[col]['p90']:.2f}")
+    if out:
+        typer.echo(f"[OK] Wrote {out}")
+    typer.echo(f"✅ Scored {s['files']} file(s) in {time.perf_counter() - started:.2f}s; "
+               f"{s['pass_rate']:.0%} pass the style gate")
+
+@app.command("templates-compile")
+def templates_compile(
+    target: str = typer.Argument(DEFAULT_MODULE_DIR, help="Directory for the compiled template modules."),
+):
+    """
+    Precompile the sop3 templates into importable modules. Rendering picks
+    them up from PRAEPARIUM_TEMPLATE_MODULES (default .praeparium/templates_compiled)
+    while they match the template sources.
+    """
+    started = time.perf_counter()
+    n = get_engine().compile_to(target)
+    typer.echo(f"✅ Compiled {n} template(s) to {target} in {time.perf_counter() - started:.2f}s")
+
+@app.command("serve")
+def serve(
+    socket: str = typer.Option("", "--socket", help="Listen on this Unix socket instead of stdin/stdout."),
+):
+    """
+    Run a long-lived worker that accepts generate/render/qa/export jobs as
+    JSON lines (see praeparium/serve.py), keeping clients and templates warm.
+    """
+    worker = Worker()
+    typer.echo(worker.warm(), err=True)
+    try:
+        if socket:
+            typer.echo(f"[OK] Listening on {socket}", err=True)
+            serve_socket(worker, socket)
+        else:
+            serve_stdio(worker)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        worker.close()
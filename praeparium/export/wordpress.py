@@ -2,6 +2,10 @@
 from __future__ import annotations
 import argparse, datetime as dt, html, json, os, pathlib, re, sys
 
+from ..qa.document import Document
+from ..qa.linkindex import MANIFEST_NAME, internal_targets, site_manifest
+from ..utils.outputs import OutputWriter
+
 # Optional dependency: python-markdown
 try:
     import markdown  # pip install markdown
@@ -76,36 +80,44 @@ def export_dir(src: str, out: str, base_url: str | None = None) -> int:
         return 0
 
     written = 0
-    for md_path in md_files:
-        md_text = _read_text(md_path)
-
-        # Title & slug
-        title = _first_h1(md_text) or md_path.stem.replace("-", " ").title()
-        slug = md_path.stem
-
-        # Optional author/published from footer patterns (non-fatal if missing)
-        author = None
-        published = None
-
-        # Look for a simple “By NAME” line:
-        m_author = re.search(r"^_?By\s+(.+?)[._]?$", md_text, flags=re.I | re.M)
-        if m_author:
-            author = m_author.group(1).strip()
-
-        # ISO date in the doc (first match)
-        m_date = re.search(r"\b(20\d{2}-\d{2}-\d{2})\b", md_text)
-        if m_date:
-            published = m_date.group(1)
-
-        body_html = _md_to_html(md_text)
-        jsonld = _mk_jsonld(title, slug, base_url, author, published)
-        html_text = HTML_SHELL.format(title=html.escape(title), jsonld=jsonld, body=body_html)
-
-        out_file = out_p / f"{slug}.html"
-        out_file.write_text(html_text, encoding="utf-8")
-        print(f"[OK] {out_file}")
-        written += 1
-
+    pages = {}
+    # Unchanged pages keep their mtime, so a site sync only uploads real changes
+    with OutputWriter() as output:
+        for md_path in md_files:
+            md_text = _read_text(md_path)
+
+            # Title & slug
+            title = _first_h1(md_text) or md_path.stem.replace("-", " ").title()
+            slug = md_path.stem
+
+            # Optional author/published from footer patterns (non-fatal if missing)
+            author = None
+            published = None
+
+            # Look for a simple “By NAME” line:
+            m_author = re.search(r"^_?By\s+(.+?)[._]?$", md_text, flags=re.I | re.M)
+            if m_author:
+                author = m_author.group(1).strip()
+
+            # ISO date in the doc (first match)
+            m_date = re.search(r"\b(20\d{2}-\d{2}-\d{2})\b", md_text)
+            if m_date:
+                published = m_date.group(1)
+
+            body_html = _md_to_html(md_text)
+            jsonld = _mk_jsonld(title, slug, base_url, author, published)
+            html_text = HTML_SHELL.format(title=html.escape(title), jsonld=jsonld, body=body_html)
+
+            out_file = out_p / f"{slug}.html"
+            status = output.write_text(out_file, html_text)
+            print(f"[OK] {out_file}" + (" (unchanged)" if status == "unchanged" else ""))
+            pages[slug] = {"title": title, "file": out_file.name,
+                           "links": internal_targets(Document.parse(md_text))}
+            written += 1
+
+        # Slugs and internal links of the exported site, for qa-links --manifest
+        output.write_text(out_p / MANIFEST_NAME, site_manifest(pages, base_url))
+    print(f"[WRITE] {output.summary()}")
     return written
 
 def main(argv=None) -> int:
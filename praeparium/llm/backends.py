@@ -0,0 +1,427 @@
+# praeparium/llm/backends.py
+from __future__ import annotations
+import asyncio, hashlib, http.client, json, os, random, socket, threading, time, urllib.parse
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterator, List, Optional
+
+# OpenAI Python SDK >= 1.0
+try:
+    from openai import OpenAI, AsyncOpenAI  # pip install openai
+except Exception:
+    OpenAI = None
+    AsyncOpenAI = None
+
+DEFAULT_BASE_URL = "https://api.openai.com/v1"
+
+
+@dataclass
+class Completion:
+    text: str
+    usage: Dict[str, Any] = field(default_factory=dict)
+
+
+class BackendError(Exception):
+    """Upstream error carrying the HTTP status and response headers, if any."""
+
+    def __init__(self, message: str, status_code: Optional[int] = None,
+                 headers: Optional[Dict[str, str]] = None):
+        super().__init__(message)
+        self.status_code = status_code
+        self.headers = {k.lower(): v for k, v in (headers or {}).items()}
+
+
+class Backend:
+    """
+    Chat-completion backend used by the writer. Subclasses implement
+    ``complete`` and ``stream``; ``acomplete`` defaults to a worker thread.
+    """
+
+    name = "base"
+    # Identifies the upstream for per-endpoint bookkeeping (circuit breakers)
+    endpoint = "base"
+
+    def complete(self, model: str, messages: List[Dict[str, str]], **params) -> Completion:
+        raise NotImplementedError
+
+    def stream(self, model: str, messages: List[Dict[str, str]], **params) -> "ChunkStream":
+        raise NotImplementedError
+
+    async def acomplete(self, model: str, messages: List[Dict[str, str]], **params) -> Completion:
+        return await asyncio.to_thread(self.complete, model, messages, **params)
+
+    async def arelease(self) -> None:
+        """Drop clients bound to the running event loop; sync clients stay warm."""
+
+    async def aclose(self) -> None:
+        await self.arelease()
+        self.close()
+
+    def close(self) -> None:
+        pass
+
+
+class ChunkStream:
+    """Iterator of text deltas whose ``close()`` cancels the upstream request."""
+
+    def __init__(self, chunks: Iterator[str], on_close=None):
+        self._chunks = chunks
+        self._on_close = on_close
+
+    def __iter__(self) -> Iterator[str]:
+        return self._chunks
+
+    def close(self) -> None:
+        if self._on_close:
+            self._on_close()
+            self._on_close = None
+
+
+# -----------------------------
+# OpenAI SDK
+# -----------------------------
+class OpenAIBackend(Backend):
+    name = "openai"
+
+    def __init__(self, api_key: str, organization: Optional[str] = None,
+                 base_url: Optional[str] = None):
+        kwargs: Dict[str, Any] = {"api_key": api_key}
+        if organization:
+            kwargs["organization"] = organization
+        if base_url:
+            kwargs["base_url"] = base_url
+        self._kwargs = kwargs
+        self.endpoint = base_url or DEFAULT_BASE_URL
+        self._client = None
+        self._aclient = None
+
+    @property
+    def client(self):
+        if self._client is None:
+            self._client = OpenAI(**self._kwargs)
+        return self._client
+
+    def complete(self, model, messages, **params) -> Completion:
+        resp = self.client.chat.completions.create(model=model, messages=messages, **params)
+        text = resp.choices[0].message.content if resp and resp.choices else ""
+        return Completion(text or "", _usage_dict(getattr(resp, "usage", None)))
+
+    def stream(self, model, messages, **params) -> ChunkStream:
+        sdk_stream = self.client.chat.completions.create(
+            model=model, messages=messages, stream=True, **params
+        )
+
+        def chunks():
+            for chunk in sdk_stream:
+                delta = chunk.choices[0].delta.content if chunk.choices else None
+                if delta:
+                    yield delta
+
+        return ChunkStream(chunks(), getattr(sdk_stream, "close", None))
+
+    async def acomplete(self, model, messages, **params) -> Completion:
+        if self._aclient is None:
+            self._aclient = AsyncOpenAI(**self._kwargs)
+        resp = await self._aclient.chat.completions.create(model=model, messages=messages, **params)
+        text = resp.choices[0].message.content if resp and resp.choices else ""
+        return Completion(text or "", _usage_dict(getattr(resp, "usage", None)))
+
+    async def arelease(self) -> None:
+        if self._aclient is not None:
+            await self._aclient.close()
+            self._aclient = None
+
+    def close(self) -> None:
+        if self._client is not None:
+            self._client.close()
+            self._client = None
+
+
+def _usage_dict(usage: Any) -> Dict[str, Any]:
+    if usage is None:
+        return {}
+    if isinstance(usage, dict):
+        return usage
+    if hasattr(usage, "model_dump"):
+        return usage.model_dump()
+    return dict(getattr(usage, "__dict__", {}) or {})
+
+
+# -----------------------------
+# OpenAI-compatible HTTP (stdlib only)
+# -----------------------------
+class HTTPBackend(Backend):
+    """
+    Minimal OpenAI-compatible client on ``http.client``. Works against the
+    real API, any compatible gateway, or the bundled stand-in server.
+    With ``keepalive`` each thread reuses one persistent connection for
+    non-streaming calls instead of reconnecting per request.
+    """
+
+    name = "http"
+
+    def __init__(self, base_url: str = DEFAULT_BASE_URL, api_key: Optional[str] = None,
+                 timeout: float = 600.0, keepalive: bool = True):
+        u = urllib.parse.urlsplit(base_url)
+        self.scheme = u.scheme or "http"
+        self.host = u.hostname or "127.0.0.1"
+        self.port = u.port
+        self.path = u.path.rstrip("/") + "/chat/completions"
+        self.api_key = api_key
+        self.timeout = timeout
+        self.keepalive = keepalive
+        self.endpoint = f"{self.scheme}://{self.host}:{self.port or ''}{self.path}"
+        self._local = threading.local()
+        self._pooled: set = set()
+        self._pool_lock = threading.Lock()
+
+    def _connect(self) -> http.client.HTTPConnection:
+        cls = http.client.HTTPSConnection if self.scheme == "https" else http.client.HTTPConnection
+        return cls(self.host, self.port, timeout=self.timeout)
+
+    def _pooled_conn(self) -> http.client.HTTPConnection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = self._connect()
+            conn.connect()
+            conn.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            with self._pool_lock:
+                self._pooled.add(conn)
+        return conn
+
+    def _release(self, conn: http.client.HTTPConnection) -> None:
+        conn.close()
+        if getattr(self._local, "conn", None) is conn:
+            self._local.conn = None
+        with self._pool_lock:
+            self._pooled.discard(conn)
+
+    def _post(self, body: Dict[str, Any], pooled: bool = False):
+        headers = {"Content-Type": "application/json"}
+        if self.api_key:
+            headers["Authorization"] = f"Bearer {self.api_key}"
+        payload = json.dumps(body).encode("utf-8")
+        while True:
+            reused = pooled and getattr(self._local, "conn", None) is not None
+            conn = self._pooled_conn() if pooled else self._connect()
+            try:
+                conn.request("POST", self.path, body=payload, headers=headers)
+                resp = conn.getresponse()
+            except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError,
+                    http.client.ImproperConnectionState):
+                self._release(conn)
+                if reused:
+                    continue  # stale or half-used keep-alive connection; reconnect once
+                raise
+            except BaseException:
+                # A timeout mid-request leaves the connection unusable; never pool it again
+                self._release(conn)
+                raise
+            break
+        if resp.status >= 400:
+            detail = resp.read().decode("utf-8", "replace")[:500]
+            self._release(conn)
+            raise BackendError(f"HTTP {resp.status}: {detail}", resp.status, dict(resp.getheaders()))
+        return conn, resp
+
+    def complete(self, model, messages, **params) -> Completion:
+        conn, resp = self._post({"model": model, "messages": messages, **params}, pooled=self.keepalive)
+        try:
+            data = json.loads(resp.read().decode("utf-8"))
+        except BaseException:
+            self._release(conn)
+            raise
+        if not self.keepalive or resp.will_close:
+            self._release(conn)
+        choices = data.get("choices") or []
+        text = choices[0].get("message", {}).get("content", "") if choices else ""
+        return Completion(text or "", data.get("usage") or {})
+
+    def stream(self, model, messages, **params) -> ChunkStream:
+        conn, resp = self._post({"model": model, "messages": messages, "stream": True, **params})
+
+        def chunks():
+            # Server-sent events: "data: {json}\n\n", terminated by "data: [DONE]"
+            for raw in resp:
+                line = raw.decode("utf-8").strip()
+                if not line.startswith("data:"):
+                    continue
+                payload = line[5:].strip()
+                if payload == "[DONE]":
+                    break
+                choices = json.loads(payload).get("choices") or []
+                delta = choices[0].get("delta", {}).get("content") if choices else None
+                if delta:
+                    yield delta
+
+        return ChunkStream(chunks(), conn.close)
+
+    def close(self) -> None:
+        with self._pool_lock:
+            conns, self._pooled = list(self._pooled), set()
+        for conn in conns:
+            conn.close()
+        self._local = threading.local()
+
+
+# -----------------------------
+# In-process fake
+# -----------------------------
+def synthetic_article(messages: List[Dict[str, str]], words: int = 600) -> str:
+    """
+    Deterministic QA-shaped Markdown derived from the request content: H1,
+    several H2s, inline citations, a table, Preparedness Notes and Sources.
+    """
+    blob = json.dumps(messages, sort_keys=True)
+    rng = random.Random(hashlib.sha256(blob.encode("utf-8")).hexdigest())
+    title = "Synthetic Preparedness Article"
+    user = next((m["content"] for m in messages if m.get("role") == "user"), "")
+    marker = '"title":'
+    if marker in user:
+        tail = user.split(marker, 1)[1].strip()
+        if tail.startswith('"'):
+            title = tail[1:].split('"', 1)[0] or title
+    vocab = ("water storage rotation container gallons family plan ladder week "
+             "bleach filter label shelf cool dark sealed daily person").split()
+    sections = ["How We Chose", "The Water Time Ladder (72h → 2w → 30d+)",
+                "Step-by-Step", "Preparedness Notes", "FAQs"]
+    per = max(20, words // len(sections))
+    out = [f"# {title}", "", "> A short, plain summary for readers planning ahead.", ""]
+    for i, h in enumerate(sections):
+        out += [f"## {h}", ""]
+        body = " ".join(rng.choice(vocab) for _ in range(per))
+        out += [body.capitalize() + f". [Source: Ref{i % 3 + 1}]", ""]
+        if i == 0:
+            out += ["| Option | Capacity (L) | Rotation |", "|---|---|---|",
+                    "| Jug | 19 | 6–12 months |", "| Drum | 208 | 12 months |", ""]
+    out += ["## Sources", "",
+            "- [Emergency Water Storage](https://www.cdc.gov/healthywater/emergency/index.html)",
+            "- [Water Supply Guidance](https://www.ready.gov/water)", ""]
+    return "\n".join(out)
+
+
+class PrefixCacheSim:
+    """
+    Mimics provider prompt caching for offline runs: the longest prefix shared
+    with the previous prompt counts as cached once it reaches 1024 tokens,
+    in 128-token steps (OpenAI's published behaviour).
+    """
+
+    def __init__(self):
+        self._last = ""
+
+    def usage(self, messages: List[Dict[str, str]], text: str) -> Dict[str, Any]:
+        prompt_text = "\n".join(m.get("content", "") for m in messages)
+        shared = 0
+        for a, b in zip(self._last, prompt_text):
+            if a != b:
+                break
+            shared += 1
+        self._last = prompt_text
+        cached = (shared // 4) // 128 * 128
+        if cached < 1024:
+            cached = 0
+        prompt = len(prompt_text) // 4
+        completion = len(text) // 4
+        return {"prompt_tokens": prompt, "completion_tokens": completion,
+                "total_tokens": prompt + completion,
+                "prompt_tokens_details": {"cached_tokens": min(cached, prompt)}}
+
+
+class FakeBackend(Backend):
+    """
+    Deterministic in-process backend: returns ``synthetic_article`` (or a
+    fixed ``text``) after ``latency`` ± ``jitter`` seconds, failing with a
+    simulated 500/429 at ``error_rate``/``rate_limit_rate``.
+    """
+
+    name = "fake"
+    endpoint = "fake"
+
+    def __init__(self, text: Optional[str] = None, latency: float = 0.0, jitter: float = 0.0,
+                 error_rate: float = 0.0, rate_limit_rate: float = 0.0, seed: int = 0,
+                 chunk_size: int = 64):
+        self.text = text
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.chunk_size = chunk_size
+        self._rng = random.Random(seed)
+        self._prefix = PrefixCacheSim()
+        self.calls = 0
+
+    def _delay(self) -> float:
+        return max(0.0, self.latency + self._rng.uniform(-self.jitter, self.jitter))
+
+    def _maybe_fail(self) -> None:
+        roll = self._rng.random()
+        if roll < self.rate_limit_rate:
+            raise BackendError("HTTP 429: simulated rate limit", 429, {"retry-after": "0.1"})
+        if roll < self.rate_limit_rate + self.error_rate:
+            raise BackendError("HTTP 500: simulated upstream error", 500)
+
+    def _reply(self, messages) -> Completion:
+        text = self.text if self.text is not None else synthetic_article(messages)
+        return Completion(text, self._prefix.usage(messages, text))
+
+    def complete(self, model, messages, **params) -> Completion:
+        self.calls += 1
+        time.sleep(self._delay())
+        self._maybe_fail()
+        return self._reply(messages)
+
+    async def acomplete(self, model, messages, **params) -> Completion:
+        self.calls += 1
+        await asyncio.sleep(self._delay())
+        self._maybe_fail()
+        return self._reply(messages)
+
+    def stream(self, model, messages, **params) -> ChunkStream:
+        self.calls += 1
+        self._maybe_fail()
+        text = self._reply(messages).text
+        n = max(1, len(text) // self.chunk_size)
+        pause = self._delay() / n
+
+        def chunks():
+            for i in range(0, len(text), self.chunk_size):
+                if pause:
+                    time.sleep(pause)
+                yield text[i:i + self.chunk_size]
+
+        return ChunkStream(chunks())
+
+
+# -----------------------------
+# Selection
+# -----------------------------
+def get_backend(name: Optional[str] = None) -> Optional[Backend]:
+    """
+    Build the backend named by ``name`` or ``PRAEPARIUM_BACKEND``
+    (openai | http | fake; default openai). Returns None after printing
+    the reason when it cannot be configured.
+    """
+    name = (name or os.getenv("PRAEPARIUM_BACKEND") or "openai").strip().lower()
+    base_url = os.getenv("PRAEPARIUM_LLM_BASE_URL") or None
+
+    if name == "fake":
+        return FakeBackend(latency=float(os.getenv("PRAEPARIUM_FAKE_LATENCY", "0") or 0))
+
+    api_key = os.getenv("OPENAI_API_KEY")
+    if name == "http":
+        if not base_url and not api_key:
+            print("[FAIL] OPENAI_API_KEY not set in environment.")
+            return None
+        return HTTPBackend(base_url or DEFAULT_BASE_URL, api_key=api_key)
+
+    if name != "openai":
+        print(f"[FAIL] Unknown backend: {name} (expected openai, http or fake)")
+        return None
+    if OpenAI is None:
+        print("[FAIL] OpenAI SDK not installed. Run: pip install openai")
+        return None
+    if not api_key:
+        print("[FAIL] OPENAI_API_KEY not set in environment.")
+        return None
+    org_id = os.getenv("OPENAI_ORG_ID") or os.getenv("OPENAI_ORGANIZATION")
+    return OpenAIBackend(api_key, organization=org_id, base_url=base_url)
@@ -0,0 +1,164 @@
+# praeparium/llm/batch.py
+from __future__ import annotations
+import asyncio, glob, os, time
+from typing import Dict, List, Optional
+
+from .. import writer
+from ..utils.outputs import OutputWriter
+from .backends import Backend, get_backend
+from .cache import ResponseCache
+from .resilience import CircuitOpenError, ResilientBackend, RetryPolicy
+from .throttle import RateLimiter, estimate_tokens, retry_after_seconds
+
+# Rough allowance for the completion when reserving TPM budget up front
+COMPLETION_TOKENS_ESTIMATE = 2500
+# Re-check interval while another task holds the breaker's half-open trial
+CIRCUIT_POLL_S = 0.5
+
+
+def expand_sourcepacks(spec: str) -> List[str]:
+    """
+    Resolve a directory, glob or single path into a sorted list of Source Pack
+    files. Underscore-prefixed files (e.g. _TEMPLATE.json) are skipped.
+    """
+    if os.path.isdir(spec):
+        paths = glob.glob(os.path.join(spec, "*.json"))
+    else:
+        paths = glob.glob(spec)
+    return sorted(p for p in paths if not os.path.basename(p).startswith("_"))
+
+
+def is_batch_spec(spec: str) -> bool:
+    return os.path.isdir(spec) or glob.has_magic(spec)
+
+
+async def _generate_one(backend: ResilientBackend, req: Dict, out_dir: str, cache: ResponseCache,
+                        limiter: RateLimiter, sem: asyncio.Semaphore,
+                        max_retries: int, output: OutputWriter) -> bool:
+    path = req["path"]
+    prompt_tokens = sum(estimate_tokens(m["content"]) for m in req["messages"])
+    est = prompt_tokens + COMPLETION_TOKENS_ESTIMATE
+
+    async with sem:
+        attempt = -1
+        while True:
+            await limiter.acquire(est)
+            started = time.monotonic()
+            try:
+                resp = await backend.acomplete(req["model"], req["messages"], **writer.SAMPLING_PARAMS)
+            except CircuitOpenError:
+                # Not an attempt: wait for the breaker's trial call to settle it.
+                # Every reopen costs some task a real attempt, so this ends.
+                limiter.settle(est, 0)
+                wait = max(backend.breaker.retry_in(), CIRCUIT_POLL_S)
+                print(f"[WARN] Circuit open on {path}; retrying in {wait:.1f}s")
+                await asyncio.sleep(wait)
+                continue
+            except Exception as e:
+                attempt += 1
+                limiter.settle(est, 0)
+                wait = retry_after_seconds(e)
+                if wait is None or attempt == max_retries:
+                    print(f"[FAIL] {backend.name} call failed for {path}: {e}")
+                    return False
+                print(f"[WARN] Rate limited on {path}; retrying in {wait:.1f}s")
+                limiter.pause(wait)
+                continue
+            elapsed = time.monotonic() - started
+            limiter.settle(est, resp.usage.get("total_tokens"))
+            writer.record_usage(req, resp.usage, "model", elapsed)
+            print(f"[OK] {path} generated in {elapsed:.1f}s")
+            break
+
+    text = resp.text
+    if not writer.response_ok(text):
+        return False
+    cache.put(req["key"], text, meta={"model": req["model"], "sourcepack": path})
+    # Committed immediately so finished articles land while others are in flight
+    writer.finish_article(text, req["sp"], out_dir, output=output)
+    output.commit()
+    return True
+
+
+async def generate_batch_async(paths: List[str], out_dir: str, concurrency: int = 4,
+                               rpm: Optional[float] = None, tpm: Optional[float] = None,
+                               cache: Optional[ResponseCache] = None,
+                               max_retries: int = 5,
+                               backend: Optional[Backend] = None,
+                               hedge: bool = False) -> Dict[str, bool]:
+    """
+    Generate one article per Source Pack concurrently on a single pooled
+    backend (``get_backend()`` by default), at most ``concurrency`` requests in flight and
+    throttled to ``rpm`` requests / ``tpm`` tokens per minute.
+    Cached responses are post-processed straight away without a client.
+
+    Transient failures are retried per request by a ResilientBackend; 429s
+    are left to the batch loop so the shared limiter can pause every task.
+    While the endpoint's circuit breaker is open, tasks wait for it to let
+    a trial call through instead of failing their article.
+    A ``backend`` passed in stays open (only its loop-bound clients are
+    released), so long-lived callers can reuse it across batches.
+
+    Articles go through one OutputWriter; cache hits are committed (and
+    fsynced) together, and a new/changed/unchanged summary closes the run.
+    """
+    if cache is None:
+        cache = ResponseCache()
+    with OutputWriter() as output:
+        results = await _generate_all(paths, out_dir, concurrency, rpm, tpm, cache,
+                                      max_retries, backend, hedge, output)
+    print(f"[WRITE] {output.summary()}")
+    return results
+
+
+async def _generate_all(paths: List[str], out_dir: str, concurrency: int,
+                        rpm: Optional[float], tpm: Optional[float], cache: ResponseCache,
+                        max_retries: int, backend: Optional[Backend], hedge: bool,
+                        output: OutputWriter) -> Dict[str, bool]:
+    results: Dict[str, bool] = {}
+    pending = []
+    for p in paths:
+        req = writer.prepare_request(p)
+        if req is None:
+            results[p] = False
+            continue
+        text = cache.get(req["key"])
+        if text is not None:
+            print(f"[CACHE] Hit for {p}")
+            writer.record_usage(req, None, "cache")
+            writer.finish_article(text, req["sp"], out_dir, output=output)
+            results[p] = True
+        else:
+            pending.append(req)
+    output.commit()
+
+    if not pending:
+        return results
+
+    owned = backend is None
+    backend = backend or get_backend()
+    if backend is None:
+        results.update({r["path"]: False for r in pending})
+        return results
+    if not isinstance(backend, ResilientBackend):
+        backend = ResilientBackend(backend, policy=RetryPolicy(retry_rate_limits=False), hedge=hedge)
+
+    limiter = RateLimiter(rpm=rpm, tpm=tpm)
+    sem = asyncio.Semaphore(max(1, concurrency))
+
+    async def run(req):
+        return req["path"], await _generate_one(backend, req, out_dir, cache, limiter, sem,
+                                              max_retries, output)
+
+    try:
+        for fut in asyncio.as_completed([run(r) for r in pending]):
+            path, ok = await fut
+            results[path] = ok
+    finally:
+        await (backend.aclose() if owned else backend.arelease())
+    print(f"[TIMING] {backend.latency_summary()}")
+    return results
+
+
+def generate_batch(paths: List[str], out_dir: str, **kwargs) -> Dict[str, bool]:
+    return asyncio.run(generate_batch_async(paths, out_dir, **kwargs))
@@ -0,0 +1,182 @@
+# praeparium/llm/cache.py
+from __future__ import annotations
+import hashlib, json, os, pathlib, time
+from typing import Any, Dict, Optional
+
+# Bump when the key layout changes so stale entries are never served.
+CACHE_KEY_VERSION = 1
+
+DEFAULT_CACHE_DIR = os.path.join(".praeparium", "cache", "llm")
+DEFAULT_MAX_MB = 512
+DEFAULT_MAX_AGE_DAYS = 30
+# Full directory sweep (expiry, resync of the size total) every N writes
+EVICT_EVERY = 256
+# An over-budget store is trimmed to this share of max_bytes, not just under it
+EVICT_LOW_WATER = 0.9
+
+
+def _sha256(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def canonical_json(obj: Any) -> str:
+    """Stable JSON form (sorted keys, no whitespace) used for hashing."""
+    return json.dumps(obj, ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+
+
+def cache_key(model: str, params: Dict[str, Any], system_msg: str,
+              prompt_template: str, sourcepack: Dict[str, Any]) -> str:
+    """
+    Content address for one completion request. Covers the model name,
+    sampling params, the system message, the prompt template and the
+    canonicalised Source Pack.
+    """
+    parts = {
+        "v": CACHE_KEY_VERSION,
+        "model": model,
+        "params": params,
+        "system": _sha256(system_msg),
+        "prompt": _sha256(prompt_template),
+        "pack": _sha256(canonical_json(sourcepack)),
+    }
+    return _sha256(canonical_json(parts))
+
+
+class ResponseCache:
+    """
+    Persistent on-disk store of model responses, one JSON file per key.
+
+    Entries created more than ``max_age_s`` ago are treated as misses and
+    removed. Age counts from the ``created`` time stored in the entry; hits
+    do not extend it.
+
+    When the store grows past ``max_bytes`` the least recently used
+    entries (by mtime, refreshed on every hit) are evicted. The store's size
+    is kept as a running total, so a write only sweeps the directory every
+    EVICT_EVERY writes or once the total goes over budget. A sweep also
+    drops entries idle for longer than ``max_age_s``: since mtime is never
+    older than ``created``, those are expired either way.
+    """
+
+    def __init__(self, root: Optional[str] = None, max_bytes: Optional[int] = None,
+                 max_age_s: Optional[float] = None, enabled: bool = True,
+                 refresh: bool = False):
+        self.root = pathlib.Path(root or os.getenv("PRAEPARIUM_CACHE_DIR", DEFAULT_CACHE_DIR))
+        if max_bytes is None:
+            max_bytes = int(float(os.getenv("PRAEPARIUM_CACHE_MAX_MB", DEFAULT_MAX_MB)) * 1024 * 1024)
+        if max_age_s is None:
+            max_age_s = float(os.getenv("PRAEPARIUM_CACHE_MAX_AGE_DAYS", DEFAULT_MAX_AGE_DAYS)) * 86400
+        self.max_bytes = max_bytes
+        self.max_age_s = max_age_s
+        self.enabled = enabled
+        # refresh: skip lookups but still store fresh responses
+        self.refresh = refresh
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self.evictions = 0
+        # Bytes on disk as of the last sweep plus later writes; None until the first sweep
+        self._bytes: Optional[int] = None
+        self._since_sweep = 0
+
+    def _path(self, key: str) -> pathlib.Path:
+        return self.root / key[:2] / f"{key}.json"
+
+    def get(self, key: str) -> Optional[str]:
+        if not self.enabled or self.refresh:
+            self.misses += 1
+            return None
+        p = self._path(key)
+        try:
+            st = p.stat()
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+        try:
+            with open(p, "r", encoding="utf-8") as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            # Corrupt/partial entry: drop it and fall through to the model
+            self._remove(p, st.st_size)
+            self.misses += 1
+            return None
+        created = entry.get("created", st.st_mtime)
+        if self.max_age_s and time.time() - created > self.max_age_s:
+            self._remove(p, st.st_size)
+            self.misses += 1
+            return None
+        os.utime(p, None)
+        self.hits += 1
+        return entry.get("text")
+
+    def put(self, key: str, text: str, meta: Optional[Dict[str, Any]] = None) -> None:
+        if not self.enabled:
+            return
+        p = self._path(key)
+        p.parent.mkdir(parents=True, exist_ok=True)
+        entry = {"key": key, "created": time.time(), "meta": meta or {}, "text": text}
+        data = json.dumps(entry, ensure_ascii=False).encode("utf-8")
+        try:
+            replaced = p.stat().st_size
+        except FileNotFoundError:
+            replaced = 0
+        tmp = p.with_suffix(".tmp")
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, p)
+        self.writes += 1
+        self._since_sweep += 1
+        if self._bytes is not None:
+            self._bytes += len(data) - replaced
+        if (self._bytes is None or self._since_sweep >= EVICT_EVERY
+                or (self.max_bytes and self._bytes > self.max_bytes)):
+            self.evict()
+
+    def _remove(self, p: pathlib.Path, size: int = 0) -> None:
+        try:
+            p.unlink()
+            self.evictions += 1
+        except FileNotFoundError:
+            return
+        if self._bytes is not None:
+            self._bytes -= size
+
+    def evict(self) -> None:
+        """
+        Drop entries idle past ``max_age_s``, then the least recently used
+        until under ``max_bytes`` (down to EVICT_LOW_WATER of it).
+        """
+        self._since_sweep = 0
+        if not self.root.exists():
+            self._bytes = 0
+            return
+        now = time.time()
+        entries = []
+        total = 0
+        for p in self.root.glob("*/*.json"):
+            try:
+                st = p.stat()
+            except FileNotFoundError:
+                continue
+            if self.max_age_s and now - st.st_mtime > self.max_age_s:
+                self._remove(p)
+                continue
+            entries.append((st.st_mtime, st.st_size, p))
+            total += st.st_size
+        self._bytes = total
+        if not self.max_bytes or total <= self.max_bytes:
+            return
+        entries.sort()
+        target = self.max_bytes * EVICT_LOW_WATER
+        for _, size, p in entries:
+            if self._bytes <= target:
+                break
+            self._remove(p, size)
+
+    def stats(self) -> Dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses,
+                "writes": self.writes, "evictions": self.evictions}
+
+    def summary(self) -> str:
+        s = self.stats()
+        return f"cache: {s['hits']} hit(s), {s['misses']} miss(es), {s['writes']} write(s), {s['evictions']} eviction(s)"
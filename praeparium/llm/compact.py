@@ -0,0 +1,141 @@
+# praeparium/llm/compact.py
+from __future__ import annotations
+import copy, json, os
+from typing import Any, Dict, List, Optional, Tuple
+
+from ..data.schemas.sourcepack import Product, SourceRef
+from .throttle import estimate_tokens
+
+# Top-level keys writer_prompt_v2.txt actually reads, in prompt order.
+# Everything else (pack_id, version, articles[], ...) is pipeline metadata.
+PROMPT_FIELDS = [
+    "title", "slug", "structure", "stance", "claims_checklist",
+    "quotes", "sources", "products", "comparison_columns",
+]
+
+# Schema fields that never help the model write (tracking/affiliate data)
+SOURCE_FIELDS = [f for f in SourceRef.model_fields if f not in {"accessed"}]
+PRODUCT_FIELDS = [f for f in Product.model_fields if f not in {"affiliate_urls"}]
+
+DEFAULT_PACK_TOKEN_BUDGET = 6000
+
+# Minimum items kept when trimming lists to fit the budget
+MIN_QUOTES = 2
+MIN_PRODUCTS = 3
+QUOTE_CHARS = 280
+# Product fields the article names products by; never shortened
+KEEP_PRODUCT_FIELDS = {"name", "brand"}
+
+
+def dedupe_sources(sources: List[dict]) -> List[dict]:
+    if not sources:
+        return []
+    seen: set[str] = set()
+    out: List[dict] = []
+    for s in sources:
+        key = (s.get("url") or "").strip().lower() or (s.get("title") or "").strip().lower()
+        if key and key not in seen:
+            out.append(s)
+            seen.add(key)
+    return out
+
+
+def _empty(v: Any) -> bool:
+    return v is None or v == "" or v == [] or v == {}
+
+
+def _prune(obj: Any) -> Any:
+    """Drop null/empty values recursively."""
+    if isinstance(obj, dict):
+        out = {k: _prune(v) for k, v in obj.items()}
+        return {k: v for k, v in out.items() if not _empty(v)}
+    if isinstance(obj, list):
+        return [x for x in (_prune(v) for v in obj) if not _empty(x)]
+    return obj
+
+
+def _pick(d: dict, fields: List[str]) -> dict:
+    return {k: d[k] for k in fields if k in d}
+
+
+def project_sourcepack(sp: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Project a Source Pack down to the fields the prompt uses: SourceRef and
+    Product fields from the schema (minus affiliate/tracking data), product
+    keys named in comparison_columns, deduplicated sources, no empty values.
+    """
+    out: Dict[str, Any] = {k: copy.deepcopy(sp[k]) for k in PROMPT_FIELDS if k in sp}
+
+    if out.get("sources"):
+        out["sources"] = [
+            _pick(s, SOURCE_FIELDS) if isinstance(s, dict) else s
+            for s in dedupe_sources([s for s in out["sources"] if isinstance(s, dict)])
+        ]
+
+    if out.get("products"):
+        fields = PRODUCT_FIELDS + [c for c in out.get("comparison_columns", []) if c not in PRODUCT_FIELDS]
+        out["products"] = [_pick(p, fields) if isinstance(p, dict) else p for p in out["products"]]
+
+    return _prune(out)
+
+
+def minify(obj: Any) -> str:
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":"))
+
+
+def _shorten(text: str) -> str:
+    return text[:QUOTE_CHARS].rstrip() + "…"
+
+
+def _trim_steps(pack: Dict[str, Any]):
+    """Yield (label, apply) trims from lowest to highest priority."""
+    quotes = pack.get("quotes") or []
+    for i in range(len(quotes) - 1, MIN_QUOTES - 1, -1):
+        yield f"quotes[{i}]", lambda i=i: pack["quotes"].pop(i)
+    products = pack.get("products") or []
+    for i in range(len(products) - 1, MIN_PRODUCTS - 1, -1):
+        yield f"products[{i}]", lambda i=i: pack["products"].pop(i)
+    for i, q in enumerate(pack.get("quotes") or []):
+        if isinstance(q, dict) and len(q.get("quote") or "") > QUOTE_CHARS:
+            yield f"quotes[{i}].quote", lambda q=q: q.update(quote=_shorten(q["quote"]))
+    # Long free text from comparison columns (notes, descriptions); the
+    # identifying fields stay whole
+    for i, p in enumerate(pack.get("products") or []):
+        if not isinstance(p, dict):
+            continue
+        for k, v in p.items():
+            if k not in KEEP_PRODUCT_FIELDS and isinstance(v, str) and len(v) > QUOTE_CHARS:
+                yield f"products[{i}].{k}", lambda p=p, k=k: p.update({k: _shorten(p[k])})
+    # Sources are never trimmed: citations and qa/claims match on their
+    # id, title and publisher
+
+
+def compact_sourcepack(sp: Dict[str, Any], budget: Optional[int] = None) -> Tuple[str, Dict[str, Any]]:
+    """
+    Minified, projected Source Pack JSON plus a report
+    ({"tokens", "full_tokens", "budget", "trimmed", "over_budget"}).
+    Low-priority content is trimmed until the estimate fits ``budget``
+    (PRAEPARIUM_PACK_TOKEN_BUDGET by default; 0 disables the budget).
+    """
+    if budget is None:
+        budget = int(os.getenv("PRAEPARIUM_PACK_TOKEN_BUDGET", DEFAULT_PACK_TOKEN_BUDGET))
+    pack = project_sourcepack(sp)
+    text = minify(pack)
+    tokens = estimate_tokens(text)
+    trimmed: List[str] = []
+    if budget and tokens > budget:
+        for label, apply in _trim_steps(pack):
+            apply()
+            trimmed.append(label)
+            text = minify(pack)
+            tokens = estimate_tokens(text)
+            if tokens <= budget:
+                break
+    report = {
+        "tokens": tokens,
+        "full_tokens": estimate_tokens(json.dumps(sp, ensure_ascii=False, indent=2)),
+        "budget": budget,
+        "trimmed": trimmed,
+        "over_budget": bool(budget) and tokens > budget,
+    }
+    return text, report
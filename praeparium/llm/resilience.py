@@ -0,0 +1,372 @@
+# praeparium/llm/resilience.py
+from __future__ import annotations
+import asyncio, http.client, random, threading, time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional
+
+from .backends import Backend, BackendError, ChunkStream, Completion
+from .throttle import retry_after_seconds
+
+# HTTP statuses worth retrying; other 4xx (bad request, auth) will not heal
+RETRYABLE_STATUS = {408, 409, 425, 429, 500, 502, 503, 504}
+
+
+class CircuitOpenError(BackendError):
+    """Raised without calling upstream while an endpoint's breaker is open."""
+
+
+def is_retryable(exc: BaseException) -> bool:
+    status = getattr(exc, "status_code", None) or getattr(getattr(exc, "response", None), "status_code", None)
+    if status is not None:
+        return int(status) in RETRYABLE_STATUS
+    if isinstance(exc, CircuitOpenError):
+        return False
+    # No status: connection resets, timeouts, DNS blips, a connection left
+    # mid-request (CannotSendRequest/ResponseNotReady) or cut short
+    return (isinstance(exc, (OSError, TimeoutError, BackendError, http.client.ImproperConnectionState,
+                             http.client.IncompleteRead))
+            or "timeout" in type(exc).__name__.lower())
+
+
+@dataclass
+class Attempt:
+    attempt: int
+    latency_s: float
+    ok: bool
+    hedged: bool = False
+    error: str = ""
+
+
+class RetryPolicy:
+    """Exponential backoff with full jitter, capped at ``max_delay``."""
+
+    def __init__(self, max_attempts: int = 4, base_delay: float = 0.5, max_delay: float = 30.0,
+                 retry_rate_limits: bool = True, seed: Optional[int] = None):
+        self.max_attempts = max(1, max_attempts)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.retry_rate_limits = retry_rate_limits
+        self._rng = random.Random(seed)
+
+    def should_retry(self, exc: BaseException, attempt: int) -> bool:
+        if attempt >= self.max_attempts or not is_retryable(exc):
+            return False
+        if not self.retry_rate_limits and retry_after_seconds(exc) is not None:
+            return False
+        return True
+
+    def delay(self, exc: BaseException, attempt: int) -> float:
+        hinted = retry_after_seconds(exc)
+        backoff = self._rng.uniform(0, min(self.max_delay, self.base_delay * (2 ** (attempt - 1))))
+        return max(backoff, hinted or 0.0)
+
+
+class CircuitBreaker:
+    """
+    Closed → open after ``failure_threshold`` consecutive failures; open →
+    half-open after ``reset_timeout`` seconds, where a single trial call
+    decides between closing again and re-opening.
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return "half-open"
+        return "open"
+
+    def retry_in(self) -> float:
+        """Seconds until an open breaker lets a trial call through (0 when it would now)."""
+        with self._lock:
+            if self.opened_at is None:
+                return 0.0
+            return max(0.0, self.opened_at + self.reset_timeout - time.monotonic())
+
+    def allow(self) -> bool:
+        with self._lock:
+            st = self.state
+            if st == "closed":
+                return True
+            if st == "half-open" and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return True
+            return False
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._trial_in_flight = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            if self._trial_in_flight or self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+            self._trial_in_flight = False
+
+
+_BREAKERS: Dict[str, CircuitBreaker] = {}
+_BREAKERS_LOCK = threading.Lock()
+
+
+def breaker_for(endpoint: str, **kwargs) -> CircuitBreaker:
+    """Process-wide breaker per endpoint, shared by every wrapper that talks to it."""
+    with _BREAKERS_LOCK:
+        if endpoint not in _BREAKERS:
+            _BREAKERS[endpoint] = CircuitBreaker(**kwargs)
+        return _BREAKERS[endpoint]
+
+
+class LatencyTracker:
+    """Rolling window of successful call latencies for percentile estimates."""
+
+    def __init__(self, window: int = 200):
+        self.window = window
+        self.samples: List[float] = []
+        self._lock = threading.Lock()
+
+    def add(self, latency: float) -> None:
+        with self._lock:
+            self.samples.append(latency)
+            if len(self.samples) > self.window:
+                del self.samples[0]
+
+    def percentile(self, q: float) -> Optional[float]:
+        with self._lock:
+            samples = list(self.samples)
+        return _nearest_rank(samples, q)
+
+
+def _nearest_rank(samples: List[float], q: float) -> Optional[float]:
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(q / 100.0 * (len(ordered) - 1))))]
+
+
+_TRACKERS: Dict[str, LatencyTracker] = {}
+
+
+def latency_for(endpoint: str) -> LatencyTracker:
+    """Process-wide latency window per endpoint, so short-lived wrappers can still hedge."""
+    with _BREAKERS_LOCK:
+        if endpoint not in _TRACKERS:
+            _TRACKERS[endpoint] = LatencyTracker()
+        return _TRACKERS[endpoint]
+
+
+class ResilientBackend(Backend):
+    """
+    Wraps a Backend with bounded retries, a per-endpoint circuit breaker and
+    optional hedging: when ``hedge`` is on and a call outlives the observed
+    p95 latency (after ``hedge_min_samples`` calls), a second identical
+    request is fired and whichever succeeds first wins. Every attempt is
+    recorded in ``attempts`` and reported through ``log``.
+
+    The breaker and the latency window are shared per endpoint across
+    wrappers. Only retryable errors (5xx, timeouts, connection errors) count
+    as breaker failures. A 400/401/404 or a rate limit (429, retry-after)
+    means the endpoint answered; rate limits are left to the caller's
+    backoff rather than shutting the endpoint for everyone.
+    """
+
+    def __init__(self, inner: Backend, policy: Optional[RetryPolicy] = None,
+                 breaker: Optional[CircuitBreaker] = None, hedge: bool = False,
+                 hedge_percentile: float = 95.0, hedge_min_samples: int = 20,
+                 hedge_after: Optional[float] = None,
+                 log: Optional[Callable[[str], None]] = print):
+        self.inner = inner
+        self.name = inner.name
+        self.endpoint = inner.endpoint
+        self.policy = policy or RetryPolicy()
+        self.breaker = breaker or breaker_for(self.endpoint)
+        self.hedge = hedge
+        self.hedge_percentile = hedge_percentile
+        self.hedge_min_samples = hedge_min_samples
+        self.hedge_after = hedge_after
+        self.latency = latency_for(self.endpoint)
+        self.attempts: List[Attempt] = []
+        self._log = log
+        self._pool: Optional[ThreadPoolExecutor] = None
+
+    # --- bookkeeping ---
+    def _emit(self, msg: str) -> None:
+        if self._log:
+            self._log(msg)
+
+    def _record(self, attempt: Attempt) -> None:
+        self.attempts.append(attempt)
+        if attempt.ok:
+            self.latency.add(attempt.latency_s)
+        tag = " (hedge)" if attempt.hedged else ""
+        status = "ok" if attempt.ok else f"failed: {attempt.error}"
+        self._emit(f"[LLM] {self.name} attempt {attempt.attempt}{tag} {status} in {attempt.latency_s:.2f}s")
+
+    def _hedge_delay(self) -> Optional[float]:
+        if not self.hedge:
+            return None
+        if self.hedge_after is not None:
+            return self.hedge_after
+        if len(self.latency.samples) < self.hedge_min_samples:
+            return None
+        return self.latency.percentile(self.hedge_percentile)
+
+    def _guard(self) -> None:
+        if not self.breaker.allow():
+            raise CircuitOpenError(f"circuit open for {self.endpoint}")
+
+    def _breaker_error(self, exc: BaseException) -> None:
+        if is_retryable(exc) and retry_after_seconds(exc) is None:
+            self.breaker.record_failure()
+        else:
+            self.breaker.record_success()
+
+    def _timed(self, fn, attempt: int, hedged: bool):
+        started = time.monotonic()
+        try:
+            out = fn()
+        except Exception as e:
+            self._record(Attempt(attempt, time.monotonic() - started, False, hedged, str(e)[:200]))
+            raise
+        self._record(Attempt(attempt, time.monotonic() - started, True, hedged))
+        return out
+
+    # --- sync ---
+    def _call_once(self, model, messages, attempt, **params) -> Completion:
+        call = lambda hedged: self._timed(  # noqa: E731
+            lambda: self.inner.complete(model, messages, **params), attempt, hedged)
+        delay = self._hedge_delay()
+        if delay is None:
+            return call(False)
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(max_workers=4, thread_name_prefix="praeparium-hedge")
+        first = self._pool.submit(call, False)
+        done, _ = wait([first], timeout=delay)
+        if done:
+            return first.result()
+        futures = {first, self._pool.submit(call, True)}
+        error: Optional[BaseException] = None
+        while futures:
+            done, futures = wait(futures, return_when=FIRST_COMPLETED)
+            for f in done:
+                if f.exception() is None:
+                    return f.result()  # the loser finishes in the background and is discarded
+                error = f.exception()
+        raise error  # type: ignore[misc]
+
+    def complete(self, model, messages, **params) -> Completion:
+        attempt = 0
+        while True:
+            attempt += 1
+            self._guard()
+            try:
+                out = self._call_once(model, messages, attempt, **params)
+            except Exception as e:
+                self._breaker_error(e)
+                if not self.policy.should_retry(e, attempt):
+                    raise
+                time.sleep(self.policy.delay(e, attempt))
+                continue
+            self.breaker.record_success()
+            return out
+
+    def stream(self, model, messages, **params) -> ChunkStream:
+        # Only opening the stream is retried; a stream cannot be hedged or resumed
+        attempt = 0
+        while True:
+            attempt += 1
+            self._guard()
+            try:
+                out = self._timed(lambda: self.inner.stream(model, messages, **params), attempt, False)
+            except Exception as e:
+                self._breaker_error(e)
+                if not self.policy.should_retry(e, attempt):
+                    raise
+                time.sleep(self.policy.delay(e, attempt))
+                continue
+            self.breaker.record_success()
+            return out
+
+    # --- async ---
+    async def _acall_once(self, model, messages, attempt, **params) -> Completion:
+        async def call(hedged: bool) -> Completion:
+            started = time.monotonic()
+            try:
+                out = await self.inner.acomplete(model, messages, **params)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self._record(Attempt(attempt, time.monotonic() - started, False, hedged, str(e)[:200]))
+                raise
+            self._record(Attempt(attempt, time.monotonic() - started, True, hedged))
+            return out
+
+        delay = self._hedge_delay()
+        if delay is None:
+            return await call(False)
+        first = asyncio.ensure_future(call(False))
+        done, _ = await asyncio.wait({first}, timeout=delay)
+        if done:
+            return first.result()
+        pending = {first, asyncio.ensure_future(call(True))}
+        error: Optional[BaseException] = None
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for t in done:
+                    if t.exception() is None:
+                        return t.result()
+                    error = t.exception()
+        finally:
+            for t in pending:
+                t.cancel()
+        raise error  # type: ignore[misc]
+
+    async def acomplete(self, model, messages, **params) -> Completion:
+        attempt = 0
+        while True:
+            attempt += 1
+            self._guard()
+            try:
+                out = await self._acall_once(model, messages, attempt, **params)
+            except Exception as e:
+                self._breaker_error(e)
+                if not self.policy.should_retry(e, attempt):
+                    raise
+                await asyncio.sleep(self.policy.delay(e, attempt))
+                continue
+            self.breaker.record_success()
+            return out
+
+    async def arelease(self) -> None:
+        await self.inner.arelease()
+
+    def shutdown(self) -> None:
+        """Stop the hedging threads, leaving ``inner`` open for other users."""
+        if self._pool is not None:
+            self._pool.shutdown(wait=False)
+            self._pool = None
+
+    def close(self) -> None:
+        self.shutdown()
+        self.inner.close()
+
+    def latency_summary(self) -> str:
+        ok = [a.latency_s for a in self.attempts if a.ok]
+        failed = sum(1 for a in self.attempts if not a.ok)
+        hedged = sum(1 for a in self.attempts if a.hedged)
+        if not ok:
+            return f"llm: {len(self.attempts)} attempt(s), {failed} failed"
+        return (f"llm: {len(self.attempts)} attempt(s), {failed} failed, {hedged} hedged; "
+                f"p50 {_nearest_rank(ok, 50):.2f}s p95 {_nearest_rank(ok, 95):.2f}s max {max(ok):.2f}s")
@@ -0,0 +1,46 @@
+# praeparium/llm/runlog.py
+from __future__ import annotations
+import json, os, threading, time
+from typing import Any, Dict, Optional
+
+DEFAULT_RUN_LOG = os.path.join(".praeparium", "run_log.jsonl")
+
+_LOCK = threading.Lock()
+
+
+def _get(obj: Any, key: str) -> Any:
+    if obj is None:
+        return None
+    if isinstance(obj, dict):
+        return obj.get(key)
+    return getattr(obj, key, None)
+
+
+def usage_fields(usage: Optional[Dict[str, Any]]) -> Dict[str, Optional[int]]:
+    """
+    Normalise provider usage into prompt/cached/completion token counts.
+    OpenAI reports cache reuse as prompt_tokens_details.cached_tokens;
+    Anthropic-style gateways as cache_read_input_tokens.
+    """
+    prompt = _get(usage, "prompt_tokens")
+    if prompt is None:
+        prompt = _get(usage, "input_tokens")
+    completion = _get(usage, "completion_tokens")
+    if completion is None:
+        completion = _get(usage, "output_tokens")
+    cached = _get(_get(usage, "prompt_tokens_details"), "cached_tokens")
+    if cached is None:
+        cached = _get(usage, "cache_read_input_tokens")
+    return {"prompt_tokens": prompt, "cached_tokens": cached, "completion_tokens": completion}
+
+
+def log_run(entry: Dict[str, Any], path: Optional[str] = None) -> None:
+    """Append one JSON line per generated article (thread-safe)."""
+    path = path or os.getenv("PRAEPARIUM_RUN_LOG", DEFAULT_RUN_LOG)
+    entry = {"ts": time.strftime("%Y-%m-%dT%H:%M:%S"), **entry}
+    d = os.path.dirname(path)
+    if d:
+        os.makedirs(d, exist_ok=True)
+    line = json.dumps(entry, ensure_ascii=False)
+    with _LOCK, open(path, "a", encoding="utf-8") as f:
+        f.write(line + "\n")
@@ -0,0 +1,173 @@
+# praeparium/llm/standin.py
+"""
+Local OpenAI-compatible stand-in server for offline load tests and CI.
+
+    python -m praeparium.llm.standin --port 8089 --latency 0.8 --jitter 0.3 --error-rate 0.05
+
+then point the writer at it:
+
+    PRAEPARIUM_BACKEND=http PRAEPARIUM_LLM_BASE_URL=http://127.0.0.1:8089/v1 \
+        praeparium bundle-generate data/sourcepacks --concurrency 16
+"""
+from __future__ import annotations
+import argparse, hashlib, json, pathlib, random, sys, threading, time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import List, Optional
+
+from .backends import PrefixCacheSim, synthetic_article
+
+
+class StandinConfig:
+    def __init__(self, latency: float = 0.5, jitter: float = 0.0, error_rate: float = 0.0,
+                 rate_limit_rate: float = 0.0, retry_after: float = 1.0, seed: int = 0,
+                 canned_dir: Optional[str] = None, chunk_size: int = 64):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.retry_after = retry_after
+        self.chunk_size = chunk_size
+        self.canned: List[str] = []
+        if canned_dir:
+            self.canned = [p.read_text(encoding="utf-8")
+                           for p in sorted(pathlib.Path(canned_dir).glob("*.md"))]
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.prefix = PrefixCacheSim()
+        self.requests = 0
+        self.errors = 0
+
+    def roll(self) -> tuple[float, float]:
+        with self._lock:
+            self.requests += 1
+            return self._rng.random(), self._rng.uniform(-self.jitter, self.jitter)
+
+    def count_error(self) -> None:
+        # Handlers run on ThreadingHTTPServer threads
+        with self._lock:
+            self.errors += 1
+
+    def body_for(self, messages) -> str:
+        if self.canned:
+            digest = hashlib.sha256(json.dumps(messages, sort_keys=True).encode("utf-8")).digest()
+            return self.canned[digest[0] % len(self.canned)]
+        return synthetic_article(messages)
+
+
+def _make_handler(cfg: StandinConfig):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        # Headers and body go out in separate writes; without this, keep-alive
+        # clients stall on Nagle + delayed ACK (~40 ms per request)
+        disable_nagle_algorithm = True
+
+        def log_message(self, fmt, *args):  # keep benchmark output clean
+            pass
+
+        def _json(self, status: int, payload: dict, headers: Optional[dict] = None) -> None:
+            body = json.dumps(payload).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            for k, v in (headers or {}).items():
+                self.send_header(k, v)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            if self.path.rstrip("/").endswith("/stats"):
+                self._json(200, {"requests": cfg.requests, "errors": cfg.errors})
+            else:
+                self._json(404, {"error": {"message": "not found"}})
+
+        def do_POST(self):
+            if not self.path.rstrip("/").endswith("/chat/completions"):
+                self._json(404, {"error": {"message": "not found"}})
+                return
+            length = int(self.headers.get("Content-Length") or 0)
+            req = json.loads(self.rfile.read(length) or b"{}")
+            roll, jitter = cfg.roll()
+            delay = max(0.0, cfg.latency + jitter)
+
+            if roll < cfg.rate_limit_rate:
+                cfg.count_error()
+                self._json(429, {"error": {"message": "simulated rate limit"}},
+                           {"retry-after": f"{cfg.retry_after:g}"})
+                return
+            if roll < cfg.rate_limit_rate + cfg.error_rate:
+                time.sleep(delay)
+                cfg.count_error()
+                self._json(500, {"error": {"message": "simulated upstream error"}})
+                return
+
+            messages = req.get("messages") or []
+            text = cfg.body_for(messages)
+            with cfg._lock:
+                usage = cfg.prefix.usage(messages, text)
+            model = req.get("model", "standin")
+
+            if not req.get("stream"):
+                time.sleep(delay)
+                self._json(200, {
+                    "id": f"standin-{cfg.requests}", "object": "chat.completion", "model": model,
+                    "choices": [{"index": 0, "finish_reason": "stop",
+                                 "message": {"role": "assistant", "content": text}}],
+                    "usage": usage,
+                })
+                return
+
+            # Server-sent events, latency spread across chunks
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Connection", "close")
+            self.end_headers()
+            pieces = [text[i:i + cfg.chunk_size] for i in range(0, len(text), cfg.chunk_size)]
+            pause = delay / max(1, len(pieces))
+            try:
+                for piece in pieces:
+                    time.sleep(pause)
+                    event = {"object": "chat.completion.chunk", "model": model,
+                             "choices": [{"index": 0, "delta": {"content": piece}}]}
+                    self.wfile.write(f"data: {json.dumps(event)}\n\n".encode("utf-8"))
+                    self.wfile.flush()
+                self.wfile.write(b"data: [DONE]\n\n")
+            except (BrokenPipeError, ConnectionResetError):
+                pass  # client cancelled the stream
+            self.close_connection = True
+
+    return Handler
+
+
+def serve(host: str = "127.0.0.1", port: int = 8089, cfg: Optional[StandinConfig] = None) -> ThreadingHTTPServer:
+    """Create (but do not start) the server; call ``serve_forever`` on the result."""
+    return ThreadingHTTPServer((host, port), _make_handler(cfg or StandinConfig()))
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="OpenAI-compatible stand-in LLM server.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--latency", type=float, default=0.5, help="Mean response latency in seconds")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Uniform ± jitter in seconds")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of HTTP 500 responses")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="Fraction of HTTP 429 responses")
+    parser.add_argument("--retry-after", type=float, default=1.0, help="retry-after seconds sent with 429s")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--canned", default=None, help="Directory of .md files to serve instead of synthetic text")
+    args = parser.parse_args(argv)
+
+    cfg = StandinConfig(latency=args.latency, jitter=args.jitter, error_rate=args.error_rate,
+                        rate_limit_rate=args.rate_limit_rate, retry_after=args.retry_after,
+                        seed=args.seed, canned_dir=args.canned)
+    server = serve(args.host, args.port, cfg)
+    print(f"[OK] Stand-in listening on http://{args.host}:{server.server_address[1]}/v1")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,103 @@
+# praeparium/llm/throttle.py
+from __future__ import annotations
+import asyncio, time
+from typing import Any, Optional
+
+
+class TokenBucket:
+    """
+    Classic token bucket refilled continuously at ``per_minute / 60`` tokens
+    per second, holding at most ``burst`` tokens (defaults to one minute's worth).
+    """
+
+    def __init__(self, per_minute: float, burst: Optional[float] = None):
+        self.rate = per_minute / 60.0
+        self.capacity = float(burst if burst is not None else per_minute)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def take(self, n: float) -> float:
+        """Take ``n`` tokens if available; otherwise return the seconds to wait."""
+        n = min(n, self.capacity)
+        self._refill()
+        if self.tokens >= n:
+            self.tokens -= n
+            return 0.0
+        return (n - self.tokens) / self.rate
+
+    def adjust(self, delta: float) -> None:
+        """Correct a previous estimate (positive delta = more was used)."""
+        self._refill()
+        self.tokens = min(self.capacity, self.tokens - delta)
+
+
+class RateLimiter:
+    """
+    Requests-per-minute and tokens-per-minute limits shared by all tasks of a
+    batch. A 429 from upstream pauses every caller until ``retry-after`` passes.
+    """
+
+    def __init__(self, rpm: Optional[float] = None, tpm: Optional[float] = None):
+        self.requests = TokenBucket(rpm) if rpm else None
+        self.tokens = TokenBucket(tpm) if tpm else None
+        self.blocked_until = 0.0
+        self._lock = asyncio.Lock()
+
+    async def acquire(self, est_tokens: int = 0) -> None:
+        async with self._lock:
+            while True:
+                wait = self.blocked_until - time.monotonic()
+                if wait > 0:
+                    await asyncio.sleep(wait)
+                    continue
+                wait = self.requests.take(1) if self.requests else 0.0
+                if wait > 0:
+                    await asyncio.sleep(wait)
+                    continue
+                wait = self.tokens.take(est_tokens) if self.tokens and est_tokens else 0.0
+                if wait > 0:
+                    # Give the request slot back; we will retake it after sleeping
+                    if self.requests:
+                        self.requests.adjust(-1)
+                    await asyncio.sleep(wait)
+                    continue
+                return
+
+    def settle(self, est_tokens: int, actual_tokens: Optional[int]) -> None:
+        """Reconcile the token bucket once the real usage is known."""
+        if self.tokens and actual_tokens is not None:
+            self.tokens.adjust(actual_tokens - est_tokens)
+
+    def pause(self, seconds: float) -> None:
+        self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+
+
+def estimate_tokens(text: str) -> int:
+    # ~4 characters per token is close enough for English prose budgeting
+    return max(1, len(text) // 4)
+
+
+def retry_after_seconds(exc: BaseException, default: float = 1.0) -> Optional[float]:
+    """
+    Seconds to wait when ``exc`` is a rate-limit (HTTP 429) error, honouring
+    ``retry-after-ms``/``retry-after`` headers; None for any other error.
+    """
+    status = getattr(exc, "status_code", None) or getattr(getattr(exc, "response", None), "status_code", None)
+    if status != 429:
+        return None
+    headers: Any = (getattr(exc, "headers", None)
+                    or getattr(getattr(exc, "response", None), "headers", None) or {})
+    for name, scale in (("retry-after-ms", 0.001), ("retry-after", 1.0)):
+        val = headers.get(name)
+        if val is None:
+            continue
+        try:
+            return max(0.0, float(val) * scale)
+        except ValueError:
+            continue
+    return default
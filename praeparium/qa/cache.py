@@ -0,0 +1,80 @@
+# praeparium/qa/cache.py
+from __future__ import annotations
+import json, os, pathlib
+from typing import Dict, Iterable, List, Optional, Tuple
+
+DEFAULT_QA_CACHE_DIR = os.path.join(".praeparium", "cache", "qa")
+INDEX_NAME = "results.json"
+INDEX_VERSION = 1
+
+
+class QAResultCache:
+    """
+    Persistent QA results for a corpus, in one JSON index.
+
+    Results are keyed on the sha256 of a file's content and are only valid
+    for the ruleset digest they were produced under; a different digest
+    drops them all. A path → (size, mtime_ns, sha256) table lets a repeat
+    run reuse a file's hash without reading it while its stat is unchanged.
+    """
+
+    def __init__(self, ruleset: str, root: Optional[str] = None, enabled: bool = True):
+        self.root = pathlib.Path(root or os.getenv("PRAEPARIUM_QA_CACHE_DIR", DEFAULT_QA_CACHE_DIR))
+        self.path = self.root / INDEX_NAME
+        self.ruleset = ruleset
+        self.enabled = enabled
+        self.files: Dict[str, List] = {}
+        self.results: Dict[str, List[str]] = {}
+        self.hits = 0
+        self.misses = 0
+        if enabled:
+            self._load()
+
+    def _load(self) -> None:
+        try:
+            data = json.loads(self.path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return
+        if data.get("version") != INDEX_VERSION:
+            return
+        self.files = data.get("files", {})
+        if data.get("ruleset") == self.ruleset:
+            self.results = data.get("results", {})
+
+    def lookup(self, path: str, st: os.stat_result) -> Optional[List[str]]:
+        """Cached errors for ``path`` when its stat matches the recorded hash."""
+        if not self.enabled:
+            return None
+        known = self.files.get(path)
+        if known and known[0] == st.st_size and known[1] == st.st_mtime_ns:
+            errs = self.results.get(known[2])
+            if errs is not None:
+                self.hits += 1
+                return errs
+        self.misses += 1
+        return None
+
+    def store(self, path: str, size: int, mtime_ns: int, digest: str, errs: List[str]) -> None:
+        if self.enabled:
+            self.files[path] = [size, mtime_ns, digest]
+            self.results[digest] = errs
+
+    def save(self, scanned: Iterable[str], seen: Iterable[str]) -> None:
+        """Write the index, forgetting files under ``scanned`` roots not in ``seen``."""
+        if not self.enabled:
+            return
+        roots: Tuple[str, ...] = tuple(r.rstrip(os.sep) + os.sep for r in scanned)
+        seen_set = set(seen)
+        self.files = {p: v for p, v in self.files.items()
+                      if p in seen_set or not p.startswith(roots)}
+        live = {v[2] for v in self.files.values()}
+        self.results = {d: e for d, e in self.results.items() if d in live}
+        self.root.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_suffix(".tmp")
+        tmp.write_text(json.dumps({"version": INDEX_VERSION, "ruleset": self.ruleset,
+                                   "files": self.files, "results": self.results},
+                                  ensure_ascii=False), encoding="utf-8")
+        os.replace(tmp, self.path)
+
+    def summary(self) -> str:
+        return f"qa cache: {self.hits} hit(s), {self.misses} miss(es)"
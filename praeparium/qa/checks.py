@@ -1,86 +1,317 @@
 from __future__ import annotations
-import os, re
-from typing import Dict, List
+import functools, hashlib, os, time
+from concurrent.futures import ProcessPoolExecutor
+from typing import TYPE_CHECKING, Callable, Dict, Iterable, List, Optional, Tuple
+
+from .cache import QAResultCache
+from .document import Document
+from .phrases import USER_PREFIX, PhraseMatcher, document_hits, literal_phrase, register_list, user_lists
+
+if TYPE_CHECKING:
+    from .report import QAReport
+
+# Bump when rule data (thresholds, phrase lists) changes; rule code is
+# fingerprinted automatically by ruleset_digest()
+RULESET_VERSION = 1
 
 FILLER = [r"\bIn conclusion\b", r"\bIn summary\b", r"\bAt the end of the day\b"]
+register_list("filler", FILLER)
+
+Rule = Callable[[Document], List[str]]
+
+# name → rule, run in registration order against one parsed Document
+RULES: Dict[str, Rule] = {}
+
+def rule(name: str) -> Callable[[Rule], Rule]:
+    """
+    Register a QA rule. A rule takes a parsed Document and returns error
+    strings; it should read the Document's fields rather than rescan
+    ``doc.text`` so each extra rule stays cheap.
+
+        @rule("faq-count")
+        def _check_faqs(doc):
+            return [] if len(doc.titles(3)) >= 3 else ["Fewer than 3 FAQs"]
+    """
+    def register(fn: Rule) -> Rule:
+        RULES[name] = fn
+        return fn
+    return register
 
 def _read_text(path: str) -> str:
     with open(path, "r", encoding="utf-8") as f:
         return f.read()
 
-def _check_headings(md: str) -> List[str]:
+@rule("headings")
+def _check_headings(doc: Document) -> List[str]:
     errs: List[str] = []
-    if not md.strip().startswith("# "):
+    if not doc.h1_at_top:
         errs.append("Missing H1 at top")
-    h2s = [l for l in md.splitlines() if l.startswith("## ")]
-    if len(h2s) < 3:
+    if len(doc.titles(2)) < 3:
         errs.append("Fewer than 3 H2s")
     return errs
 
-def _check_links(md: str) -> List[str]:
+@rule("links")
+def _check_links(doc: Document) -> List[str]:
     errs: List[str] = []
-    internal = len(re.findall(r"\]\(/", md))
-    external = len(re.findall(r"\]\(https?://", md))
-    if external < 2:
+    if len(doc.external_links) < 2:
         errs.append("Fewer than 2 external links")
-    if internal < 1:
+    if len(doc.internal_links) < 1:
         errs.append("Fewer than 1 internal link")
     return errs
 
-def _check_citations(md: str) -> List[str]:
+@rule("citations")
+def _check_citations(doc: Document) -> List[str]:
     errs: List[str] = []
     # Inline citations like [Source: CDC]
-    if md.count("[Source:") < 3:
+    if len(doc.citations) < 3:
         errs.append("Fewer than 3 inline citations [Source: ...]")
-    if "## Sources" not in md:
+    if "## Sources" not in doc.text:
         errs.append("Missing Sources section")
     # Require at least 2 unique titles/links in Sources list
-    src_lines = [l for l in md.splitlines() if l.strip().startswith("- [")]
-    if len(src_lines) < 2:
+    if len(doc.source_items) < 2:
         errs.append("Fewer than 2 sources listed")
     return errs
 
-def _check_tables(md: str) -> List[str]:
+@rule("tables")
+def _check_tables(doc: Document) -> List[str]:
     # Markdown table heuristic: header divider present
-    if "|---" not in md and "| --" not in md:
+    if not doc.table_dividers:
         return ["No comparison table found"]
     return []
 
-def _check_eeat(md: str) -> List[str]:
+@rule("eeat")
+def _check_eeat(doc: Document) -> List[str]:
     errs: List[str] = []
-    if "Preparedness Notes" not in md:
+    if "Preparedness Notes" not in doc.text:
         errs.append("Missing Preparedness Notes section")
     return errs
 
-def _check_ladder_mentions(md: str) -> List[str]:
+_LADDER_NEEDLES = ["72h", "72 hours", "2w", "two weeks", "30d", "30 days", "ladder"]
+
+@rule("ladder")
+def _check_ladder_mentions(doc: Document) -> List[str]:
     # Expect explicit ladder thinking across water pillar
-    needles = ["72h", "72 hours", "2w", "two weeks", "30d", "30 days", "ladder"]
-    if not any(n.lower() in md.lower() for n in needles):
+    low = doc.lower
+    if not any(n in low for n in _LADDER_NEEDLES):
         return ["No explicit time-ladder references (72h → 2w → 30d+)"]
     return []
 
-def _check_filler(md: str) -> List[str]:
+@rule("filler")
+def _check_filler(doc: Document) -> List[str]:
+    found = {hit.text.lower() for hit in document_hits(doc) if "filler" in hit.lists}
+    return [f"Contains filler phrase: /{pat}/" for pat in FILLER if literal_phrase(pat).lower() in found]
+
+@rule("phrase-lists")
+def _check_user_phrases(doc: Document) -> List[str]:
+    # Editorial lists from $PRAEPARIUM_PHRASE_LISTS; silent when none are set
+    lists = user_lists()
+    if not lists:
+        return []
+    found: Dict[str, List[str]] = {}
+    for hit in document_hits(doc):
+        for name in hit.lists:
+            if name in lists and hit.text not in found.setdefault(name, []):
+                found[name].append(hit.text)
+    return [f"Contains phrase(s) from {name[len(USER_PREFIX):]} list: {', '.join(repr(t) for t in texts[:5])}"
+            + (f" (+{len(texts) - 5} more)" if len(texts) > 5 else "")
+            for name, texts in found.items()]
+
+def run_rules(doc: Document, rules: Optional[Iterable[str]] = None) -> List[str]:
+    """Errors from every registered rule (or just those named in ``rules``)."""
     errs: List[str] = []
-    for pat in FILLER:
-        if re.search(pat, md, flags=re.I):
-            errs.append(f"Contains filler phrase: /{pat}/")
+    for name in (RULES if rules is None else rules):
+        errs += RULES[name](doc)
     return errs
 
-def audit_path(path: str) -> Dict[str, List[str]]:
-    failed: Dict[str, List[str]] = {}
-    for fn in os.listdir(path):
-        if not fn.endswith(".md"):
-            continue
-        p = os.path.join(path, fn)
-        md = _read_text(p)
-        errs: List[str] = []
-        errs += _check_headings(md)
-        errs += _check_links(md)
-        errs += _check_citations(md)
-        errs += _check_tables(md)
-        errs += _check_eeat(md)
-        errs += _check_ladder_mentions(md)
-        errs += _check_filler(md)
-        if errs:
-            failed[p] = errs
+# (rule, errors, seconds); "parse" times Document.parse
+Timing = Tuple[str, List[str], float]
+
+def run_rules_timed(doc: Document, rules: Optional[Iterable[str]] = None) -> List[Timing]:
+    """run_rules(), with each rule's errors and wall time."""
+    out: List[Timing] = []
+    for name in (RULES if rules is None else rules):
+        started = time.perf_counter()
+        errs = RULES[name](doc)
+        out.append((name, errs, time.perf_counter() - started))
+    return out
+
+def audit_text(md: str, path: Optional[str] = None) -> List[str]:
+    return run_rules(Document.parse(md, path))
+
+def audit_text_timed(md: str, path: Optional[str] = None) -> List[Timing]:
+    started = time.perf_counter()
+    doc = Document.parse(md, path)
+    return [("parse", [], time.perf_counter() - started), *run_rules_timed(doc)]
+
+class StreamChecker:
+    """
+    Incremental subset of the checks above (H1 at top, filler phrases) for
+    text that arrives in chunks. ``feed`` returns a fatal error message as
+    soon as one is certain, so a streamed generation can be cancelled early.
+    A phrase ending exactly at a chunk's end is only certain once the next
+    chunk (or ``close()``) shows it is not part of a longer word.
+    """
+
+    # Chars of the previous chunk re-scanned so phrases split across chunks match
+    OVERLAP = 64
+
+    def __init__(self, filler: Optional[List[str]] = None):
+        filler = filler or FILLER
+        self._matcher = PhraseMatcher({"filler": filler})
+        self._patterns = {literal_phrase(pat).lower(): pat for pat in filler}
+        self._head = ""
+        self._h1_checked = False
+        self._tail = ""
+
+    def feed(self, chunk: str) -> Optional[str]:
+        if not self._h1_checked:
+            self._head = (self._head + chunk).lstrip()
+            if len(self._head) >= 2:
+                self._h1_checked = True
+                if not self._head.startswith("# "):
+                    return "Missing H1 at top"
+        window = self._tail + chunk
+        keep = max(0, len(window) - self.OVERLAP)
+        for hit in self._matcher.finditer(window):
+            if hit.end < len(window):
+                return self._error(hit)
+            # Ends at the window edge: the next chunk may continue the word
+            keep = min(keep, hit.start)
+        self._tail = window[keep:]
+        return None
+
+    def close(self) -> Optional[str]:
+        """Settle a phrase held back at the end of the last chunk; the stream's end is a word boundary."""
+        hit = self._matcher.search(self._tail)
+        self._tail = ""
+        return self._error(hit) if hit is not None else None
+
+    def _error(self, hit) -> str:
+        return f"Contains filler phrase: /{self._patterns[hit.text.lower()]}/"
+
+def _code_fingerprint(code) -> str:
+    consts = [_code_fingerprint(c) if hasattr(c, "co_code") else repr(c) for c in code.co_consts]
+    return "|".join([code.co_code.hex(), repr(code.co_names), *consts])
+
+def ruleset_digest(rules: Optional[Iterable[str]] = None) -> str:
+    """Identifies the active rules for the QA result cache."""
+    h = hashlib.sha256(f"{RULESET_VERSION}|{FILLER!r}|{sorted(user_lists().items())!r}".encode("utf-8"))
+    for name in (RULES if rules is None else rules):
+        fn = RULES[name]
+        code = getattr(fn, "__code__", None)
+        h.update(f"|{name}|{fn.__module__}.{getattr(fn, '__qualname__', fn)}|".encode("utf-8"))
+        if code is not None:
+            h.update(_code_fingerprint(code).encode("utf-8"))
+    return h.hexdigest()
+
+def iter_markdown(path: str) -> List[str]:
+    """Every .md file under ``path`` (recursively, skipping dot-dirs), sorted."""
+    if os.path.isfile(path):
+        return [path]
+    found: List[str] = []
+    stack = [path]
+    while stack:
+        d = stack.pop()
+        with os.scandir(d) as it:
+            for e in it:
+                if e.is_dir(follow_symlinks=False):
+                    if not e.name.startswith("."):
+                        stack.append(e.path)
+                elif e.name.endswith(".md"):
+                    found.append(e.path)
+    found.sort()
+    return found
+
+# (path, size, mtime_ns, sha256, errors, per-rule timings when requested)
+_Audited = Tuple[str, int, int, str, List[str], Optional[List[Timing]]]
+
+_KNOWN: Dict[str, List[str]] = {}
+
+def _init_qa_worker(known: Dict[str, List[str]]) -> None:
+    global _KNOWN
+    _KNOWN = known
+
+def _audit_files(paths: List[str], known: Optional[Dict[str, List[str]]] = None,
+                 timed: bool = False) -> List[_Audited]:
+    """Hash and check ``paths``; content already in ``known`` reuses its result."""
+    known = _KNOWN if known is None else known
+    out: List[_Audited] = []
+    for p in paths:
+        with open(p, "rb") as f:
+            st = os.fstat(f.fileno())
+            data = f.read()
+        digest = hashlib.sha256(data).hexdigest()
+        errs = known.get(digest)
+        timings = None
+        if errs is None:
+            # Universal newlines, as text-mode open() would give
+            md = data.decode("utf-8").replace("\r\n", "\n").replace("\r", "\n")
+            if timed:
+                timings = audit_text_timed(md, p)
+                errs = [e for _, rule_errs, _ in timings for e in rule_errs]
+            else:
+                errs = audit_text(md, p)
+        out.append((p, st.st_size, st.st_mtime_ns, digest, errs, timings))
+    return out
+
+def audit_path(path: str, jobs: int = 1, cache: Optional[QAResultCache] = None,
+               report: Optional["QAReport"] = None) -> Dict[str, List[str]]:
+    """
+    QA every .md file under ``path`` (recursively). Files whose content and
+    ruleset match ``cache`` are not re-checked; the rest are checked in
+    ``jobs`` processes. Returns {file: errors} for the files that fail.
+    With ``report``, each checked file's parse and per-rule timings are
+    recorded there (cached files get one "(cached)" record).
+    """
+    started = time.perf_counter()
+    files = iter_markdown(path)
+    results: Dict[str, List[str]] = {}
+    todo: List[str] = []
+    for p in files:
+        errs = None
+        if cache is not None:
+            key = os.path.abspath(p)
+            try:
+                errs = cache.lookup(key, os.stat(p))
+            except OSError:
+                errs = None
+        if errs is None:
+            todo.append(p)
+        else:
+            results[p] = errs
+
+    known = cache.results if cache is not None and cache.enabled else {}
+    timed = report is not None
+    if jobs > 1 and len(todo) > 1:
+        jobs = min(jobs, len(todo))
+        size = max(1, -(-len(todo) // (jobs * 4)))
+        chunks = [todo[i:i + size] for i in range(0, len(todo), size)]
+        with ProcessPoolExecutor(max_workers=jobs, initializer=_init_qa_worker,
+                                 initargs=(known,)) as pool:
+            audited = [a for chunk in pool.map(functools.partial(_audit_files, timed=timed), chunks)
+                       for a in chunk]
+    else:
+        audited = _audit_files(todo, known, timed)
+
+    if report is not None:
+        checked = {a[0] for a in audited}
+        for p in files:
+            if p not in checked:
+                report.add("qa", p, "(cached)", 0.0, results[p], cached=True)
+    for p, size, mtime_ns, digest, errs, timings in audited:
+        results[p] = errs
+        if report is not None:
+            if timings is None:
+                report.add("qa", p, "(cached)", 0.0, errs, cached=True)
+            else:
+                for name, rule_errs, secs in timings:
+                    report.add("qa", p, name, secs, rule_errs)
+        if cache is not None:
+            cache.store(os.path.abspath(p), size, mtime_ns, digest, errs)
+    if cache is not None:
+        cache.save([os.path.abspath(path)], [os.path.abspath(p) for p in files])
+
+    failed = {p: results[p] for p in files if results[p]}
+    print(f"[QA] {len(files)} file(s): {len(files) - len(todo)} cached, {len(todo)} checked, "
+          f"{len(failed)} failed in {time.perf_counter() - started:.2f}s")
     return failed
@@ -1,19 +1,269 @@
-import json, os, re
+# praeparium/qa/claims.py
+"""
+Claims verification against a Source Pack.
+
+Each pack is compiled once into a rule set, which is cached by path, mtime
+and size. The rule set has three parts:
+- the required concepts every article needs: the time ladder, rotation,
+  ergonomics and citations;
+- rules derived from ``claims_checklist``;
+- a source-count rule derived from the pack's ``sources``.
+
+A concept is a set of literal alternatives. All the concepts of a pack go
+into one PhraseMatcher, so an article is scanned once. An ordered rule (the
+72h → 2w → 30d ladder) then walks each concept's sorted hit offsets, which
+keeps it linear where a ``.*`` regex backtracks.
+
+Checklist entries are free text, so only the checkable signals in them
+become rules:
+- a time ladder ("72h, 2w, 30d+") becomes an ordered rule;
+- numeric ranges and decimals ("6–12 months", "8.34 lb/gal") must appear;
+- "Any 'X' claim must ... cite" needs a citation or link in the same
+  paragraph as each mention of X;
+- "at least N ... sources" sets the source count.
+Entries with none of these are reported as unchecked, not failed.
+"""
+from __future__ import annotations
+import bisect, json, os, re
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from .document import Document
+from .phrases import PhraseMatcher
+
+Concept = Tuple[str, ...]
+
+# Required for every article: (name, ordered concepts)
+REQUIRED: List[Tuple[str, List[Concept]]] = [
+    ("time ladder", [("72h", "72 hours"), ("2w", "two weeks"), ("30d", "30 days", "month")]),
+    ("rotation", [("rotate", "rotation", "6–12", "6-12")]),
+    ("ergonomics", [("55-gal", "55gal", "55 gallon", "208kg", "208 kg", "460lb", "460 lb",
+                     "floor-load", "floor load", "floorload", "lb/ft")]),
+    ("citations", [("[source:",)]),
+]
+
+_LADDER_TOKEN = re.compile(r"(?<![\w.])(\d+)\s?([hdw])(?!\w)")
+_RANGE = re.compile(r"(?<![\w.])(\d+(?:\.\d+)?)\s*[–—-]\s*(\d+(?:\.\d+)?)(?![\d.])")
+_DECIMAL = re.compile(r"(?<![\w.–—-])(\d+\.\d+)(?![\d.])")
+_TRIGGER = re.compile(r"\bany\s+['‘\"“]([^'’\"”]+)['’\"”]\s+claims?\b", re.I)
+_AT_LEAST = re.compile(r"\bat least (\d+)\b[^.;]*?\bsources?\b", re.I)
+_PARAGRAPH_BREAK = re.compile(r"\n[ \t]*\n")
+_WORD = re.compile(r"\w")
+_UNITS = {"h": ("h", " hours", "-hour", " hrs"), "d": ("d", " days", "-day"), "w": ("w", " weeks", "-week")}
+_NUMBER_WORDS = {1: "one", 2: "two", 3: "three", 4: "four", 6: "six", 12: "twelve"}
+
+
+class ClaimRule(NamedTuple):
+    name: str
+    claim: str
+    # "concepts" (all present, in order when ``ordered``), "cited" (each
+    # trigger mention needs a citation in its paragraph) or "sources"
+    kind: str
+    concepts: Tuple[Concept, ...] = ()
+    ordered: bool = False
+    whole_words: bool = False
+    min_sources: int = 0
+
+
+class ClaimHit(NamedTuple):
+    concept: str
+    start: int
+    line: int
+
+
+class ClaimResult(NamedTuple):
+    name: str
+    claim: str
+    ok: bool
+    hits: List[ClaimHit]
+    message: str = ""
+
+
+class CompiledPack:
+    """A Source Pack's rules plus one matcher over all their concepts."""
+
+    def __init__(self, pack: dict, path: Optional[str] = None):
+        self.path = path
+        self.pack_id = pack.get("pack_id") or pack.get("slug") or ""
+        self.sources: List[dict] = [s for s in pack.get("sources") or [] if isinstance(s, dict)]
+        self.rules: List[ClaimRule] = [ClaimRule(name, "", "concepts", tuple(cs), ordered=len(cs) > 1)
+                                       for name, cs in REQUIRED]
+        self.unchecked: List[str] = []
+        min_sources = 1 if self.sources else 0
+        for n, claim in enumerate(pack.get("claims_checklist") or [], 1):
+            rules = _compile_claim(f"claim {n}", str(claim))
+            for r in rules:
+                if r.kind == "sources":
+                    min_sources = max(min_sources, r.min_sources)
+            rules = [r for r in rules if r.kind != "sources"]
+            if rules:
+                self.rules.extend(rules)
+            elif not _AT_LEAST.search(str(claim)):
+                self.unchecked.append(str(claim))
+        if min_sources:
+            self.rules.append(ClaimRule("sources", f"at least {min_sources} distinct source(s) referenced",
+                                        "sources", min_sources=min_sources))
+        # One list per concept, named "<rule index>.<concept index>"
+        lists = {f"{i}.{j}": c for i, r in enumerate(self.rules) for j, c in enumerate(r.concepts)}
+        self.matcher = PhraseMatcher(lists, whole_words=False)
+
+    def verify(self, md: str | Document) -> List[ClaimResult]:
+        doc = md if isinstance(md, Document) else Document.parse(md)
+        text = doc.text
+        found: Dict[str, List[Tuple[int, int]]] = {}
+        for hit in self.matcher.finditer(text):
+            for name in hit.lists:
+                found.setdefault(name, []).append((hit.start, hit.end))
+        out = []
+        for i, r in enumerate(self.rules):
+            hits = [found.get(f"{i}.{j}", []) for j in range(len(r.concepts))]
+            if r.whole_words:
+                hits = [[(s, e) for s, e in h if _bounded(text, s, e)] for h in hits]
+            if r.kind == "sources":
+                out.append(self._check_sources(doc, r))
+            elif r.kind == "cited":
+                out.append(_check_cited(doc, r, hits[0]))
+            else:
+                out.append(_check_concepts(doc, r, hits))
+        return out
+
+    def _check_sources(self, doc: Document, rule: ClaimRule) -> ClaimResult:
+        pack_urls = [(_norm_url(s.get("url", "")), s) for s in self.sources if s.get("url")]
+        pack_names = [(s, {str(s.get(k, "")).lower() for k in ("id", "title", "publisher")} - {""})
+                      for s in self.sources]
+        seen: Dict[str, ClaimHit] = {}
+        for url, offset in doc.external_links:
+            u = _norm_url(url)
+            key = next((str(s.get("id") or s.get("url")) for p, s in pack_urls if u.startswith(p)), u)
+            seen.setdefault(key, ClaimHit(url, offset, doc.line_of(offset)))
+        for label, offset in doc.citations:
+            low = label.lower()
+            key = next((str(s.get("id") or s.get("url")) for s, names in pack_names
+                        if any(n and n in low for n in names)), low)
+            if key:
+                seen.setdefault(key, ClaimHit(label, offset, doc.line_of(offset)))
+        hits = sorted(seen.values(), key=lambda h: h.start)
+        if len(hits) >= rule.min_sources:
+            return ClaimResult(rule.name, rule.claim, True, hits)
+        return ClaimResult(rule.name, rule.claim, False, hits,
+                           f"Too few sources: {len(hits)} referenced, {rule.min_sources} required")
+
+
+def _bounded(text: str, start: int, end: int) -> bool:
+    return not (start and _WORD.match(text, start - 1)) and not _WORD.match(text, end)
+
+
+def _norm_url(url: str) -> str:
+    u = url.strip().lower().split("#", 1)[0]
+    u = re.sub(r"^https?://(www\.)?", "", u)
+    return u.rstrip("/")
+
+
+def _range_alternatives(lo: str, hi: str) -> Concept:
+    return tuple(f"{lo}{sep}{hi}" for sep in ("–", "-", "—", " – ", " - ", " to "))
+
+
+def _ladder_alternatives(n: int, unit: str) -> Concept:
+    alts = [f"{n}{suffix}" for suffix in _UNITS[unit]]
+    if n in _NUMBER_WORDS:
+        alts += [f"{_NUMBER_WORDS[n]}{suffix}" for suffix in _UNITS[unit][1:]]
+    if unit == "d" and n in (30, 31):
+        alts += ["one month", "a month", "1 month", "month"]
+    if unit == "w" and n == 2:
+        alts += ["14 days", "fortnight"]
+    return tuple(dict.fromkeys(alts))
+
+
+def _compile_claim(name: str, claim: str) -> List[ClaimRule]:
+    """The checkable rules in one free-text checklist entry (possibly none)."""
+    rules = []
+    m = _TRIGGER.search(claim)
+    if m:
+        term = m.group(1).strip().lower()
+        alts = tuple(dict.fromkeys([term, term.replace("-", " "), term.replace(" ", "-")]))
+        rules.append(ClaimRule(f"{name}: {term}", claim, "cited", (alts,), whole_words=True))
+    m = _AT_LEAST.search(claim)
+    if m:
+        rules.append(ClaimRule(name, claim, "sources", min_sources=int(m.group(1))))
+    ladder = [(int(n), unit) for n, unit in _LADDER_TOKEN.findall(claim)]
+    concepts: List[Concept] = []
+    if len(ladder) > 1:
+        concepts = [_ladder_alternatives(n, unit) for n, unit in ladder]
+        rules.append(ClaimRule(name, claim, "concepts", tuple(concepts), ordered=True, whole_words=True))
+        concepts = []
+    for lo, hi in _RANGE.findall(claim):
+        concepts.append(_range_alternatives(lo, hi))
+    for value in _DECIMAL.findall(claim):
+        if not any(value in c[0] for c in concepts):
+            concepts.append((value,))
+    if concepts:
+        rules.append(ClaimRule(name, claim, "concepts", tuple(concepts), whole_words=True))
+    return rules
+
+
+def _check_concepts(doc: Document, rule: ClaimRule, hits: List[List[Tuple[int, int]]]) -> ClaimResult:
+    located: List[ClaimHit] = []
+    missing: Optional[Concept] = None
+    prev_end = 0
+    for concept, spans in zip(rule.concepts, hits):
+        if rule.ordered:
+            # First hit starting after the previous concept's hit ends
+            k = bisect.bisect_left(spans, (prev_end, -1))
+            spans = spans[k:k + 1]
+        if not spans:
+            missing = concept
+            break
+        start, prev_end = spans[0]
+        located.append(ClaimHit(doc.text[start:prev_end], start, doc.line_of(start)))
+    if missing is None:
+        return ClaimResult(rule.name, rule.claim, True, located)
+    if not rule.claim:
+        msg = f"Missing required concept: {rule.name}"
+    else:
+        msg = f"Claim not evidenced ({rule.claim}): missing '{missing[0]}'" + (" in order" if rule.ordered else "")
+    return ClaimResult(rule.name, rule.claim, False, located, msg)
+
+
+def _check_cited(doc: Document, rule: ClaimRule, spans: List[Tuple[int, int]]) -> ClaimResult:
+    if not spans:
+        return ClaimResult(rule.name, rule.claim, True, [])
+    breaks = [m.start() for m in _PARAGRAPH_BREAK.finditer(doc.text)]
+    cited = {bisect.bisect_right(breaks, off) for _, off in doc.citations}
+    cited.update(bisect.bisect_right(breaks, off) for _, off in doc.external_links)
+    located, bad = [], []
+    for start, end in spans:
+        hit = ClaimHit(doc.text[start:end], start, doc.line_of(start))
+        located.append(hit)
+        if bisect.bisect_right(breaks, start) not in cited:
+            bad.append(hit)
+    if not bad:
+        return ClaimResult(rule.name, rule.claim, True, located)
+    lines = ", ".join(str(h.line) for h in bad[:5]) + (", ..." if len(bad) > 5 else "")
+    return ClaimResult(rule.name, rule.claim, False, located,
+                       f"Uncited '{rule.concepts[0][0]}' claim (line {lines}): {rule.claim}")
+
+
+# --- pack cache ---
+_PACKS: Dict[str, Tuple[Tuple[int, int], CompiledPack]] = {}
+
+
+def load_pack(sourcepack_path: str) -> CompiledPack:
+    """The compiled rules for a Source Pack, recompiled only when the file changes."""
+    key = os.path.abspath(sourcepack_path)
+    st = os.stat(key)
+    stamp = (st.st_mtime_ns, st.st_size)
+    cached = _PACKS.get(key)
+    if cached is not None and cached[0] == stamp:
+        return cached[1]
+    with open(key, "r", encoding="utf-8-sig") as f:
+        pack = CompiledPack(json.load(f), sourcepack_path)
+    _PACKS[key] = (stamp, pack)
+    return pack
+
+
+def verify_claims(md: str | Document, sourcepack_path: str) -> List[ClaimResult]:
+    """Per-rule results, with the location of every concept hit."""
+    return load_pack(sourcepack_path).verify(md)
+
 
 def check_claims(md: str, sourcepack_path: str) -> list[str]:
-    with open(sourcepack_path, "r", encoding="utf-8") as f:
-        sp = json.load(f)
-    claims = sp.get("claims_checklist", [])
-    errs = []
-    # naive presence checks – evolve to regexes per claim later
-    musts = {
-        "time ladder": r"(72h|72 hours).*(2w|two weeks).*(30d|30 days|month)",
-        "rotation": r"rotate|rotation|6–12|6-12",
-        "ergonomics": r"(55-?gal|55 gallon|208\s?kg|460\s?lb|floor[- ]?load|lb/ft)",
-        "citations": r"\[Source:",
-    }
-    # example: ensure at least one must per category
-    for name, pattern in musts.items():
-        if not re.search(pattern, md, re.IGNORECASE | re.DOTALL):
-            errs.append(f"Missing required concept: {name}")
-    return errs
+    return [r.message for r in verify_claims(md, sourcepack_path) if not r.ok]
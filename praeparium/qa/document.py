@@ -0,0 +1,111 @@
+# praeparium/qa/document.py
+"""
+Markdown parsed once for QA.
+
+``Document.parse`` builds everything the QA rules look at in one line walk
+plus one scan each for links and citation markers: headings, internal and
+external link targets, table blocks, ``[Source: ...]`` markers and
+source-list items. Block elements carry their 1-based line number, inline
+ones their character offset (``line_of`` maps it to a line). Rules read
+these fields instead of re-splitting or re-scanning the text; ``lower`` is
+computed on first use and shared.
+"""
+from __future__ import annotations
+import bisect, re
+from typing import Any, Dict, List, Optional, Tuple
+
+# Only "](" is consumed; the target is read by lookahead, so a target that
+# runs into another "](" (e.g. "](/](http://e)") does not hide that link
+_LINK_RX = re.compile(r"\]\((?=(https?://|/)([^)\s]*))")
+_CITATION_RX = re.compile(r"\[Source:\s*([^\]\[\n]*)\]?")
+
+
+class Document:
+    __slots__ = ("text", "path", "lines", "headings", "internal_links", "external_links",
+                 "tables", "table_dividers", "citations", "source_items", "memo", "_lower", "_line_starts")
+
+    def __init__(self, text: str, path: Optional[str] = None):
+        self.text = text
+        self.path = path
+        self.lines: List[str] = []
+        # (level, title, line)
+        self.headings: List[Tuple[int, str, int]] = []
+        # (target, offset); internal targets keep their leading "/"
+        self.internal_links: List[Tuple[str, int]] = []
+        self.external_links: List[Tuple[str, int]] = []
+        # (first line, last line) of each run of "|" rows
+        self.tables: List[Tuple[int, int]] = []
+        # header dividers ("|---" / "| --") anywhere in the text
+        self.table_dividers = 0
+        # (label, offset) for each "[Source: ...]" marker
+        self.citations: List[Tuple[str, int]] = []
+        # (line text, line) for "- [" list items
+        self.source_items: List[Tuple[str, int]] = []
+        # Derived data shared between rules (phrase hits, style metrics)
+        self.memo: Dict[str, Any] = {}
+        self._lower: Optional[str] = None
+        self._line_starts: Optional[List[int]] = None
+
+    @classmethod
+    def parse(cls, text: str, path: Optional[str] = None) -> "Document":
+        doc = cls(text, path)
+        doc.lines = lines = text.splitlines()
+        headings, tables, sources = doc.headings, doc.tables, doc.source_items
+        table_start = None
+        for n, line in enumerate(lines, 1):
+            if not line:
+                if table_start is not None:
+                    tables.append((table_start, n - 1))
+                    table_start = None
+                continue
+            first = line[0]
+            if first == "#":
+                level = len(line) - len(line.lstrip("#"))
+                if line[level:level + 1] == " ":
+                    headings.append((level, line.strip("# ").strip(), n))
+            stripped = line.lstrip() if first.isspace() else line
+            if stripped[:1] == "|":
+                if table_start is None:
+                    table_start = n
+            elif table_start is not None:
+                tables.append((table_start, n - 1))
+                table_start = None
+            if stripped.startswith("- ["):
+                sources.append((stripped.rstrip(), n))
+        if table_start is not None:
+            tables.append((table_start, len(lines)))
+
+        doc.table_dividers = text.count("|---") + text.count("| --")
+        internal, external = doc.internal_links, doc.external_links
+        for m in _LINK_RX.finditer(text):
+            scheme, rest = m.groups()
+            (internal if scheme == "/" else external).append((scheme + rest, m.start()))
+        if "[Source:" in text:
+            doc.citations = [(m.group(1).strip(), m.start()) for m in _CITATION_RX.finditer(text)]
+        return doc
+
+    @property
+    def lower(self) -> str:
+        if self._lower is None:
+            self._lower = self.text.lower()
+        return self._lower
+
+    def line_of(self, offset: int) -> int:
+        """1-based line (counting "\\n" breaks) of a character offset."""
+        if self._line_starts is None:
+            starts, i = [0], self.text.find("\n")
+            while i != -1:
+                starts.append(i + 1)
+                i = self.text.find("\n", i + 1)
+            self._line_starts = starts
+        return bisect.bisect_right(self._line_starts, offset)
+
+    @property
+    def h1_at_top(self) -> bool:
+        return self.text.strip().startswith("# ")
+
+    def titles(self, level: int) -> List[str]:
+        return [title for lvl, title, _ in self.headings if lvl == level]
+
+    def has_heading(self, title: str, level: int = 2) -> bool:
+        return any(lvl == level and t == title for lvl, t, _ in self.headings)
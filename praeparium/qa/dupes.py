@@ -0,0 +1,266 @@
+# praeparium/qa/dupes.py
+"""
+Near-duplicate sections across a corpus (MinHash + LSH).
+
+Each Markdown file is split into sections at its H2 headings. Every section
+becomes a set of word shingles with a one-permutation MinHash signature of
+NUM_PERM 32-bit slots:
+- each shingle is hashed once (blake2b, 64 bits);
+- the low bits pick a slot and the high 32 bits are kept as its value;
+- each slot keeps its minimum value;
+- an empty slot borrows from the next filled one, offset by the distance.
+Hashing is linear in the number of shingles rather than NUM_PERM times it.
+NumPy, when installed, vectorises the per-slot minimum; signatures are the
+same with or without it.
+
+LSH splits each signature into BANDS bands. Sections that share any band
+land in the same bucket and become candidate pairs, so there is no
+all-pairs comparison. A candidate counts as a duplicate when its estimated
+Jaccard similarity (the share of equal signature slots) reaches the
+threshold. A bucket larger than MAX_BUCKET (boilerplate repeated on many
+pages) is only compared against its first member, which keeps the pass
+linear.
+
+Signatures are cached per file content hash under
+$PRAEPARIUM_DUPES_CACHE_DIR (default .praeparium/cache/dupes), with a
+path → (size, mtime_ns, sha256) table. Repeat runs only read and shingle
+files that changed.
+"""
+from __future__ import annotations
+import base64, hashlib, json, os, pathlib, re, struct, time
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+# Optional dependency: numpy (vectorised signature minimum)
+try:
+    import numpy as np
+except Exception:
+    np = None
+
+NUM_PERM = 128
+BANDS = 16
+ROWS = NUM_PERM // BANDS
+SHINGLE = 5
+MIN_WORDS = 40
+MAX_BUCKET = 100
+
+DEFAULT_DUPES_CACHE_DIR = os.path.join(".praeparium", "cache", "dupes")
+INDEX_NAME = "signatures.json"
+INDEX_VERSION = 1
+PARAMS = f"oph-blake2b/{NUM_PERM}/{SHINGLE}/{MIN_WORDS}"
+
+_WORDS = re.compile(r"\w+")
+_SIG = struct.Struct(f"<{NUM_PERM}I")
+_EMPTY = 1 << 32
+# Offset per slot of distance for borrowed values (golden-ratio constant)
+_BORROW = 0x9E3779B1
+
+
+class Section(NamedTuple):
+    path: str
+    title: str
+    line: int
+    signature: Tuple[int, ...]
+
+
+class DuplicatePair(NamedTuple):
+    similarity: float
+    a: Section
+    b: Section
+
+
+def split_sections(md: str) -> List[Tuple[str, int, str]]:
+    """(H2 title, 1-based line, body) for each section; text before the first H2 is titled ""."""
+    out: List[Tuple[str, int, str]] = []
+    title, start, body = "", 1, []
+    for n, line in enumerate(md.splitlines(), 1):
+        if line.startswith("## "):
+            out.append((title, start, "\n".join(body)))
+            title, start, body = line[3:].strip(), n, []
+        else:
+            body.append(line)
+    out.append((title, start, "\n".join(body)))
+    return out
+
+
+def signature(text: str) -> Optional[Tuple[int, ...]]:
+    """MinHash signature of ``text``'s word shingles; None below MIN_WORDS words."""
+    words = _WORDS.findall(text.lower())
+    if len(words) < MIN_WORDS:
+        return None
+    shingles = {" ".join(words[i:i + SHINGLE]) for i in range(len(words) - SHINGLE + 1)}
+    digests = [hashlib.blake2b(s.encode("utf-8"), digest_size=8).digest() for s in shingles]
+    if np is not None:
+        h = np.frombuffer(b"".join(digests), dtype="<u8")
+        slots = np.full(NUM_PERM, _EMPTY, dtype=np.uint64)
+        np.minimum.at(slots, (h % NUM_PERM).astype(np.intp), h >> np.uint64(32))
+        mins = [int(v) for v in slots]
+    else:
+        mins = [_EMPTY] * NUM_PERM
+        for d in digests:
+            h = int.from_bytes(d, "little")
+            slot = h % NUM_PERM
+            if h >> 32 < mins[slot]:
+                mins[slot] = h >> 32
+    return _densify(mins)
+
+
+def _densify(mins: List[int]) -> Tuple[int, ...]:
+    out = list(mins)
+    for j, v in enumerate(mins):
+        if v == _EMPTY:
+            for dist in range(1, NUM_PERM):
+                borrowed = mins[(j + dist) % NUM_PERM]
+                if borrowed != _EMPTY:
+                    out[j] = (borrowed + dist * _BORROW) & 0xFFFFFFFF
+                    break
+    return tuple(out)
+
+
+def file_sections(path: str, md: str) -> List[Section]:
+    out = []
+    for title, line, body in split_sections(md):
+        sig = signature(body)
+        if sig is not None:
+            out.append(Section(path, title, line, sig))
+    return out
+
+
+def similarity(a: Tuple[int, ...], b: Tuple[int, ...]) -> float:
+    return sum(map(int.__eq__, a, b)) / NUM_PERM
+
+
+def find_duplicates(sections: List[Section], threshold: float = 0.8) -> List[DuplicatePair]:
+    """Section pairs with estimated Jaccard similarity >= ``threshold``, most similar first."""
+    buckets: Dict[Tuple[int, bytes], List[int]] = {}
+    for i, s in enumerate(sections):
+        packed = _SIG.pack(*s.signature)
+        for band in range(BANDS):
+            key = (band, packed[band * ROWS * 4:(band + 1) * ROWS * 4])
+            buckets.setdefault(key, []).append(i)
+    candidates = set()
+    for members in buckets.values():
+        if len(members) < 2:
+            continue
+        if len(members) > MAX_BUCKET:
+            candidates.update((members[0], j) for j in members[1:])
+        else:
+            candidates.update((i, j) for k, i in enumerate(members) for j in members[k + 1:])
+    pairs = []
+    for i, j in candidates:
+        sim = similarity(sections[i].signature, sections[j].signature)
+        if sim >= threshold:
+            pairs.append(DuplicatePair(sim, sections[i], sections[j]))
+    pairs.sort(key=lambda p: (-p.similarity, p.a.path, p.a.line, p.b.path, p.b.line))
+    return pairs
+
+
+class SignatureCache:
+    """
+    Section signatures by file content hash, in one JSON index (signatures
+    base64-packed). Entries made with other shingling parameters are dropped.
+    """
+
+    def __init__(self, root: Optional[str] = None, enabled: bool = True):
+        self.root = pathlib.Path(root or os.getenv("PRAEPARIUM_DUPES_CACHE_DIR", DEFAULT_DUPES_CACHE_DIR))
+        self.path = self.root / INDEX_NAME
+        self.enabled = enabled
+        self.files: Dict[str, List] = {}
+        self.sigs: Dict[str, List[List]] = {}
+        self.hits = 0
+        self.misses = 0
+        if enabled:
+            self._load()
+
+    def _load(self) -> None:
+        try:
+            data = json.loads(self.path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return
+        if data.get("version") == INDEX_VERSION and data.get("params") == PARAMS:
+            self.files = data.get("files", {})
+            self.sigs = data.get("sigs", {})
+
+    def lookup(self, path: str, st: os.stat_result) -> Optional[List[Tuple[str, int, Tuple[int, ...]]]]:
+        if not self.enabled:
+            return None
+        known = self.files.get(path)
+        if known and known[0] == st.st_size and known[1] == st.st_mtime_ns:
+            return self.lookup_digest(known[2])
+        return None
+
+    def lookup_digest(self, digest: str) -> Optional[List[Tuple[str, int, Tuple[int, ...]]]]:
+        entry = self.sigs.get(digest) if self.enabled else None
+        if entry is None:
+            return None
+        return [(title, line, _SIG.unpack(base64.b64decode(sig))) for title, line, sig in entry]
+
+    def store(self, path: str, size: int, mtime_ns: int, digest: str, sections: List[Section]) -> None:
+        if self.enabled:
+            self.files[path] = [size, mtime_ns, digest]
+            self.sigs[digest] = [[s.title, s.line, base64.b64encode(_SIG.pack(*s.signature)).decode("ascii")]
+                                 for s in sections]
+
+    def save(self, scanned: Iterable[str], seen: Iterable[str]) -> None:
+        """Write the index, forgetting files under ``scanned`` roots not in ``seen``."""
+        if not self.enabled:
+            return
+        roots = tuple(r.rstrip(os.sep) + os.sep for r in scanned)
+        seen_set = set(seen)
+        self.files = {p: v for p, v in self.files.items() if p in seen_set or not p.startswith(roots)}
+        live = {v[2] for v in self.files.values()}
+        self.sigs = {d: s for d, s in self.sigs.items() if d in live}
+        self.root.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_suffix(".tmp")
+        tmp.write_text(json.dumps({"version": INDEX_VERSION, "params": PARAMS,
+                                   "files": self.files, "sigs": self.sigs}), encoding="utf-8")
+        os.replace(tmp, self.path)
+
+    def summary(self) -> str:
+        return f"signature cache: {self.hits} hit(s), {self.misses} miss(es)"
+
+
+def corpus_sections(paths: List[str], cache: Optional[SignatureCache] = None) -> List[Section]:
+    """Signed sections of every file in ``paths``, reusing ``cache`` where files are unchanged."""
+    sections: List[Section] = []
+    for p in paths:
+        key = os.path.abspath(p)
+        cached = None
+        if cache is not None:
+            try:
+                cached = cache.lookup(key, os.stat(p))
+            except OSError:
+                cached = None
+        if cached is None:
+            with open(p, "rb") as f:
+                st = os.fstat(f.fileno())
+                data = f.read()
+            digest = hashlib.sha256(data).hexdigest()
+            cached = cache.lookup_digest(digest) if cache is not None else None
+            if cached is None:
+                md = data.decode("utf-8").replace("\r\n", "\n").replace("\r", "\n")
+                found = file_sections(p, md)
+                if cache is not None:
+                    cache.misses += 1
+                    cache.store(key, st.st_size, st.st_mtime_ns, digest, found)
+                sections += found
+                continue
+            if cache is not None:
+                cache.store(key, st.st_size, st.st_mtime_ns, digest,
+                            [Section(p, t, n, s) for t, n, s in cached])
+        if cache is not None:
+            cache.hits += 1
+        sections += [Section(p, t, n, s) for t, n, s in cached]
+    return sections
+
+
+def find_duplicate_sections(path: str, paths: List[str], threshold: float = 0.8,
+                            cache: Optional[SignatureCache] = None) -> List[DuplicatePair]:
+    """Shingle/sign ``paths`` (files under ``path``) and return their near-duplicate sections."""
+    started = time.perf_counter()
+    sections = corpus_sections(paths, cache)
+    if cache is not None:
+        cache.save([os.path.abspath(path)], [os.path.abspath(p) for p in paths])
+    pairs = find_duplicates(sections, threshold)
+    print(f"[QA] {len(paths)} file(s), {len(sections)} section(s): {len(pairs)} near-duplicate pair(s) "
+          f"in {time.perf_counter() - started:.2f}s")
+    return pairs
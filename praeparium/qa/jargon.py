@@ -1,4 +1,4 @@
-﻿import re
+﻿from .phrases import get_matcher, register_list
 
 BANNED = [
     "boil the ocean","move the needle","low-hanging fruit","paradigm shift",
@@ -6,7 +6,10 @@ BANNED = [
     "mission-critical","cutting-edge","next-gen","state-of-the-art",
 ]
 
+register_list("jargon", BANNED)
+
 def find_jargon(md: str):
-    low = md.lower()
-    hits = [p for p in BANNED if p in low]
+    # Whole-word, case-insensitive; one scan through the shared phrase matcher
+    owned = {p.lower(): p for p in BANNED}
+    hits = [owned[h.text.lower()] for h in get_matcher().finditer(md, ["jargon"])]
     return sorted(set(hits))
@@ -0,0 +1,139 @@
+# praeparium/qa/linkindex.py
+"""
+Corpus-wide internal link resolution.
+
+``SlugIndex`` holds every page slug the pipeline knows about, wherever it
+came from:
+- the Markdown files under an output tree (render and writer both write
+  ``<out>/<slug>.md``);
+- bundle items (``add_bundle``) and Source Pack articles
+  (``add_sourcepack``), for pages planned but not yet written;
+- the site manifest that ``export.wordpress.export_dir`` writes next to the
+  HTML (``add_manifest``).
+
+A manifest also records each page's outgoing links, so a run can check a
+freshly generated tree against an exported site without re-scanning it.
+
+``resolve`` makes one pass over the scanned files' internal links, with one
+set lookup per link. It reports dangling links (file, line, target) and
+orphan pages: pages with known outgoing links that no other page links to.
+"""
+from __future__ import annotations
+import json, os, pathlib
+from typing import Dict, Iterable, List, NamedTuple, Optional, Set, Tuple
+
+import yaml
+
+from .document import Document
+
+MANIFEST_NAME = "site-manifest.json"
+MANIFEST_VERSION = 1
+
+
+def normalize_target(target: str) -> Optional[str]:
+    """The page slug an internal href points at ("/a/b.html#x" → "a/b"); None for the site root."""
+    t = target.split("#", 1)[0].split("?", 1)[0].strip("/")
+    for ext in (".html", ".md"):
+        if t.endswith(ext):
+            t = t[:-len(ext)]
+    return t or None
+
+
+def internal_targets(doc: Document) -> List[str]:
+    """Slugs linked from ``doc``, in order, without duplicates."""
+    out = {}
+    for target, _ in doc.internal_links:
+        slug = normalize_target(target)
+        if slug:
+            out[slug] = None
+    return list(out)
+
+
+class LinkReport(NamedTuple):
+    pages: int
+    links: int
+    # (file, line, target) for links to unknown slugs
+    dangling: List[Tuple[str, int, str]]
+    orphans: List[str]
+
+
+class SlugIndex:
+    def __init__(self):
+        # slug → where it came from ("tree", "bundle", "sourcepack", "manifest")
+        self.slugs: Dict[str, str] = {}
+        # slug → outgoing internal links, for pages whose links are known
+        self.links: Dict[str, List[str]] = {}
+
+    def add(self, slug: str, origin: str, links: Optional[Iterable[str]] = None) -> None:
+        self.slugs.setdefault(slug, origin)
+        if links is not None:
+            self.links[slug] = list(links)
+
+    def __contains__(self, slug: str) -> bool:
+        return slug in self.slugs
+
+    def __len__(self) -> int:
+        return len(self.slugs)
+
+    def add_bundle(self, bundle_yaml: str) -> None:
+        with open(bundle_yaml, "r", encoding="utf-8-sig") as f:
+            plan = yaml.safe_load(f) or {}
+        for item in plan.get("items", []):
+            if item.get("slug"):
+                self.add(item["slug"], "bundle")
+
+    def add_sourcepack(self, sourcepack_path: str) -> None:
+        with open(sourcepack_path, "r", encoding="utf-8-sig") as f:
+            sp = json.load(f)
+        for slug in [sp.get("slug")] + [a.get("slug") for a in sp.get("articles") or []]:
+            if slug:
+                self.add(slug, "sourcepack")
+
+    def add_manifest(self, path: str) -> None:
+        """Pages (and their links) from an exported site manifest, or its directory."""
+        if os.path.isdir(path):
+            path = os.path.join(path, MANIFEST_NAME)
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        if data.get("version") != MANIFEST_VERSION:
+            raise ValueError(f"{path}: unsupported site manifest version {data.get('version')!r}")
+        for slug, page in (data.get("pages") or {}).items():
+            self.add(slug, "manifest", page.get("links"))
+
+    def resolve(self, root: str, paths: Iterable[str]) -> LinkReport:
+        """
+        Index the Markdown files in ``paths`` (slugs relative to ``root``)
+        and resolve every internal link in them against the whole index.
+        """
+        docs: List[Tuple[str, str, Document]] = []
+        for p in paths:
+            slug = pathlib.Path(os.path.relpath(p, root)).with_suffix("").as_posix()
+            with open(p, "r", encoding="utf-8") as f:
+                doc = Document.parse(f.read(), p)
+            docs.append((p, slug, doc))
+            # Scanned files are the freshest view of a page
+            self.slugs[slug] = "tree"
+            self.links[slug] = internal_targets(doc)
+
+        dangling: List[Tuple[str, int, str]] = []
+        links = 0
+        for p, slug, doc in docs:
+            for target, offset in doc.internal_links:
+                t = normalize_target(target)
+                if t is None:
+                    continue
+                links += 1
+                if t not in self.slugs:
+                    dangling.append((p, doc.line_of(offset), target))
+
+        inbound: Set[str] = set()
+        for slug, targets in self.links.items():
+            inbound.update(t for t in targets if t != slug)
+        orphans = sorted(s for s in self.links if s not in inbound)
+        return LinkReport(len(self.slugs), links, dangling, orphans)
+
+
+def site_manifest(pages: Dict[str, Dict], base_url: Optional[str] = None) -> str:
+    """Manifest JSON for exported pages ({slug: {"title", "file", "links"}})."""
+    return json.dumps({"version": MANIFEST_VERSION, "base_url": base_url,
+                       "pages": dict(sorted(pages.items()))}, ensure_ascii=False, indent=2) + "\n"
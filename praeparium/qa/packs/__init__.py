@@ -0,0 +1,189 @@
+# praeparium/qa/packs/__init__.py
+"""
+Domain validation packs.
+
+A pack is a module whose ``validate_*`` functions take
+``(article_md, bundle_vars)`` and return error strings. Its module-level
+``TRIGGERS`` list names keywords (case-insensitive substrings) that must
+appear in an article before any of its validators can fail. Packs are
+found in two places:
+- modules in this package;
+- modules named by ``praeparium.validation_packs`` entry points, where the
+  entry point name is the pack name.
+
+Discovery reads each module's source with ``ast``, so no pack is imported
+until an article triggers it. ``PackRunner`` compiles the triggers of its
+packs into one PhraseMatcher. Each article is scanned once to decide which
+packs run on it; a pack without TRIGGERS runs on every article.
+"""
+from __future__ import annotations
+import ast, importlib, importlib.util, os, time
+from importlib import metadata
+from typing import Callable, Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from ..phrases import PhraseMatcher
+
+ENTRY_POINT_GROUP = "praeparium.validation_packs"
+
+Validator = Callable[[str, dict], List[str]]
+
+
+class PackSpec(NamedTuple):
+    name: str
+    module: str
+    origin: str
+    triggers: Tuple[str, ...]
+    validators: Tuple[str, ...]
+
+
+class PackTiming(NamedTuple):
+    pack: str
+    files: int
+    ran: int
+    failed: int
+    seconds: float
+
+
+def _read_spec(name: str, module: str, origin: str) -> Optional[PackSpec]:
+    """A PackSpec from the module's source, or None if it has no validators."""
+    try:
+        with open(origin, "r", encoding="utf-8-sig") as f:
+            tree = ast.parse(f.read(), origin)
+    except (OSError, SyntaxError, ValueError):
+        return None
+    triggers: Tuple[str, ...] = ()
+    validators: List[str] = []
+    for node in tree.body:
+        if isinstance(node, ast.FunctionDef) and node.name.startswith("validate_"):
+            validators.append(node.name)
+        elif isinstance(node, ast.Assign) and any(isinstance(t, ast.Name) and t.id == "TRIGGERS"
+                                                  for t in node.targets):
+            try:
+                triggers = tuple(str(t) for t in ast.literal_eval(node.value))
+            except ValueError:
+                triggers = ()
+    if not validators:
+        return None
+    return PackSpec(name, module, origin, triggers, tuple(validators))
+
+
+def _scan_package() -> List[PackSpec]:
+    specs = []
+    here = os.path.dirname(os.path.abspath(__file__))
+    for fname in sorted(os.listdir(here)):
+        stem, ext = os.path.splitext(fname)
+        if ext == ".py" and not stem.startswith("_"):
+            spec = _read_spec(stem, f"{__name__}.{stem}", os.path.join(here, fname))
+            if spec:
+                specs.append(spec)
+    return specs
+
+
+def _scan_entry_points() -> List[PackSpec]:
+    specs = []
+    for ep in metadata.entry_points(group=ENTRY_POINT_GROUP):
+        module = ep.value.split(":", 1)[0].strip()
+        try:
+            found = importlib.util.find_spec(module)
+        except (ImportError, ValueError):
+            found = None
+        if found is None or not found.origin or not found.origin.endswith(".py"):
+            print(f"[WARN] Validation pack {ep.name!r}: cannot locate module {module}")
+            continue
+        spec = _read_spec(ep.name, module, found.origin)
+        if spec:
+            specs.append(spec)
+    return specs
+
+
+_REGISTRY: Optional[Dict[str, PackSpec]] = None
+_LOADED: Dict[str, List[Validator]] = {}
+
+
+def discover(refresh: bool = False) -> Dict[str, PackSpec]:
+    """Every available pack by name; built-in packs win over entry points."""
+    global _REGISTRY
+    if _REGISTRY is None or refresh:
+        found = {s.name: s for s in _scan_entry_points()}
+        found.update({s.name: s for s in _scan_package()})
+        _REGISTRY = dict(sorted(found.items()))
+    return _REGISTRY
+
+
+def load(name: str) -> List[Validator]:
+    """Import a pack (once) and return its validator functions."""
+    fns = _LOADED.get(name)
+    if fns is None:
+        spec = discover()[name]
+        mod = importlib.import_module(spec.module)
+        fns = _LOADED[name] = [getattr(mod, v) for v in spec.validators]
+    return fns
+
+
+class PackRunner:
+    """Runs a set of packs, each only on the articles that trigger it."""
+
+    def __init__(self, names: Optional[Iterable[str]] = None, bundle_vars: Optional[dict] = None):
+        registry = discover()
+        names = list(registry) if names is None else list(names)
+        unknown = [n for n in names if n not in registry]
+        if unknown:
+            raise KeyError(f"unknown validation pack(s): {', '.join(unknown)}")
+        self.specs = [registry[n] for n in names]
+        self.bundle_vars = bundle_vars or {}
+        self.always = [s.name for s in self.specs if not s.triggers]
+        self.matcher = PhraseMatcher({s.name: s.triggers for s in self.specs if s.triggers},
+                                     whole_words=False)
+        # pack → [files, ran, failed, seconds]
+        self._timing: Dict[str, List] = {s.name: [0, 0, 0, 0.0] for s in self.specs}
+
+    def triggered(self, md: str) -> List[str]:
+        """Names of the packs whose triggers occur in ``md``, in pack order."""
+        hit = {name for h in self.matcher.finditer(md) for name in h.lists}
+        return [s.name for s in self.specs if s.name in hit or not s.triggers]
+
+    def _run(self, name: str, md: str) -> List[str]:
+        t = self._timing[name]
+        started = time.perf_counter()
+        errs: List[str] = []
+        for fn in load(name):
+            errs += fn(md, self.bundle_vars)
+        t[1] += 1
+        t[2] += bool(errs)
+        t[3] += time.perf_counter() - started
+        return errs
+
+    def run(self, md: str) -> Dict[str, List[str]]:
+        """Errors per triggered pack for one article (passing packs map to [])."""
+        for t in self._timing.values():
+            t[0] += 1
+        return {name: self._run(name, md) for name in self.triggered(md)}
+
+    def run_corpus(self, paths: Iterable[str]) -> Dict[str, Dict[str, List[str]]]:
+        """
+        Run the packs over many files, one pack at a time over the files
+        that trigger it. Returns {file: {pack: errors}} for failing files.
+        """
+        texts: Dict[str, str] = {}
+        queue: Dict[str, List[str]] = {s.name: [] for s in self.specs}
+        for p in paths:
+            with open(p, "r", encoding="utf-8") as f:
+                texts[p] = f.read()
+            for name in self.triggered(texts[p]):
+                queue[name].append(p)
+        for t in self._timing.values():
+            t[0] += len(texts)
+        failed: Dict[str, Dict[str, List[str]]] = {}
+        for name, files in queue.items():
+            for p in files:
+                errs = self._run(name, texts[p])
+                if errs:
+                    failed.setdefault(p, {})[name] = errs
+        return {p: failed[p] for p in texts if p in failed}
+
+    def timings(self) -> List[PackTiming]:
+        return [PackTiming(name, *t) for name, t in self._timing.items()]
+
+    def report(self) -> str:
+        return "\n".join(f"[TIMING] pack {t.pack}: ran on {t.ran}/{t.files} file(s), "
+                         f"{t.failed} failed, {t.seconds * 1000:.1f} ms" for t in self.timings())
@@ -1,5 +1,8 @@
 ﻿from __future__ import annotations
 
+# Every validator here is a no-op unless one of these occurs in the article
+TRIGGERS = ["PFAS"]
+
 def validate_pfas_claim(article_md: str, bundle_vars: dict) -> list[str]:
     errors = []
     mentions_pfas = "PFAS" in article_md.upper()
@@ -0,0 +1,203 @@
+# praeparium/qa/phrases.py
+"""
+One matcher for every phrase list QA cares about.
+
+Modules register their lists (checks.FILLER, jargon.BANNED,
+style.BAD_PHRASES); user lists come from $PRAEPARIUM_PHRASE_LISTS, a
+path-separated list of text files with one phrase per line (``#`` starts a
+comment). A user list is named ``user:<file stem>``, so a file called
+filler.txt adds to QA rather than replacing the built-in filler list. All of them are compiled into a
+single trie-shaped regex, so a document is scanned once however many
+phrases there are, and each hit reports its position and every list the
+phrase belongs to.
+
+Phrases match case-insensitively on word boundaries, except in lists
+registered with ``case_sensitive=True``. Hits may overlap: every phrase
+that starts at a position and ends on a word boundary is reported, so a
+longer phrase from one list never hides a shorter one from another. A
+matcher built with ``whole_words=False`` matches anywhere in a word.
+Scanning cost grows with the text, not with the number of phrases.
+"""
+from __future__ import annotations
+import os, pathlib, re
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+# A list entry may be written as a literal or as \b-wrapped regex literal
+_WRAPPED = re.compile(r"^\\b(.*)\\b$")
+_ESCAPE = re.compile(r"\\(.)")
+_META = re.compile(r"(?<!\\)[.^$*+?{}\[\]|()]")
+_WORD = re.compile(r"\w")
+
+
+class PhraseHit(NamedTuple):
+    start: int
+    end: int
+    text: str
+    lists: Tuple[str, ...]
+
+
+def literal_phrase(entry: str) -> str:
+    """The plain phrase behind a list entry (``\\bIn summary\\b`` → ``In summary``)."""
+    m = _WRAPPED.match(entry)
+    if not m:
+        return entry
+    body = m.group(1)
+    if _META.search(body) or "\\b" in body:
+        raise ValueError(f"phrase list entry is not a plain phrase: {entry!r}")
+    return _ESCAPE.sub(r"\1", body)
+
+
+def _trie_pattern(phrases: Iterable[str]) -> str:
+    trie: Dict = {}
+    for p in phrases:
+        node = trie
+        for ch in p:
+            node = node.setdefault(ch, {})
+        node[""] = None
+
+    def build(node: Dict) -> str:
+        alts = [re.escape(ch) + build(child) for ch, child in sorted(node.items(), key=lambda kv: kv[0]) if ch]
+        if not alts:
+            return ""
+        body = alts[0] if len(alts) == 1 else "(?:" + "|".join(alts) + ")"
+        if "" in node:
+            # Optional continuation keeps the match greedy: longest phrase first
+            body = (f"(?:{body})?" if len(alts) == 1 else body + "?")
+        return body
+
+    return build(trie)
+
+
+class PhraseMatcher:
+    """Compiled matcher over ``lists`` (name → phrases)."""
+
+    def __init__(self, lists: Dict[str, Iterable[str]], case_sensitive: Iterable[str] = (),
+                 whole_words: bool = True):
+        sensitive = set(case_sensitive)
+        # lower-cased phrase → [(list, original, case_sensitive)]
+        self._owners: Dict[str, List[Tuple[str, str, bool]]] = {}
+        for name, entries in lists.items():
+            for entry in entries:
+                phrase = literal_phrase(entry)
+                if phrase:
+                    self._owners.setdefault(phrase.lower(), []).append((name, phrase, name in sensitive))
+        self.lists = list(lists)
+        self.size = len(self._owners)
+        self.whole_words = whole_words
+        # phrase → the phrases it starts with (itself included), shortest first
+        self._prefixes = {p: [p[:i] for i in range(1, len(p) + 1) if p[:i] in self._owners]
+                          for p in self._owners}
+        pattern = _trie_pattern(self._owners)
+        if pattern and whole_words:
+            pattern = rf"(?:{pattern})(?!\w)"
+        # Matched against lower-cased text: a trie that starts with plain
+        # characters lets the regex engine skip ahead to candidate starts
+        self._rx = re.compile(pattern) if pattern else None
+        self._rx_i: Optional[re.Pattern] = None
+
+    def finditer(self, text: str, lists: Optional[Iterable[str]] = None) -> Iterator[PhraseHit]:
+        if self._rx is None:
+            return
+        only = set(lists) if lists is not None else None
+        rx, haystack = self._rx, text.lower()
+        if len(haystack) != len(text):
+            # Lower-casing moved offsets (e.g. "İ"); match case-insensitively instead
+            if self._rx_i is None:
+                self._rx_i = re.compile(self._rx.pattern, re.I)
+            rx, haystack = self._rx_i, text
+        pos = 0
+        while True:
+            # Restart one past each hit so overlapping phrases are found too
+            m = rx.search(haystack, pos)
+            if m is None:
+                return
+            start, end = m.span()
+            pos = start + 1
+            if self.whole_words and start and _WORD.match(haystack, start - 1):
+                continue
+            # Shorter phrases at the same start are hits too (when whole
+            # words, only those that end on a word boundary)
+            key = haystack[start:end].lower()
+            stops = [start + len(p) for p in self._prefixes[key]] if key in self._prefixes else [end]
+            for stop in stops:
+                if self.whole_words and stop < end and _WORD.match(haystack, stop):
+                    continue
+                hit = self._hit(text, start, stop, only)
+                if hit:
+                    yield hit
+
+    def _hit(self, text: str, start: int, end: int, only: Optional[set]) -> Optional[PhraseHit]:
+        found = text[start:end]
+        names = tuple(name for name, phrase, cs in self._owners.get(found.lower(), ())
+                      if (not cs or found == phrase) and (only is None or name in only))
+        return PhraseHit(start, end, found, names) if names else None
+
+    def find(self, text: str, lists: Optional[Iterable[str]] = None) -> List[PhraseHit]:
+        return list(self.finditer(text, lists))
+
+    def search(self, text: str, lists: Optional[Iterable[str]] = None) -> Optional[PhraseHit]:
+        return next(self.finditer(text, lists), None)
+
+    def counts(self, text: str) -> Dict[str, int]:
+        out = {name: 0 for name in self.lists}
+        for hit in self.finditer(text):
+            for name in hit.lists:
+                out[name] += 1
+        return out
+
+
+# --- registry of built-in and user lists ---
+_LISTS: Dict[str, List[str]] = {}
+_CASE_SENSITIVE: set = set()
+_MATCHER: Optional[Tuple[str, PhraseMatcher]] = None
+_USER: List = [None, {}]
+USER_PREFIX = "user:"
+
+
+def register_list(name: str, phrases: Iterable[str], case_sensitive: bool = False) -> None:
+    """Add (or replace) a named phrase list in the shared matcher."""
+    global _MATCHER
+    _LISTS[name] = list(phrases)
+    if case_sensitive:
+        _CASE_SENSITIVE.add(name)
+    else:
+        _CASE_SENSITIVE.discard(name)
+    _MATCHER = None
+
+
+def document_hits(doc) -> List[PhraseHit]:
+    """Hits of the shared matcher in a qa.document.Document, computed once per document."""
+    hits = doc.memo.get("phrases")
+    if hits is None:
+        hits = doc.memo["phrases"] = get_matcher().find(doc.text)
+    return hits
+
+
+def load_phrase_file(path: str | os.PathLike) -> List[str]:
+    out = []
+    for line in pathlib.Path(path).read_text(encoding="utf-8-sig").splitlines():
+        line = line.split("#", 1)[0].strip()
+        if line:
+            out.append(line)
+    return out
+
+
+def _user_lists(spec: str) -> Dict[str, List[str]]:
+    return {USER_PREFIX + pathlib.Path(p).stem: load_phrase_file(p) for p in spec.split(os.pathsep) if p}
+
+
+def user_lists() -> Dict[str, List[str]]:
+    """The lists named by $PRAEPARIUM_PHRASE_LISTS (as loaded by get_matcher), keyed "user:<stem>"."""
+    get_matcher()
+    return _USER[1]
+
+
+def get_matcher() -> PhraseMatcher:
+    """The shared matcher over every registered list plus the user lists."""
+    global _MATCHER
+    spec = os.getenv("PRAEPARIUM_PHRASE_LISTS", "")
+    if _MATCHER is None or _MATCHER[0] != spec:
+        if _USER[0] != spec:
+            _USER[:] = [spec, _user_lists(spec)]
+        _MATCHER = (spec, PhraseMatcher({**_LISTS, **_USER[1]}, _CASE_SENSITIVE))
+    return _MATCHER[1]
@@ -0,0 +1,130 @@
+# praeparium/qa/report.py
+"""
+Machine-readable QA results with per-check timing.
+
+A ``QAReport`` collects one record per (suite, file, check). Suites are
+"qa" for audit_path rules, "style" for run_style_checks, "claims" for
+check_claims and "bundle" for audit_bundle. Each record carries the check's
+wall time and errors. Files whose QA result came from the cache get one
+"(cached)" record with no timing.
+
+``summary`` aggregates the records:
+- count, total, mean, p50/p90/p99 and max time per check, plus failures;
+- p50/p90/p99 and max of per-file totals;
+- the top-N slowest checks (by total time) and slowest files.
+
+``write_jsonl`` writes one record per line followed by the summary.
+``write_junit`` writes one testsuite per suite and one testcase per check,
+with the file as its classname.
+"""
+from __future__ import annotations
+import json, time
+import xml.etree.ElementTree as ET
+from typing import Any, Callable, Dict, List, Optional
+
+from ..utils.outputs import OutputWriter
+from ..utils.stats import percentile
+
+
+class QAReport:
+    def __init__(self, top: int = 10):
+        self.top = top
+        self.records: List[Dict[str, Any]] = []
+        self.started = time.time()
+
+    def add(self, suite: str, file: str, check: str, seconds: float, errors: List[str],
+            cached: bool = False, warnings: Optional[List[str]] = None) -> None:
+        rec = {"type": "check", "suite": suite, "file": file, "check": check,
+               "seconds": round(seconds, 6), "passed": not errors, "errors": list(errors)}
+        if cached:
+            rec["cached"] = True
+        if warnings:
+            rec["warnings"] = list(warnings)
+        self.records.append(rec)
+
+    def timed(self, suite: str, file: str, check: str, fn: Callable[[], List[str]]) -> List[str]:
+        """Run ``fn`` (returning errors), record it and pass its errors through."""
+        started = time.perf_counter()
+        errs = fn()
+        self.add(suite, file, check, time.perf_counter() - started, errs)
+        return errs
+
+    def summary(self) -> Dict[str, Any]:
+        timed = [r for r in self.records if not r.get("cached")]
+        by_check: Dict[str, List[Dict[str, Any]]] = {}
+        by_file: Dict[str, float] = {}
+        for r in timed:
+            by_check.setdefault(f"{r['suite']}:{r['check']}", []).append(r)
+            by_file[r["file"]] = by_file.get(r["file"], 0.0) + r["seconds"]
+        checks = {}
+        for name, recs in by_check.items():
+            secs = [r["seconds"] for r in recs]
+            checks[name] = {"count": len(secs), "total": round(sum(secs), 6),
+                            "mean": round(sum(secs) / len(secs), 6),
+                            "p50": round(percentile(secs, 50), 6), "p90": round(percentile(secs, 90), 6),
+                            "p99": round(percentile(secs, 99), 6), "max": round(max(secs), 6),
+                            "failed": sum(1 for r in recs if not r["passed"])}
+        totals = list(by_file.values())
+        files = {r["file"] for r in self.records}
+        return {
+            "type": "summary",
+            "files": len(files),
+            "cached_files": len({r["file"] for r in self.records if r.get("cached")}),
+            "failed_files": len({r["file"] for r in self.records if not r["passed"]}),
+            "checks": checks,
+            "per_file": ({"p50": round(percentile(totals, 50), 6), "p90": round(percentile(totals, 90), 6),
+                          "p99": round(percentile(totals, 99), 6), "max": round(max(totals), 6)}
+                         if totals else {}),
+            "slowest_checks": [{"check": n, "total": c["total"], "p90": c["p90"]}
+                               for n, c in sorted(checks.items(), key=lambda kv: -kv[1]["total"])[:self.top]],
+            "slowest_files": [{"file": f, "seconds": round(s, 6)}
+                              for f, s in sorted(by_file.items(), key=lambda kv: -kv[1])[:self.top]],
+            "started": self.started,
+        }
+
+    def timing_lines(self) -> List[str]:
+        s = self.summary()
+        lines = [f"[TIMING] slowest check: {c['check']} total {c['total'] * 1000:.1f} ms, "
+                 f"p90 {c['p90'] * 1000:.2f} ms" for c in s["slowest_checks"]]
+        lines += [f"[TIMING] slowest file: {f['file']} {f['seconds'] * 1000:.1f} ms" for f in s["slowest_files"]]
+        return lines
+
+    def jsonl(self) -> str:
+        rows = self.records + [self.summary()]
+        return "".join(json.dumps(r, ensure_ascii=False) + "\n" for r in rows)
+
+    def junit(self) -> str:
+        root = ET.Element("testsuites", name="praeparium-qa")
+        suites: Dict[str, ET.Element] = {}
+        counts: Dict[str, List[float]] = {}
+        for r in self.records:
+            suite = suites.get(r["suite"])
+            if suite is None:
+                suite = suites[r["suite"]] = ET.SubElement(root, "testsuite", name=r["suite"])
+                counts[r["suite"]] = [0, 0, 0.0]
+            case = ET.SubElement(suite, "testcase", classname=r["file"], name=r["check"],
+                                 time=f"{r['seconds']:.6f}")
+            c = counts[r["suite"]]
+            c[0] += 1
+            c[2] += r["seconds"]
+            if r["errors"]:
+                c[1] += 1
+                fail = ET.SubElement(case, "failure", message=r["errors"][0])
+                fail.text = "\n".join(r["errors"])
+            if r.get("cached"):
+                ET.SubElement(case, "system-out").text = "result reused from the QA cache"
+        for name, suite in suites.items():
+            tests, failures, secs = counts[name]
+            suite.set("tests", str(tests))
+            suite.set("failures", str(failures))
+            suite.set("time", f"{secs:.6f}")
+        ET.indent(root)
+        return '<?xml version="1.0" encoding="UTF-8"?>\n' + ET.tostring(root, encoding="unicode") + "\n"
+
+    def write_jsonl(self, path: str) -> None:
+        with OutputWriter() as out:
+            out.write_text(path, self.jsonl())
+
+    def write_junit(self, path: str) -> None:
+        with OutputWriter() as out:
+            out.write_text(path, self.junit())
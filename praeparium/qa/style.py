@@ -1,6 +1,17 @@
 ﻿from __future__ import annotations
-import re
-from textstat import flesch_kincaid_grade
+import bisect, csv, hashlib, json, re
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional
+
+from ..utils.stats import percentile
+from .phrases import get_matcher, register_list
+
+# Optional dependency: numpy (vectorised corpus aggregates)
+try:
+    import numpy as np
+except Exception:
+    np = None
 
 BAD_PHRASES = [
     r"\bAs an AI\b",
@@ -9,42 +20,108 @@ BAD_PHRASES = [
     r"\bcutting-edge\b",
 ]
 
+register_list("ai_phrasing", BAD_PHRASES, case_sensitive=True)
+
+_SENTENCE_END = re.compile(r"[.!?]\s+")
+_WORD_CHAR = re.compile(r"\w")
+# Matched on lower-cased text; the leading word boundary is checked by hand,
+# which keeps the pattern's literal prefix fast to scan for
+_PASSIVE = re.compile(r"(?:be|been|being|is|was|were|are)\b\s+\w+ed\b")
+_PASSIVE_I = re.compile(r"\b(be|been|being|is|was|were|are)\b\s+\w+ed\b", re.I)
+_PUNCT = "\"'“”‘’()[]{}<>*_`~#|.,;:!?-–—/\\"
+_VOWEL_GROUPS = re.compile(r"[aeiouy]+")
+# Endings that usually add no syllable: "makes", "stored", "rate"
+_SILENT_END = re.compile(r"(?:[^laeiouysxzcg]es|[^laeiouytd]ed|[^laeiouy]e)$")
+
+# Documents scored recently, by content hash
+METRICS_CACHE_SIZE = 2048
+_METRICS: "OrderedDict[str, StyleMetrics]" = OrderedDict()
+
+
+class StyleMetrics(NamedTuple):
+    sentences: int
+    words: int
+    syllables: int
+    passive_sentences: int
+    bad_phrases: int
+    fk_grade: float
+    active_voice_ratio: float
+    score: float
+
+
+@lru_cache(maxsize=65536)
+def _syllables(token: str) -> int:
+    """Syllables in a whitespace-separated token; 0 when it holds no word."""
+    w = token.strip(_PUNCT).lower().replace("'", "").replace("’", "")
+    if not w or not any(c.isalnum() for c in w):
+        return 0
+    if len(w) <= 3:
+        return 1
+    w = _SILENT_END.sub(lambda m: m.group(0)[0], w)
+    if w.startswith("y"):
+        w = w[1:]
+    return max(1, len(_VOWEL_GROUPS.findall(w)))
+
+
+def _analyze(text: str) -> StyleMetrics:
+    # One pass each over sentences, words and phrases, shared by every metric
+    body = text.strip()
+    ends = [m.end() for m in _SENTENCE_END.finditer(body)]
+    sentences = len(ends) + 1
+    per_token = [n for n in map(_syllables, body.split()) if n]
+    words, syllables = len(per_token), sum(per_token)
+    low = body.lower()
+    if len(low) == len(body):
+        starts = [m.start() for m in _PASSIVE.finditer(low)
+                  if not (m.start() and _WORD_CHAR.match(low, m.start() - 1))]
+    else:
+        starts = [m.start() for m in _PASSIVE_I.finditer(body)]
+    passive = len({bisect.bisect_right(ends, s) for s in starts})
+    bad = sum(1 for _ in get_matcher().finditer(text, ["ai_phrasing"]))
+
+    if words:
+        fk = round(0.39 * words / sentences + 11.8 * syllables / words - 15.59, 2)
+    else:
+        fk = 0.0
+    av = max(0.0, 1.0 - (passive / max(1, sentences)))
+    # Simple blend: 0–1
+    score = 0.5 * max(0, (8.0 - min(fk, 16.0)) / 8.0) + 0.5 * av
+    if bad > 0: score -= 0.1 * bad
+    score = max(0.0, min(1.0, score))
+    return StyleMetrics(sentences, words, syllables, passive, bad, fk, av, score)
+
+
+def analyze(text: str) -> StyleMetrics:
+    """Style metrics for ``text``; repeat calls on the same text are cached."""
+    key = hashlib.sha1(text.encode("utf-8")).hexdigest()
+    m = _METRICS.get(key)
+    if m is None:
+        m = _METRICS[key] = _analyze(text)
+        if len(_METRICS) > METRICS_CACHE_SIZE:
+            _METRICS.popitem(last=False)
+    else:
+        _METRICS.move_to_end(key)
+    return m
+
+
 def compute_fk_grade(text: str) -> float:
-    try:
-        return float(flesch_kincaid_grade(text))
-    except Exception:
-        return 12.0
+    return analyze(text).fk_grade
 
 def active_voice_ratio(text: str) -> float:
     # Heuristic: penalize passive markers
-    sents = re.split(r"[.!?]\s+", text.strip())
-    if not sents: return 1.0
-    passive = sum(1 for s in sents if re.search(r"\b(be|been|being|is|was|were|are)\b\s+\w+ed\b", s, re.I))
-    return max(0.0, 1.0 - (passive / max(1, len(sents))))
+    return analyze(text).active_voice_ratio
 
 def bad_phrase_count(text: str) -> int:
-    total = 0
-    for p in BAD_PHRASES:
-        total += len(re.findall(p, text))
-    return total
+    return analyze(text).bad_phrases
 
 def compute_style_score(text: str) -> float:
-    fk = compute_fk_grade(text)
-    av = active_voice_ratio(text)
-    bad = bad_phrase_count(text)
-    # Simple blend: 0–1
-    score = 0.5 * max(0, (8.0 - min(fk, 16.0)) / 8.0) + 0.5 * av
-    if bad > 0: score -= 0.1 * bad
-    return max(0.0, min(1.0, score))
+    return analyze(text).score
 
-def run_style_checks(text: str) -> dict:
-    fk = compute_fk_grade(text)
-    av = active_voice_ratio(text)
-    bad = bad_phrase_count(text)
-    score = compute_style_score(text)
+def _verdict(m: StyleMetrics) -> dict:
+    fk, score, bad = m.fk_grade, m.score, m.bad_phrases
     return {
         "fk_grade": fk,
-        "active_voice_ratio": av,
+        "active_voice_ratio": m.active_voice_ratio,
         "bad_phrase_count": bad,
         "narrative_style_score": score,
         "qa_pass": (fk <= 8.0 and score >= 0.85 and bad == 0),
@@ -54,3 +131,60 @@ def run_style_checks(text: str) -> dict:
             *(["Filler/AI phrasing present"] if bad > 0 else []),
         ]
     }
+
+def run_style_checks(text: str) -> dict:
+    return _verdict(analyze(text))
+
+
+# --- corpus scoring ---
+TABLE_COLUMNS = ["file", "words", "sentences", "syllables", "passive_sentences", "fk_grade",
+                 "active_voice_ratio", "bad_phrase_count", "narrative_style_score", "qa_pass"]
+
+
+def _aggregate(rows: List[Dict[str, Any]]) -> Dict[str, Any]:
+    summary: Dict[str, Any] = {"files": len(rows)}
+    if not rows:
+        return summary
+    cols = ("fk_grade", "active_voice_ratio", "narrative_style_score", "words")
+    if np is not None:
+        for col in cols:
+            a = np.fromiter((r[col] for r in rows), dtype=float, count=len(rows))
+            p50, p90 = np.percentile(a, [50, 90])
+            summary[col] = {"mean": float(a.mean()), "p50": float(p50), "p90": float(p90)}
+        summary["pass_rate"] = float(np.mean([r["qa_pass"] for r in rows]))
+    else:
+        for col in cols:
+            vals = [float(r[col]) for r in rows]
+            summary[col] = {"mean": sum(vals) / len(vals), "p50": percentile(vals, 50),
+                            "p90": percentile(vals, 90)}
+        summary["pass_rate"] = sum(r["qa_pass"] for r in rows) / len(rows)
+    return summary
+
+
+def score_corpus(paths: Iterable[str], out: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Score every Markdown file in ``paths`` and aggregate the corpus
+    (mean/p50/p90 per metric, pass rate; with NumPy when installed). With
+    ``out`` the per-article table is written as CSV, or JSON Lines when the
+    name ends in .jsonl. Returns {"rows": [...], "summary": {...}}.
+    """
+    rows: List[Dict[str, Any]] = []
+    for p in paths:
+        with open(p, "r", encoding="utf-8") as f:
+            m = analyze(f.read())
+        v = _verdict(m)
+        rows.append({"file": p, "words": m.words, "sentences": m.sentences, "syllables": m.syllables,
+                     "passive_sentences": m.passive_sentences, "fk_grade": m.fk_grade,
+                     "active_voice_ratio": round(m.active_voice_ratio, 4),
+                     "bad_phrase_count": m.bad_phrases,
+                     "narrative_style_score": round(m.score, 4), "qa_pass": v["qa_pass"]})
+    if out:
+        with open(out, "w", encoding="utf-8", newline="") as f:
+            if out.lower().endswith(".jsonl"):
+                for r in rows:
+                    f.write(json.dumps(r, ensure_ascii=False) + "\n")
+            else:
+                w = csv.DictWriter(f, fieldnames=TABLE_COLUMNS)
+                w.writeheader()
+                w.writerows(rows)
+    return {"rows": rows, "summary": _aggregate(rows)}
@@ -0,0 +1,221 @@
+# praeparium/serve.py
+"""
+Long-lived worker that keeps the LLM client, the sop3 Jinja environment and
+the compiled QA rules warm between jobs, so repeated generate/render/qa/export
+calls skip interpreter start-up, imports and client construction.
+
+    praeparium serve                              # JSON lines on stdin/stdout
+    praeparium serve --socket /tmp/praeparium.sock
+
+One request per line:
+
+    {"id": 1, "op": "generate", "plan": "data/sourcepacks/water.json", "out": "out"}
+    {"id": 2, "op": "render", "bundle": "data/bundles/water.yaml", "out": "out", "incremental": true}
+    {"id": 3, "op": "qa", "path": "out", "jobs": 4, "timings": true}
+    {"id": 4, "op": "export", "src": "out", "out": "site", "base_url": "https://www.praeparium.com"}
+    {"id": 5, "op": "stats"}
+    {"id": 6, "op": "shutdown"}
+
+One response per line: {"id", "ok", "result", "log", "elapsed_s"}, plus
+"error" when the job could not run. Whatever a job prints is captured into
+"log", so stdout carries protocol lines only. Jobs run one at a time.
+A qa job with "timings" adds the QAReport summary (per-check percentiles,
+slowest checks and files) to its result.
+"""
+from __future__ import annotations
+import contextlib, io, json, os, socketserver, sys, threading, time
+from typing import Any, Callable, Dict, IO, List, Optional
+
+from .export.wordpress import export_dir
+from .llm.backends import Backend, get_backend
+from .llm.batch import expand_sourcepacks, generate_batch, is_batch_spec
+from .llm.cache import ResponseCache
+from .qa.cache import QAResultCache
+from .qa.checks import audit_path, ruleset_digest
+from .qa.report import QAReport
+from .sop3.engine import get_engine
+from .sop3.render import render_bundle
+from .writer import _load_prompt, write_from_sourcepack
+
+
+class JobError(Exception):
+    """A request that cannot be run (unknown op, missing field)."""
+
+
+def _field(job: Dict[str, Any], name: str) -> Any:
+    if job.get(name) in (None, ""):
+        raise JobError(f"missing field '{name}'")
+    return job[name]
+
+
+class Worker:
+    """Executes protocol jobs against state built once in ``warm()``."""
+
+    def __init__(self):
+        self.backend: Optional[Backend] = None
+        self.engine = None
+        self.qa_cache: Optional[QAResultCache] = None
+        self.started = time.monotonic()
+        self.stopping = False
+        self.timings: Dict[str, List[float]] = {}
+        self._lock = threading.Lock()
+        self._ops: Dict[str, Callable[[Dict[str, Any]], tuple]] = {
+            "generate": self._generate,
+            "render": self._render,
+            "qa": self._qa,
+            "export": self._export,
+            "stats": self._stats,
+            "ping": lambda job: (True, "pong"),
+            "shutdown": self._shutdown,
+        }
+
+    def warm(self) -> str:
+        """Build the client and template environment up front; returns a status line."""
+        buf = io.StringIO()
+        with contextlib.redirect_stdout(buf):
+            self.backend = get_backend()
+            _load_prompt()
+            self.engine = get_engine()
+            templates = self.engine.warm()
+        backend = self.backend.name if self.backend else "none (" + buf.getvalue().strip() + ")"
+        return f"[OK] Worker ready: backend {backend}, {templates} template(s) loaded"
+
+    # --- jobs: each returns (ok, result) ---
+    def _generate(self, job):
+        plan = _field(job, "plan")
+        out = job.get("out") or "out"
+        if not (is_batch_spec(plan) or plan.lower().endswith(".json")):
+            return self._render({**job, "bundle": plan, "out": out})
+        cache = ResponseCache(enabled=not job.get("no_cache"), refresh=bool(job.get("refresh")))
+        if is_batch_spec(plan):
+            paths = expand_sourcepacks(plan)
+            if not paths:
+                raise JobError(f"No Source Packs matched {plan}")
+            results = generate_batch(paths, out, concurrency=int(job.get("concurrency", 4)),
+                                     rpm=job.get("rpm") or None, tpm=job.get("tpm") or None,
+                                     cache=cache, max_retries=int(job.get("retries", 4)),
+                                     backend=self.backend, hedge=bool(job.get("hedge")))
+        else:
+            ok = write_from_sourcepack(plan, out, cache=cache, stream=bool(job.get("stream")),
+                                       backend=self.backend, retries=int(job.get("retries", 4)),
+                                       hedge=bool(job.get("hedge")))
+            results = {plan: ok}
+        failed = [p for p, good in results.items() if not good]
+        return not failed, {"generated": len(results) - len(failed), "failed": failed,
+                            "cache": cache.summary()}
+
+    def _render(self, job):
+        ok = render_bundle(_field(job, "bundle"), job.get("out") or "out", engine=self.engine,
+                           incremental=bool(job.get("incremental")), jobs=int(job.get("jobs", 1)))
+        return ok, {"rendered": ok}
+
+    def _qa(self, job):
+        if job.get("no_cache"):
+            cache = QAResultCache(ruleset_digest(), enabled=False)
+        else:
+            # Kept between jobs so repeat QA runs skip re-reading the index
+            if self.qa_cache is None or self.qa_cache.ruleset != ruleset_digest():
+                self.qa_cache = QAResultCache(ruleset_digest())
+            cache = self.qa_cache
+        report = QAReport(top=int(job.get("top", 10))) if job.get("timings") else None
+        failed = audit_path(job.get("path") or "out", jobs=int(job.get("jobs", 1)), cache=cache, report=report)
+        if report is not None:
+            return not failed, {"failed": failed, "report": report.summary()}
+        return not failed, {"failed": failed}
+
+    def _export(self, job):
+        written = export_dir(_field(job, "src"), _field(job, "out"), job.get("base_url"))
+        return True, {"written": written}
+
+    def _stats(self, job):
+        ops = {
+            op: {"jobs": len(ts), "total_s": round(sum(ts), 3), "avg_s": round(sum(ts) / len(ts), 3)}
+            for op, ts in self.timings.items()
+        }
+        return True, {"uptime_s": round(time.monotonic() - self.started, 1),
+                      "backend": self.backend.name if self.backend else None, "ops": ops,
+                      "templates": self.engine.stats if self.engine else {}}
+
+    def _shutdown(self, job):
+        self.stopping = True
+        return True, "bye"
+
+    # --- protocol ---
+    def handle(self, job: Dict[str, Any]) -> Dict[str, Any]:
+        op = job.get("op")
+        resp: Dict[str, Any] = {"id": job.get("id"), "op": op}
+        fn = self._ops.get(op)
+        buf = io.StringIO()
+        started = time.monotonic()
+        with self._lock:
+            try:
+                if fn is None:
+                    raise JobError(f"unknown op {op!r} (expected one of {', '.join(self._ops)})")
+                with contextlib.redirect_stdout(buf):
+                    ok, result = fn(job)
+                resp.update(ok=bool(ok), result=result)
+            except Exception as e:
+                resp.update(ok=False, result=None, error=f"{type(e).__name__}: {e}")
+            elapsed = time.monotonic() - started
+            if fn is not None:
+                self.timings.setdefault(op, []).append(elapsed)
+        resp["log"] = buf.getvalue().splitlines()
+        resp["elapsed_s"] = round(elapsed, 4)
+        return resp
+
+    def handle_line(self, line: str) -> Optional[str]:
+        line = line.strip()
+        if not line:
+            return None
+        try:
+            job = json.loads(line)
+            if not isinstance(job, dict):
+                raise ValueError("request must be a JSON object")
+        except ValueError as e:
+            resp = {"id": None, "ok": False, "result": None, "error": f"bad request: {e}", "log": []}
+        else:
+            resp = self.handle(job)
+        return json.dumps(resp, ensure_ascii=False)
+
+    def close(self) -> None:
+        if self.backend is not None:
+            self.backend.close()
+
+
+def serve_stdio(worker: Worker, stdin: IO[str] = None, stdout: IO[str] = None) -> None:
+    stdin = stdin or sys.stdin
+    stdout = stdout or sys.stdout
+    for line in stdin:
+        out = worker.handle_line(line)
+        if out is not None:
+            stdout.write(out + "\n")
+            stdout.flush()
+        if worker.stopping:
+            break
+
+
+def serve_socket(worker: Worker, path: str) -> None:
+    if not hasattr(socketserver, "UnixStreamServer"):
+        raise OSError("Unix sockets are not available on this platform; use stdin mode")
+
+    class Handler(socketserver.StreamRequestHandler):
+        def handle(self):
+            for raw in self.rfile:
+                out = worker.handle_line(raw.decode("utf-8"))
+                if out is not None:
+                    self.wfile.write((out + "\n").encode("utf-8"))
+                    self.wfile.flush()
+                if worker.stopping:
+                    threading.Thread(target=server.shutdown, daemon=True).start()
+                    break
+
+    if os.path.exists(path):
+        os.unlink(path)  # stale socket from a previous worker
+    server = socketserver.ThreadingUnixStreamServer(path, Handler)
+    server.daemon_threads = True
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+        if os.path.exists(path):
+            os.unlink(path)
@@ -0,0 +1,229 @@
+# praeparium/sop3/engine.py
+"""
+Managed template engine for sop3 rendering.
+
+One Environment per template directory is shared by every render in the
+process. Compiled templates persist between processes in an on-disk
+bytecode cache; Jinja keys each entry on the template name and checks it
+against a hash of the template source, so editing a template invalidates
+its entry automatically.
+
+For deployments, templates can also be precompiled into importable Python
+modules once at build time:
+
+    praeparium templates-compile .praeparium/templates_compiled
+
+A precompiled directory is only used while its manifest of source hashes
+still matches the templates on disk; otherwise rendering falls back to
+the sources (and the bytecode cache) with a warning.
+"""
+from __future__ import annotations
+import hashlib, json, os, pathlib, time
+from itertools import islice
+from typing import Any, Dict, Iterator, Optional
+
+from jinja2 import (ChoiceLoader, Environment, FileSystemBytecodeCache, FileSystemLoader,
+                    ModuleLoader, StrictUndefined)
+
+TEMPLATE_DIR = pathlib.Path(__file__).parent / "templates"
+DEFAULT_BYTECODE_DIR = os.path.join(".praeparium", "cache", "jinja")
+DEFAULT_MODULE_DIR = os.path.join(".praeparium", "templates_compiled")
+MANIFEST_NAME = "templates.json"
+# Template output fragments per block yielded by TemplateEngine.generate
+STREAM_BLOCK = 2048
+
+ENV_OPTIONS = dict(
+    undefined=StrictUndefined,
+    autoescape=False,
+    trim_blocks=True,
+    lstrip_blocks=True,
+)
+
+
+def _is_template(name: str) -> bool:
+    return name.endswith(".j2")
+
+
+def template_hashes(template_dir: str | os.PathLike) -> Dict[str, str]:
+    """sha256 of every template source under ``template_dir``, keyed by name."""
+    root = pathlib.Path(template_dir)
+    return {
+        p.relative_to(root).as_posix(): hashlib.sha256(p.read_bytes()).hexdigest()
+        for p in sorted(root.rglob("*.j2"))
+    }
+
+
+class _CountingBytecodeCache(FileSystemBytecodeCache):
+    """Records the keys of buckets that were served from disk."""
+
+    def __init__(self, directory: str):
+        os.makedirs(directory, exist_ok=True)
+        super().__init__(directory)
+        self.hits: set[str] = set()
+
+    def load_bytecode(self, bucket) -> None:
+        super().load_bytecode(bucket)
+        if bucket.code is not None:
+            self.hits.add(bucket.key)
+
+
+class TemplateEngine:
+    """
+    Shared Environment plus per-template instrumentation: ``stats[name]``
+    holds how the template was obtained ("source", "bytecode" or "module"),
+    the time spent loading/compiling it, and the count and total time of
+    its renders.
+    """
+
+    def __init__(self, template_dir: str | os.PathLike = TEMPLATE_DIR,
+                 bytecode_dir: Optional[str] = None, module_dir: Optional[str] = None):
+        self.template_dir = str(template_dir)
+        if bytecode_dir is None:
+            bytecode_dir = os.getenv("PRAEPARIUM_JINJA_CACHE_DIR", DEFAULT_BYTECODE_DIR)
+        if module_dir is None:
+            module_dir = os.getenv("PRAEPARIUM_TEMPLATE_MODULES", DEFAULT_MODULE_DIR)
+
+        self._sources = FileSystemLoader(self.template_dir)
+        self.module_dir = module_dir if module_dir and self._modules_current(module_dir) else None
+        loader = (ChoiceLoader([ModuleLoader(self.module_dir), self._sources])
+                  if self.module_dir else self._sources)
+        # bytecode_dir="" disables the on-disk cache
+        self.bytecode = _CountingBytecodeCache(bytecode_dir) if bytecode_dir else None
+        self.env = Environment(loader=loader, bytecode_cache=self.bytecode, **ENV_OPTIONS)
+        self.stats: Dict[str, Dict[str, Any]] = {}
+
+    def _modules_current(self, module_dir: str) -> bool:
+        manifest = pathlib.Path(module_dir) / MANIFEST_NAME
+        if not manifest.is_file():
+            return False
+        try:
+            recorded = json.loads(manifest.read_text(encoding="utf-8"))
+        except ValueError:
+            recorded = None
+        if recorded != template_hashes(self.template_dir):
+            print(f"[WARN] Precompiled templates in {module_dir} are stale; rendering from source")
+            return False
+        return True
+
+    def get_template(self, name: str):
+        st = self.stats.get(name)
+        if st is not None:
+            return self.env.get_template(name)
+        started = time.perf_counter()
+        tmpl = self.env.get_template(name)
+        elapsed = time.perf_counter() - started
+        if self.module_dir:
+            origin = "module"
+        elif self.bytecode and self.bytecode.get_cache_key(name, tmpl.filename) in self.bytecode.hits:
+            origin = "bytecode"
+        else:
+            origin = "source"
+        self.stats[name] = {"origin": origin, "load_s": elapsed, "renders": 0, "render_s": 0.0}
+        return tmpl
+
+    def render(self, name: str, /, **ctx) -> str:
+        # ``name`` is positional-only so a context variable "name" reaches the template
+        tmpl = self.get_template(name)
+        started = time.perf_counter()
+        out = tmpl.render(**ctx)
+        st = self.stats[name]
+        st["renders"] += 1
+        st["render_s"] += time.perf_counter() - started
+        return out
+
+    def generate(self, name: str, block: int = STREAM_BLOCK, /, **ctx) -> Iterator[str]:
+        """
+        Streaming ``render``: yields the output joined into blocks of
+        ``block`` template fragments. Only time spent inside the template
+        counts as render time. ``name`` and ``block`` are positional-only,
+        so context variables of the same names reach the template.
+        """
+        tmpl = self.get_template(name)
+        st = self.stats[name]
+        st["renders"] += 1
+        # What Template.generate does, minus a generator layer per fragment
+        fragments = tmpl.root_render_func(tmpl.new_context(ctx))
+        while True:
+            started = time.perf_counter()
+            try:
+                out = "".join(islice(fragments, block))
+            except Exception:
+                tmpl.environment.handle_exception()
+            finally:
+                st["render_s"] += time.perf_counter() - started
+            if not out:
+                return
+            yield out
+
+    def warm(self) -> int:
+        """Load every template up front (e.g. in a long-lived worker)."""
+        names = [n for n in self._sources.list_templates() if _is_template(n)]
+        for name in names:
+            self.get_template(name)
+        return len(names)
+
+    def compile_to(self, target: str) -> int:
+        """
+        Precompile every template into importable modules under ``target``
+        and record the source hashes they were built from.
+        """
+        env = Environment(loader=FileSystemLoader(self.template_dir), **ENV_OPTIONS)
+        names = env.list_templates(filter_func=_is_template)
+        env.compile_templates(target, zip=None, filter_func=_is_template, ignore_errors=False)
+        manifest = pathlib.Path(target) / MANIFEST_NAME
+        manifest.write_text(json.dumps(template_hashes(self.template_dir), indent=2, sort_keys=True),
+                            encoding="utf-8")
+        return len(names)
+
+    def merge_stats(self, others) -> None:
+        """Fold in ``stats`` dicts collected by engines in worker processes."""
+        for stats in others:
+            for name, st in stats.items():
+                mine = self.stats.setdefault(name, {"origin": st["origin"], "load_s": 0.0,
+                                                    "renders": 0, "render_s": 0.0})
+                mine["load_s"] += st["load_s"]
+                mine["renders"] += st["renders"]
+                mine["render_s"] += st["render_s"]
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        """A copy of ``stats``, to pass to ``summary`` later as ``since``."""
+        return {name: dict(st) for name, st in self.stats.items()}
+
+    def summary(self, since: Optional[Dict[str, Dict[str, Any]]] = None) -> str:
+        """
+        Load and render totals for the process, or only the work done after
+        ``since`` (a ``snapshot``); templates loaded before it count as warm.
+        """
+        since = since or {}
+        if not self.stats:
+            return "templates: none loaded"
+        origins: Dict[str, int] = {}
+        load = render = 0.0
+        renders = 0
+        for name, st in self.stats.items():
+            before = since.get(name, {})
+            origin = "warm" if name in since else st["origin"]
+            origins[origin] = origins.get(origin, 0) + 1
+            load += st["load_s"] - before.get("load_s", 0.0)
+            render += st["render_s"] - before.get("render_s", 0.0)
+            renders += st["renders"] - before.get("renders", 0)
+        how = ", ".join(f"{n} from {o}" if o != "warm" else f"{n} warm" for o, n in sorted(origins.items()))
+        return f"templates: load/compile {load:.3f}s ({how}), {renders} render(s) {render:.3f}s"
+
+    def report(self) -> str:
+        lines = [f"{'template':<20} {'origin':<9} {'load ms':>8} {'renders':>8} {'render ms':>10}"]
+        for name, st in sorted(self.stats.items()):
+            lines.append(f"{name:<20} {st['origin']:<9} {st['load_s'] * 1000:>8.2f} "
+                         f"{st['renders']:>8} {st['render_s'] * 1000:>10.2f}")
+        return "\n".join(lines)
+
+
+_ENGINES: Dict[str, TemplateEngine] = {}
+
+
+def get_engine(template_dir: str | os.PathLike = TEMPLATE_DIR) -> TemplateEngine:
+    """Process-wide engine per template directory."""
+    key = str(template_dir)
+    if key not in _ENGINES:
+        _ENGINES[key] = TemplateEngine(template_dir)
+    return _ENGINES[key]
@@ -0,0 +1,166 @@
+# praeparium/sop3/incremental.py
+"""
+Build manifest for incremental bundle renders.
+
+Each item's output depends on four inputs, hashed separately so a rebuild
+can say why it happened:
+
+  item      the item's own YAML fields
+  template  its template source plus the shared partials (``_*.j2``)
+  defaults  the bundle defaults the item actually falls back on
+  links     its neighbours in the hub/spoke graph: a hub depends on the
+            other hubs and on the titles/slugs of its spokes; a spoke on
+            its hub and on its siblings (``hub_link``/``sibling_spokes``)
+
+The links hash is built from one digest per hub group of the LinkIndex rather
+than from each item's expanded link lists, so keying a bundle stays linear
+in its size.
+"""
+from __future__ import annotations
+import hashlib, json, os, pathlib
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from .links import LinkIndex
+
+MANIFEST_VERSION = 1
+MANIFEST_NAME = ".praeparium-build.json"
+
+
+def _digest(obj: Any) -> str:
+    blob = json.dumps(obj, sort_keys=True, ensure_ascii=False, separators=(",", ":"), default=str)
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+
+def _file_digest(path: pathlib.Path) -> str:
+    return hashlib.sha256(path.read_bytes()).hexdigest() if path.is_file() else ""
+
+
+class TemplateDigests:
+    """Per-template digest that also covers the shared ``_*.j2`` partials."""
+
+    def __init__(self, template_dir: str | os.PathLike):
+        self.root = pathlib.Path(template_dir)
+        partials = sorted(self.root.glob("_*.j2"))
+        self._shared = _digest([(p.name, _file_digest(p)) for p in partials])
+        self._cache: Dict[str, str] = {}
+
+    def __call__(self, name: str) -> str:
+        if name not in self._cache:
+            self._cache[name] = _digest([_file_digest(self.root / name), self._shared])
+        return self._cache[name]
+
+
+def item_dependencies(item: Dict[str, Any], index: LinkIndex) -> List[str]:
+    """Slugs whose title/slug feed into ``item``'s cross-links."""
+    slug = item["slug"]
+    if item.get("type") == "hub":
+        return [h for h in index.hub_slugs if h != slug] + [l["slug"] for l in index.groups.get(slug, [])]
+    hslug = item.get("hub_slug")
+    if not hslug:
+        return []
+    return [hslug] + [l["slug"] for l in index.siblings(slug, hslug)]
+
+
+def _links_digest(links: List[Dict[str, str]]) -> str:
+    return _digest([(l["title"], l["slug"]) for l in links])
+
+
+def item_parts(items: List[Dict[str, Any]], index: LinkIndex, defaults: Dict[str, Any],
+               template_for: Dict[str, str], templates: TemplateDigests,
+               rules: Dict[str, Any]) -> Dict[str, Dict[str, str]]:
+    """Component digests (item/template/defaults/links) for every item."""
+    hubs_digest = _links_digest(index.hub_links)
+    group_digest = {h: _links_digest(g) for h, g in index.groups.items()}
+    # Siblings follow the ranked order and cap, so key spokes on those
+    sibling_digest = {h: _digest([_links_digest(g), index.link_signature()]) for h, g in index.ranked.items()}
+    parts: Dict[str, Dict[str, str]] = {}
+    for item in items:
+        slug = item["slug"]
+        atype = item.get("type")
+        if atype == "hub":
+            links = _digest([hubs_digest, group_digest.get(slug, "")])
+        else:
+            hslug = item.get("hub_slug")
+            if hslug and hslug in index.titles:
+                links = _digest([hslug, index.titles[hslug], sibling_digest.get(hslug, "")])
+            else:
+                links = ""
+        tmpl = template_for.get(atype)
+        parts[slug] = {
+            "item": _digest(item),
+            "template": _digest([tmpl, templates(tmpl), rules.get(atype)]) if tmpl else "",
+            "defaults": _digest({k: v for k, v in defaults.items() if k not in item}),
+            "links": links,
+        }
+    return parts
+
+
+class BuildManifest:
+    """
+    ``<out_dir>/.praeparium-build.json``: for every rendered item, the
+    component digests it was built from, whether it passed validation, and
+    the size/mtime of the file written.
+    """
+
+    def __init__(self, out_dir: str):
+        self.path = pathlib.Path(out_dir) / MANIFEST_NAME
+        self.items: Dict[str, Dict[str, Any]] = {}
+        self.titles: Dict[str, str] = {}
+        if self.path.is_file():
+            try:
+                data = json.loads(self.path.read_text(encoding="utf-8"))
+            except ValueError:
+                data = {}
+            if data.get("version") == MANIFEST_VERSION:
+                self.items = data.get("items", {})
+                self.titles = data.get("titles", {})
+        self._prev_titles = dict(self.titles)
+
+    @staticmethod
+    def _stat(path: pathlib.Path) -> Optional[Tuple[int, int]]:
+        try:
+            st = path.stat()
+        except OSError:
+            return None
+        return st.st_size, st.st_mtime_ns
+
+    def stale_reason(self, slug: str, parts: Dict[str, str], out_path: pathlib.Path,
+                     deps: Callable[[], List[str]], titles: Dict[str, str]) -> Optional[str]:
+        """Why ``slug`` must be re-rendered, or None when its output is current."""
+        prev = self.items.get(slug)
+        if prev is None:
+            return "new"
+        changed = [k for k in ("item", "template", "defaults", "links") if prev["parts"].get(k) != parts[k]]
+        if "links" in changed:
+            moved = [d for d in deps() if self._prev_titles.get(d) != titles.get(d)]
+            label = "links changed" + (f" ({', '.join(moved[:3])}{', …' if len(moved) > 3 else ''})" if moved else "")
+            changed[changed.index("links")] = label
+        if changed:
+            return ", ".join(c if c.startswith("links") else f"{c} changed" for c in changed)
+        stat = self._stat(out_path)
+        if stat is None:
+            return "output missing"
+        if list(stat) != prev.get("out"):
+            return "output modified"
+        return None
+
+    def ok(self, slug: str) -> bool:
+        return bool(self.items.get(slug, {}).get("ok", True))
+
+    def record(self, slug: str, parts: Dict[str, str], ok: bool, out_path: pathlib.Path) -> None:
+        stat = self._stat(out_path)
+        self.items[slug] = {"parts": parts, "ok": ok, "out": list(stat) if stat else None}
+
+    def save(self, titles: Dict[str, str], keep: List[str]) -> List[str]:
+        """Persist the manifest for the items in ``keep``; returns the slugs dropped."""
+        keep_set = set(keep)
+        removed = sorted(s for s in self.items if s not in keep_set)
+        for s in removed:
+            del self.items[s]
+        self.titles = titles
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_suffix(".tmp")
+        tmp.write_text(json.dumps({"version": MANIFEST_VERSION, "titles": titles, "items": self.items},
+                                  ensure_ascii=False), encoding="utf-8")
+        os.replace(tmp, self.path)
+        return removed
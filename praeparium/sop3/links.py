@@ -0,0 +1,149 @@
+# praeparium/sop3/links.py
+"""
+Hub/spoke link graph for sop3 bundles.
+
+Spokes are grouped by ``hub_slug`` in one pass over the items; every link
+dict is built once and shared. Templates receive read-only views over those
+shared lists (``other_hubs``, ``bundle_spokes``, ``sibling_spokes``) rather
+than per-item copies, so link context costs O(1) memory per item however
+large a hub grows.
+
+Sibling lists can be ranked and capped from the bundle root:
+
+    links:
+      sibling_limit: 12      # at most 12 sibling links per spoke
+      rank_by: priority      # higher first; ties keep bundle order
+"""
+from __future__ import annotations
+from collections.abc import Sequence
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+SPOKE_TYPES = {"guide", "review", "faq"}
+
+
+def _mk_link(title: str, slug: str) -> Dict[str, str]:
+    return {"title": title, "slug": slug, "href": f"/{slug}"}
+
+
+class LinkView(Sequence):
+    """Read-only view of a shared link list minus one slug, optionally capped."""
+
+    __slots__ = ("_links", "_exclude", "_limit", "_len")
+
+    def __init__(self, links: List[Dict[str, str]], exclude: Optional[str] = None,
+                 limit: Optional[int] = None):
+        self._links = links
+        self._exclude = exclude
+        self._limit = limit
+        # Counted on first len(); the excluded slug may appear any number of times
+        self._len: Optional[int] = None
+
+    def __iter__(self) -> Iterator[Dict[str, str]]:
+        left = self._limit
+        for link in self._links:
+            if left is not None and left <= 0:
+                return
+            if link["slug"] == self._exclude:
+                continue
+            if left is not None:
+                left -= 1
+            yield link
+
+    def __len__(self) -> int:
+        if self._len is None:
+            self._len = sum(1 for _ in self)
+        return self._len
+
+    def __getitem__(self, i):
+        return list(self)[i]
+
+    def __repr__(self) -> str:
+        return f"LinkView({list(self)!r})"
+
+
+class LinkIndex:
+    """
+    Built once per bundle. ``context_for(item)`` returns the link variables
+    its template expects; ``dangling`` lists spokes whose ``hub_slug`` does
+    not resolve to a hub in the bundle, and ``bad_ranks`` the (slug, value)
+    of spokes whose ``rank_by`` field is not a number (ranked as 0).
+    """
+
+    def __init__(self, items: List[Dict[str, Any]], sibling_limit: Optional[int] = None,
+                 rank_by: Optional[str] = None):
+        self.sibling_limit = sibling_limit
+        self.rank_by = rank_by
+        self.titles: Dict[str, Any] = {}
+        self.types: Dict[str, Any] = {}
+        self.hub_links: List[Dict[str, str]] = []
+        self.groups: Dict[str, List[Dict[str, str]]] = {}
+        self.dangling: List[Tuple[str, str, str]] = []
+        self.bad_ranks: List[Tuple[str, Any]] = []
+        members: Dict[str, List[Tuple[Dict[str, str], Any]]] = {}
+        for item in items:
+            slug = item["slug"]
+            self.titles[slug] = item.get("title")
+            self.types[slug] = item.get("type")
+            if item.get("type") == "hub":
+                self.hub_links.append(_mk_link(item["title"], slug))
+            elif item.get("type") in SPOKE_TYPES and item.get("hub_slug"):
+                link = _mk_link(item["title"], slug)
+                rank = 0.0
+                if rank_by:
+                    try:
+                        rank = float(item.get(rank_by) or 0)
+                    except (TypeError, ValueError):
+                        self.bad_ranks.append((slug, item.get(rank_by)))
+                members.setdefault(item["hub_slug"], []).append((link, rank))
+
+        for hub in self.hub_links:
+            self.groups[hub["slug"]] = [link for link, _ in members.get(hub["slug"], [])]
+        # Ranked order for sibling lists; same lists when unranked
+        self.ranked: Dict[str, List[Dict[str, str]]] = {}
+        for hslug, group in self.groups.items():
+            if rank_by:
+                ranked = sorted(members.get(hslug, []), key=lambda m: -m[1])
+                self.ranked[hslug] = [link for link, _ in ranked]
+            else:
+                self.ranked[hslug] = group
+
+        for item in items:
+            hslug = item.get("hub_slug")
+            if item.get("type") in SPOKE_TYPES and hslug:
+                if hslug not in self.types:
+                    self.dangling.append((item["slug"], hslug, "no such item"))
+                elif self.types[hslug] != "hub":
+                    self.dangling.append((item["slug"], hslug, f"is a {self.types[hslug]}, not a hub"))
+
+    @classmethod
+    def from_plan(cls, plan: Dict[str, Any]) -> "LinkIndex":
+        cfg = plan.get("links") or {}
+        limit = cfg.get("sibling_limit")
+        return cls(plan.get("items", []), sibling_limit=int(limit) if limit else None,
+                   rank_by=cfg.get("rank_by"))
+
+    @property
+    def hub_slugs(self) -> List[str]:
+        return [h["slug"] for h in self.hub_links]
+
+    def siblings(self, slug: str, hub_slug: str) -> LinkView:
+        return LinkView(self.ranked.get(hub_slug, []), exclude=slug, limit=self.sibling_limit)
+
+    def context_for(self, item: Dict[str, Any]) -> Dict[str, Any]:
+        slug = item["slug"]
+        if item.get("type") == "hub":
+            # hub cross-refs: all other hubs + its own spokes
+            return {
+                "other_hubs": LinkView(self.hub_links, exclude=slug),
+                "bundle_spokes": LinkView(self.groups.get(slug, [])),
+            }
+        # spoke cross-refs: link back to its hub + sibling spokes
+        hslug = item.get("hub_slug")
+        if hslug and hslug in self.titles:
+            return {"hub_link": _mk_link(self.titles[hslug], hslug),
+                    "sibling_spokes": self.siblings(slug, hslug)}
+        return {"hub_link": None, "sibling_spokes": LinkView([])}
+
+    def link_signature(self) -> Dict[str, Any]:
+        """Settings that change sibling lists beyond titles/slugs (for build keys)."""
+        return {"sibling_limit": self.sibling_limit, "rank_by": self.rank_by}
@@ -1,7 +1,12 @@
 from __future__ import annotations
-import os, pathlib, yaml
-from typing import Dict, List
-from jinja2 import Environment, FileSystemLoader, StrictUndefined
+import os, pathlib, time, yaml
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Tuple
+
+from .engine import _ENGINES, TemplateEngine, get_engine
+from .incremental import BuildManifest, TemplateDigests, item_dependencies, item_parts
+from .links import LinkIndex
+from ..utils.outputs import OutputWriter
 
 TEMPLATE_REQUIRED_H2 = {
     "hub":   ["TL;DR","Who this is for","Timeframe ladder","Core decisions","Spokes","FAQs"],
@@ -10,101 +15,220 @@ TEMPLATE_REQUIRED_H2 = {
     "faq":   ["FAQs"],
 }
 
+TEMPLATE_MAP = {"hub":"hub.md.j2","review":"review.md.j2","guide":"guide.md.j2","faq":"faq.md.j2"}
+
+# libyaml's C loader when PyYAML was built with it; parsing dominates large no-op builds
+try:
+    _YamlLoader = yaml.CSafeLoader
+except AttributeError:
+    _YamlLoader = yaml.SafeLoader
+
 def _load_yaml(path: str):
     with open(path, "r", encoding="utf-8") as f:
-        return yaml.safe_load(f)
-
-def _env(template_dir: str):
-    return Environment(
-        loader=FileSystemLoader(template_dir),
-        undefined=StrictUndefined,
-        autoescape=False,
-        trim_blocks=True,
-        lstrip_blocks=True,
-    )
-
-def _required_h2s_ok(md_text: str, required: list[str]) -> bool:
-    found = [line.strip("# ").strip() for line in md_text.splitlines() if line.startswith("## ")]
-    s = set(found)
-    return all(h in s for h in required)
-
-def _mk_link(title: str, slug: str) -> Dict[str, str]:
-    return {"title": title, "slug": slug, "href": f"/{slug}"}
-
-def render_bundle(bundle_yaml: str, out_dir: str) -> bool:
+        return yaml.load(f, Loader=_YamlLoader)
+
+class H2Tracker:
+    """
+    Collects "## " headings (text after the leading "#"s and spaces) from
+    text fed in arbitrary chunks; only the current partial line is held.
+    """
+
+    def __init__(self):
+        self.found: set[str] = set()
+        self._pending = ""
+
+    def _line(self, line: str) -> None:
+        if line.startswith("## "):
+            self.found.add(line.strip("# ").strip())
+
+    def feed(self, chunk: str) -> None:
+        if self._pending:
+            chunk = self._pending + chunk
+        lines = chunk.splitlines(True)
+        # A trailing piece without a line break continues in the next chunk
+        self._pending = lines.pop() if lines and lines[-1].splitlines()[0] == lines[-1] else ""
+        for line in lines:
+            if line.startswith("## "):
+                self._line(line.splitlines()[0])
+
+    def close(self) -> None:
+        if self._pending:
+            self._line(self._pending)
+            self._pending = ""
+
+    def ok(self, required: list[str]) -> bool:
+        return all(h in self.found for h in required)
+
+def _render_item(engine: TemplateEngine, index: LinkIndex, job: Dict,
+                 writer: OutputWriter) -> Tuple[bool, List[str]]:
+    """Stream-render, validate and write one planned item; returns (ok, log lines)."""
+    log: List[str] = []
+    # Link context is attached here, as views over the shared index
+    ctx = {**job["ctx"], **index.context_for(job["ctx"])}
+    chunks = engine.generate(job["template"], **ctx)
+    tracker = H2Tracker()
+    status = writer.write_stream(job["out_path"], chunks, on_chunk=tracker.feed)
+    tracker.close()
+    ok = tracker.ok(TEMPLATE_REQUIRED_H2.get(job["type"], []))
+    if not ok:
+        log.append(f"[FAIL] Missing required H2(s) in {job['slug']}.md")
+    verb = "Unchanged" if status == "unchanged" else "Wrote"
+    log.append(f"[OK] {verb} {job['out_path']}" + (f" ({job['reason']})" if job["reason"] else ""))
+    return ok, log
+
+_WORKER_INDEX: LinkIndex | None = None
+
+def _init_worker(template_dir: str, index: LinkIndex) -> None:
+    # A forked worker inherits the parent's engine and its stats; start clean
+    global _WORKER_INDEX
+    _ENGINES.pop(str(template_dir), None)
+    get_engine(template_dir)
+    _WORKER_INDEX = index
+
+def _render_chunk(template_dir: str, chunk: List[Dict]) -> Dict:
+    """Process-pool entry point: render a contiguous slice of the plan."""
+    started = time.perf_counter()
+    engine = get_engine(template_dir)
+    # Committed before returning, so the parent sees every file in place
+    with OutputWriter() as writer:
+        results = [_render_item(engine, _WORKER_INDEX, job, writer) for job in chunk]
+    return {"pid": os.getpid(), "results": results, "seconds": time.perf_counter() - started,
+            "stats": engine.stats, "outputs": writer.counts}
+
+def _render_parallel(engine: TemplateEngine, index: LinkIndex, planned: List[Dict],
+                     jobs: int, writer: OutputWriter) -> Tuple[List[Tuple[bool, List[str]]], List[str]]:
+    """
+    Shard ``planned`` into contiguous chunks across ``jobs`` processes, each
+    with its own warm engine and one copy of the link index. Results come
+    back in plan order.
+    """
+    chunk_size = max(1, -(-len(planned) // (jobs * 4)))
+    chunks = [planned[i:i + chunk_size] for i in range(0, len(planned), chunk_size)]
+    results: List[Tuple[bool, List[str]]] = []
+    per_worker: Dict[int, List[float]] = {}
+    stats: Dict[int, Dict] = {}
+    with ProcessPoolExecutor(max_workers=jobs, initializer=_init_worker,
+                             initargs=(engine.template_dir, index)) as pool:
+        for out in pool.map(_render_chunk, [engine.template_dir] * len(chunks), chunks):
+            results.extend(out["results"])
+            w = per_worker.setdefault(out["pid"], [0, 0.0])
+            w[0] += len(out["results"])
+            w[1] += out["seconds"]
+            stats[out["pid"]] = out["stats"]
+            writer.merge_counts(out["outputs"])
+    engine.merge_stats(stats.values())
+    timing = [f"[TIMING] worker {n}: {count} item(s) in {secs:.2f}s"
+              for n, (count, secs) in enumerate(per_worker.values(), 1)]
+    return results, timing
+
+def render_bundle(bundle_yaml: str, out_dir: str, engine: TemplateEngine | None = None,
+                  incremental: bool = False, jobs: int = 1) -> bool:
+    """
+    Render every item of a bundle YAML to <out_dir>/<slug>.md.
+
+    With ``incremental`` only items whose inputs changed since the last
+    build in ``out_dir`` are rendered (see sop3/incremental.py); the rest
+    are reported as skipped.
+
+    Contexts and link groups are built once up front; with ``jobs`` > 1 the
+    render/validate/write step is sharded across that many processes. Log
+    lines and the result are the same, and in the same order, as a serial run.
+
+    Files go through utils.outputs.OutputWriter: a render identical to the
+    file on disk leaves it (and its mtime) untouched.
+    """
     plan = _load_yaml(bundle_yaml)
     items: List[Dict] = plan.get("items", [])
 
-    # Build lookups
-    by_slug = {i["slug"]: i for i in items}
-    hubs = [i for i in items if i.get("type") == "hub"]
-    spokes = [i for i in items if i.get("type") in {"guide","review","faq"}]
-
     # Defaults (optional) at bundle root so you don’t repeat yourself
     default_external_links = plan.get("defaults", {}).get("external_links", [])
     default_external_source = plan.get("defaults", {}).get("external_source", "")
 
-    # Precompute link groups
-    hub_links_all = [_mk_link(h["title"], h["slug"]) for h in hubs]
-    siblings_by_hub: Dict[str, List[Dict[str,str]]] = {}
-    for h in hubs:
-        hslug = h["slug"]
-        siblings_by_hub[hslug] = [
-            _mk_link(x["title"], x["slug"])
-            for x in spokes
-            if x.get("hub_slug") == hslug
-        ]
-
-    # Render
-    base_dir = pathlib.Path(__file__).parent
-    tdir = base_dir / "templates"
-    env = _env(str(tdir))
+    # Link graph: spokes grouped by hub in one pass, shared by every item
+    index = LinkIndex.from_plan(plan)
+    for slug, hslug, why in index.dangling:
+        print(f"[WARN] {slug}: hub_slug '{hslug}' {why}")
+    for slug, value in index.bad_ranks:
+        print(f"[WARN] {slug}: {index.rank_by} {value!r} is not a number; ranked as 0")
+
+    # Render through the process-wide engine (bytecode cache, timings)
+    engine = engine or get_engine()
+    # The engine outlives this call (serve, repeated runs); report this run only
+    before = engine.snapshot()
     os.makedirs(out_dir, exist_ok=True)
 
+    manifest = None
+    if incremental:
+        manifest = BuildManifest(out_dir)
+        defaults = {"external_links": default_external_links, "external_source": default_external_source}
+        parts = item_parts(items, index, defaults, TEMPLATE_MAP,
+                           TemplateDigests(engine.template_dir), TEMPLATE_REQUIRED_H2)
+
     ok = True
-    template_map = {"hub":"hub.md.j2","review":"review.md.j2","guide":"guide.md.j2","faq":"faq.md.j2"}
+    # Plan: one entry per item in bundle order; "log" holds lines decided
+    # here (unknown type, skipped) and "job" the work for the render step
+    steps: List[Dict] = []
 
     for item in items:
         atype = item["type"]
         slug  = item["slug"]
-        tmpl  = template_map.get(atype)
+        tmpl  = TEMPLATE_MAP.get(atype)
         if not tmpl:
-            print(f"[WARN] Unknown type {atype} for {slug}")
-            ok = False
+            steps.append({"log": [f"[WARN] Unknown type {atype} for {slug}"], "ok": False})
             continue
 
-        # Inject auto-links (no manual YAML work)
+        out_path = pathlib.Path(out_dir) / f"{slug}.md"
+        reason = None
+        if manifest is not None:
+            reason = manifest.stale_reason(slug, parts[slug], out_path,
+                                           lambda: item_dependencies(item, index), index.titles)
+            if reason is None:
+                steps.append({"log": [f"[SKIP] {out_path} (unchanged)"], "ok": manifest.ok(slug), "skipped": True})
+                continue
+
+        # Provide external links fallbacks so QA passes without rework;
+        # auto-links are added at render time from the index
         ctx = dict(item)
-
-        # Provide external links fallbacks so QA passes without rework
         ctx.setdefault("external_links", default_external_links)
         ctx.setdefault("external_source", default_external_source)
 
-        if atype == "hub":
-            # hub cross-refs: all other hubs + its own spokes
-            ctx["other_hubs"] = [l for l in hub_links_all if l["slug"] != slug]
-            ctx["bundle_spokes"] = siblings_by_hub.get(slug, [])
+        steps.append({"job": {"slug": slug, "type": atype, "template": tmpl, "ctx": ctx,
+                              "out_path": str(out_path), "reason": reason}})
+
+    planned = [st["job"] for st in steps if "job" in st]
+    timing: List[str] = []
+    writer = OutputWriter()
+    if jobs > 1 and len(planned) > 1:
+        results, timing = _render_parallel(engine, index, planned, min(jobs, len(planned)), writer)
+    else:
+        with writer:
+            results = [_render_item(engine, index, job, writer) for job in planned]
+
+    # Report in bundle order
+    rendered = skipped = 0
+    outcomes = iter(results)
+    for st in steps:
+        if "job" in st:
+            item_ok, log = next(outcomes)
+            job = st["job"]
+            if manifest is not None:
+                manifest.record(job["slug"], parts[job["slug"]], item_ok, pathlib.Path(job["out_path"]))
+            rendered += 1
         else:
-            # spoke cross-refs: link back to its hub + sibling spokes
-            hslug = item.get("hub_slug")
-            if hslug and hslug in by_slug:
-                ctx["hub_link"] = _mk_link(by_slug[hslug]["title"], hslug)
-                ctx["sibling_spokes"] = [
-                    l for l in siblings_by_hub.get(hslug, []) if l["slug"] != slug
-                ]
-            else:
-                ctx["hub_link"] = None
-                ctx["sibling_spokes"] = []
-
-        md = env.get_template(tmpl).render(**ctx)
-
-        if not _required_h2s_ok(md, TEMPLATE_REQUIRED_H2.get(atype, [])):
-            print(f"[FAIL] Missing required H2(s) in {slug}.md")
-            ok = False
-
-        out_path = pathlib.Path(out_dir) / f"{slug}.md"
-        with open(out_path, "w", encoding="utf-8") as f:
-            f.write(md)
-        print(f"[OK] Wrote {out_path}")
-
+            item_ok, log = st["ok"], st["log"]
+            skipped += bool(st.get("skipped"))
+        ok = ok and item_ok
+        for line in log:
+            print(line)
+
+    if manifest is not None:
+        removed = manifest.save(index.titles, [i["slug"] for i in items if i["type"] in TEMPLATE_MAP])
+        for slug in removed:
+            print(f"[WARN] {slug} is no longer in the bundle; {slug}.md left in place")
+        print(f"[INCR] {rendered} rendered, {skipped} skipped (unchanged), {len(removed)} removed")
+    if planned:
+        print(f"[WRITE] {writer.summary()}")
+    for line in timing:
+        print(line)
+    print(f"[TIMING] {engine.summary(since=before)}")
     return ok
@@ -0,0 +1,184 @@
+# praeparium/utils/outputs.py
+"""
+Change-aware, atomic output writes shared by sop3 rendering, the article
+writer and the HTML export.
+
+A write whose content matches the file already on disk is dropped, so
+unchanged outputs keep their mtime and sync/CDN uploads only see real
+changes. Other writes go to a temp file beside the target; on ``commit()``
+the pending temps are fsynced as a batch, renamed over their targets, and
+each touched directory is fsynced once.
+
+    with OutputWriter() as out:
+        out.write_text("out/a.md", text)
+        out.write_stream("out/b.md", chunks)
+    print(out.summary())   # outputs: 1 new, 0 changed, 1 unchanged
+
+Existing files are compared by size first, then by content hash.
+"""
+from __future__ import annotations
+import hashlib, itertools, os, pathlib, threading
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+DEFAULT_FSYNC_BATCH = 64
+
+_SEQ = itertools.count()
+
+
+def _env_flag(name: str, default: bool) -> bool:
+    val = os.getenv(name)
+    if val is None or val == "":
+        return default
+    return val.strip().lower() not in {"0", "false", "no", "off"}
+
+
+def _encode(text: str) -> bytes:
+    # Same bytes text-mode open(..., "w") would write on this platform
+    if os.linesep != "\n":
+        text = text.replace("\n", os.linesep)
+    return text.encode("utf-8")
+
+
+def _file_sha256(path: pathlib.Path) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+class OutputWriter:
+    """
+    Collects writes for one run. ``fsync`` defaults to $PRAEPARIUM_FSYNC (on);
+    pending renames are committed every ``fsync_batch`` files and on close().
+    """
+
+    def __init__(self, fsync: Optional[bool] = None, fsync_batch: int = DEFAULT_FSYNC_BATCH):
+        self.fsync = _env_flag("PRAEPARIUM_FSYNC", True) if fsync is None else fsync
+        self.fsync_batch = max(1, fsync_batch)
+        self.counts = {"new": 0, "changed": 0, "unchanged": 0}
+        # (status, target, temp file) awaiting commit()
+        self._pending: List[Tuple[str, pathlib.Path, pathlib.Path]] = []
+        self._lock = threading.Lock()
+
+    # --- comparison ---
+    def _existing(self, path: pathlib.Path, size: int, digest: str) -> str:
+        """'new', 'changed' or 'unchanged' for content (size, digest) at ``path``."""
+        try:
+            st = path.stat()
+        except OSError:
+            return "new"
+        if st.st_size != size:
+            return "changed"
+        return "unchanged" if _file_sha256(path) == digest else "changed"
+
+    # --- writes ---
+    def _tmp_for(self, path: pathlib.Path) -> pathlib.Path:
+        return path.with_name(f"{path.name}.{os.getpid()}-{next(_SEQ)}.tmp")
+
+    def _finish(self, path: pathlib.Path, tmp: pathlib.Path, size: int, digest: str) -> str:
+        status = self._existing(path, size, digest)
+        if status == "unchanged":
+            tmp.unlink()
+        else:
+            with self._lock:
+                self._pending.append((status, path, tmp))
+                flush = len(self._pending) >= self.fsync_batch
+            if flush:
+                self.commit()
+        with self._lock:
+            self.counts[status] += 1
+        return status
+
+    def write_bytes(self, path, data: bytes) -> str:
+        """Write ``data`` to ``path`` unless identical; returns new/changed/unchanged."""
+        path = pathlib.Path(path)
+        digest = hashlib.sha256(data).hexdigest()
+        status = self._existing(path, len(data), digest)
+        if status == "unchanged":
+            with self._lock:
+                self.counts[status] += 1
+            return status
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self._tmp_for(path)
+        with open(tmp, "wb") as f:
+            f.write(data)
+        return self._finish(path, tmp, len(data), digest)
+
+    def write_text(self, path, text: str) -> str:
+        return self.write_bytes(path, _encode(text))
+
+    def write_stream(self, path, chunks: Iterable[str],
+                     on_chunk: Optional[Callable[[str], None]] = None) -> str:
+        """Stream text ``chunks`` to a temp file, hashing as they pass; then as write_text."""
+        path = pathlib.Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self._tmp_for(path)
+        h = hashlib.sha256()
+        size = 0
+        try:
+            with open(tmp, "wb") as f:
+                for chunk in chunks:
+                    if on_chunk:
+                        on_chunk(chunk)
+                    data = _encode(chunk)
+                    h.update(data)
+                    size += len(data)
+                    f.write(data)
+        except BaseException:
+            tmp.unlink(missing_ok=True)
+            raise
+        return self._finish(path, tmp, size, h.hexdigest())
+
+    def commit(self) -> None:
+        """fsync pending temp files, rename them into place, fsync their directories."""
+        with self._lock:
+            pending, self._pending = self._pending, []
+        if not pending:
+            return
+        if self.fsync:
+            for *_, tmp in pending:
+                fd = os.open(tmp, os.O_RDONLY)
+                try:
+                    os.fsync(fd)
+                finally:
+                    os.close(fd)
+        dirs = set()
+        for _status, path, tmp in pending:
+            os.replace(tmp, path)
+            dirs.add(path.parent)
+        if self.fsync and hasattr(os, "O_DIRECTORY"):
+            for d in dirs:
+                fd = os.open(d, os.O_RDONLY | os.O_DIRECTORY)
+                try:
+                    os.fsync(fd)
+                finally:
+                    os.close(fd)
+
+    def close(self) -> None:
+        self.commit()
+
+    def __enter__(self) -> "OutputWriter":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if exc_type is None:
+            self.close()
+        else:
+            self.discard()
+
+    def discard(self) -> None:
+        """Drop pending (uncommitted) writes."""
+        with self._lock:
+            pending, self._pending = self._pending, []
+        for *_, tmp in pending:
+            tmp.unlink(missing_ok=True)
+
+    def merge_counts(self, counts: Dict[str, int]) -> None:
+        """Add counts reported by writers in worker processes."""
+        for k, v in counts.items():
+            self.counts[k] = self.counts.get(k, 0) + v
+
+    def summary(self) -> str:
+        c = self.counts
+        return f"outputs: {c['new']} new, {c['changed']} changed, {c['unchanged']} unchanged"
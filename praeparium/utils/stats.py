@@ -0,0 +1,13 @@
+# praeparium/utils/stats.py
+"""Small summary statistics shared by the QA reports."""
+from __future__ import annotations
+import math
+from typing import List
+
+
+def percentile(values: List[float], q: float) -> float:
+    """The ``q``th percentile of ``values`` (0-100), interpolated linearly as numpy.percentile's default."""
+    s = sorted(values)
+    k = (len(s) - 1) * q / 100.0
+    lo, hi = math.floor(k), math.ceil(k)
+    return s[lo] + (s[hi] - s[lo]) * (k - lo)
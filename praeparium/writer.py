@@ -1,12 +1,18 @@
 from __future__ import annotations
-import json, os, pathlib, re
+import json, os, pathlib, re, time
 from typing import Dict, Any, List, Optional
 
-# OpenAI Python SDK >= 1.0
-try:
-    from openai import OpenAI  # pip install openai
-except Exception:
-    OpenAI = None
+from .llm.backends import Backend, get_backend
+from .llm.cache import ResponseCache, cache_key
+from .llm.compact import compact_sourcepack
+from .llm.resilience import ResilientBackend, RetryPolicy
+from .llm.runlog import log_run, usage_fields
+from .postprocess import (
+    DEFAULT_AUTHOR, ENCODING_FIXES, RELATED_TRAILER,
+    build_comparison_table as _build_comparison_table, postprocess_article, sources_block,
+)
+from .qa.checks import StreamChecker
+from .utils.outputs import OutputWriter
 
 
 # -----------------------------
@@ -20,28 +26,12 @@ def _load_sourcepack(path: str) -> Dict[str, Any]:
 
 def _fix_encoding_glitches(text: str) -> str:
     # Common cp1252/UTF-8 artifacts seen in outputs
-    replacements = {
-        "â€“": "–",
-        "â€”": "—",
-        "â€˜": "‘",
-        "â€™": "’",
-        "â€œ": "“",
-        "â€\x9d": "”",
-        "â€": "”",
-        "â€¢": "•",
-        "â€¦": "…",
-        "â„¢": "™",
-        "â†’": "→",
-        "Ã—": "×",
-        "Â·": "·",
-        "Â": "",
-    }
-    for bad, good in replacements.items():
+    for bad, good in ENCODING_FIXES.items():
         text = text.replace(bad, good)
     return text
 
 
-def _inject_byline(text: str, default_author: str = "Praeparium Editorial") -> str:
+def _inject_byline(text: str, default_author: str = DEFAULT_AUTHOR) -> str:
     # If an explicit byline already exists, leave it.
     if re.search(r"(?im)^\*?by\s+.+$", text) or " By " in text[:200] or " by " in text[:200]:
         return text
@@ -60,26 +50,6 @@ def _has_markdown_table(text: str) -> bool:
     return ("|---" in text) or ("| --" in text)
 
 
-def _md_cell(val: Any) -> str:
-    if val is None:
-        return ""
-    if isinstance(val, (list, tuple)):
-        return ", ".join(map(str, val))
-    return str(val)
-
-
-def _build_comparison_table(products: List[dict], columns: List[str]) -> str:
-    if not products or not columns:
-        return ""
-    header = "| " + " | ".join(columns) + " |"
-    divider = "| " + " | ".join("---" for _ in columns) + " |"
-    rows = []
-    for p in products:
-        row = "| " + " | ".join(_md_cell(p.get(col, "")) for col in columns) + " |"
-        rows.append(row)
-    return "\n".join([header, divider, *rows])
-
-
 def _ensure_single_comparison_table(text: str, products: List[dict], columns: List[str]) -> str:
     """Insert one Comparison Table if none is present and we have data."""
     if _has_markdown_table(text) or not (products and columns):
@@ -91,139 +61,299 @@ def _ensure_single_comparison_table(text: str, products: List[dict], columns: Li
     return text.rstrip() + "\n\n## Comparison Table\n\n" + table_md + "\n"
 
 
-def _dedupe_sources(sources: List[dict]) -> List[dict]:
-    if not sources:
-        return []
-    seen: set[str] = set()
-    out: List[dict] = []
-    for s in sources:
-        key = (s.get("url") or "").strip().lower() or (s.get("title") or "").strip().lower()
-        if key and key not in seen:
-            out.append(s)
-            seen.add(key)
-    return out
-
-
 def _ensure_sources_section(text: str, sources: List[dict]) -> str:
     if "## Sources" in text:
         return text
-    srcs = _dedupe_sources(sources)
-    if not srcs:
+    block = sources_block(sources)
+    if not block:
         return text
-    lines = ["\n## Sources\n"]
-    for s in srcs:
-        title = (s.get("title") or s.get("id") or "Source").strip()
-        url = (s.get("url") or "").strip()
-        pub = (s.get("publisher") or "").strip()
-        label = f"{title}" + (f" ({pub})" if pub else "")
-        if url:
-            lines.append(f"- [{label}]({url})")
-        else:
-            lines.append(f"- {label}")
-    return text.rstrip() + "\n" + "\n".join(lines) + "\n"
+    return text.rstrip() + "\n" + block + "\n"
 
 
 def _append_internal_links(text: str) -> str:
     # Always add at least one internal link so QA passes the "internal link" rule.
-    trailing = (
-        "\n**Related:** "
-        "[Water Preparedness Time Ladder](/water-preparedness-time-ladder) · "
-        "[How to Sanitize Water Containers](/sanitize-water-containers)\n"
-    )
-    if trailing.strip() in text:
+    if RELATED_TRAILER.strip() in text:
         return text
-    return text.rstrip() + "\n" + trailing
+    return text.rstrip() + "\n" + RELATED_TRAILER
 
 
 # -----------------------------
 # Main entry
 # -----------------------------
-def write_from_sourcepack(sourcepack_path: str, out_dir: str, slug: Optional[str] = None) -> bool:
-    """
-    Generate a publishable article from a structured Source Pack (JSON),
-    using writer_prompt_v2.txt for reasoning + structure, then enforce:
-      • Byline
-      • Encoding cleanup
-      • One comparison table (if none found) from products/comparison_columns
-      • A '## Sources' section (deduped) when missing
-      • At least one internal interlink
-    """
-    sp = _load_sourcepack(sourcepack_path)
-    if not sp or "sources" not in sp or "claims_checklist" not in sp:
-        print("[FAIL] Source Pack missing mandatory keys: 'sources', 'claims_checklist'")
-        return False
+SYSTEM_MSG = (
+    "You are Praeparium’s senior preparedness writer. "
+    "Follow the STRUCTURE exactly; cite quantitative claims inline. "
+    "Return only final Markdown, no commentary."
+)
 
-    if OpenAI is None:
-        print("[FAIL] OpenAI SDK not installed. Run: pip install openai")
-        return False
+SAMPLING_PARAMS: Dict[str, Any] = {
+    "temperature": 0.25,
+    "top_p": 0.9,
+    "frequency_penalty": 0.1,
+    "presence_penalty": 0.0,
+}
 
-    api_key = os.getenv("OPENAI_API_KEY")
-    if not api_key:
-        print("[FAIL] OPENAI_API_KEY not set in environment.")
-        return False
 
-    org_id = os.getenv("OPENAI_ORG_ID") or os.getenv("OPENAI_ORGANIZATION")
-    client = OpenAI(api_key=api_key, organization=org_id) if org_id else OpenAI(api_key=api_key)
-    model_name = os.getenv("PRAEPARIUM_MODEL", "gpt-4o")
+# (mtime, text) of the last prompt read; long-lived workers re-read only on edit
+_PROMPT_CACHE: Dict[str, tuple] = {}
 
-    # --- Prompt template ---
+
+def _load_prompt() -> Optional[str]:
     prompt_path = os.path.join(os.path.dirname(__file__), "writer_prompt_v2.txt")
     try:
+        mtime = os.stat(prompt_path).st_mtime_ns
+        cached = _PROMPT_CACHE.get(prompt_path)
+        if cached and cached[0] == mtime:
+            return cached[1]
         with open(prompt_path, "r", encoding="utf-8") as f:
-            PROMPT_V2 = f.read()
+            text = f.read()
     except FileNotFoundError:
         print(f"[FAIL] Prompt file not found: {prompt_path}")
-        return False
+        return None
+    _PROMPT_CACHE[prompt_path] = (mtime, text)
+    return text
+
+
+PROMPT_PLACEHOLDER = "{source_pack_json}"
+
+
+def build_user_message(prompt: str, source_pack_json: str, layout: str = "prefix") -> str:
+    """
+    Assemble the user message from the prompt template and the pack JSON.
+
+    "inline" substitutes the placeholder wherever it sits. "prefix" keeps
+    every static instruction in one stable leading block and puts the
+    per-pack payload (with the line introducing it) last, so providers'
+    prompt caches can reuse the whole static prefix across articles.
+    """
+    head, found, tail = prompt.partition(PROMPT_PLACEHOLDER)
+    if layout == "inline" or not found or not tail.strip():
+        return prompt.replace(PROMPT_PLACEHOLDER, source_pack_json)
+    intro_start = head.rstrip("\n").rfind("\n") + 1
+    static, intro = head[:intro_start], head[intro_start:]
+    return static + tail.strip("\n") + "\n\n" + intro + source_pack_json + "\n"
+
+
+def prepare_request(sourcepack_path: str, layout: Optional[str] = None) -> Optional[Dict[str, Any]]:
+    """
+    Load and validate a Source Pack and build the chat request for it.
+    Returns None (after printing the reason) when the pack or prompt is unusable.
+    ``layout`` defaults to PRAEPARIUM_PROMPT_LAYOUT, else "prefix".
+    The pack is embedded compacted (see llm/compact.py) unless
+    PRAEPARIUM_PACK_FORMAT=full.
+    """
+    sp = _load_sourcepack(sourcepack_path)
+    if not sp or "sources" not in sp or "claims_checklist" not in sp:
+        print("[FAIL] Source Pack missing mandatory keys: 'sources', 'claims_checklist'")
+        return None
+
+    model_name = os.getenv("PRAEPARIUM_MODEL", "gpt-4o")
+
+    # --- Prompt template ---
+    PROMPT_V2 = _load_prompt()
+    if PROMPT_V2 is None:
+        return None
 
     # Build the user message by embedding the Source Pack JSON
-    source_pack_json = json.dumps(sp, ensure_ascii=False, indent=2)
-    user_msg = PROMPT_V2.replace("{source_pack_json}", source_pack_json)
+    layout = layout or os.getenv("PRAEPARIUM_PROMPT_LAYOUT", "prefix")
+    pack_format = os.getenv("PRAEPARIUM_PACK_FORMAT", "compact")
+    if pack_format == "full":
+        source_pack_json = json.dumps(sp, ensure_ascii=False, indent=2)
+        budget = None
+    else:
+        source_pack_json, report = compact_sourcepack(sp)
+        budget = report["budget"]
+        if report["trimmed"]:
+            print(f"[WARN] {sourcepack_path}: trimmed {', '.join(report['trimmed'])} to fit {budget} tokens")
+        if report["over_budget"]:
+            print(f"[WARN] {sourcepack_path}: ~{report['tokens']} tokens still over the {budget}-token budget")
+    user_msg = build_user_message(PROMPT_V2, source_pack_json, layout)
+
+    return {
+        "path": sourcepack_path,
+        "sp": sp,
+        "model": model_name,
+        "messages": [
+            {"role": "system", "content": SYSTEM_MSG},
+            {"role": "user", "content": user_msg},
+        ],
+        "layout": layout,
+        "key": cache_key(model_name,
+                         {**SAMPLING_PARAMS, "prompt_layout": layout,
+                          "pack_format": pack_format, "pack_budget": budget},
+                         SYSTEM_MSG, PROMPT_V2, sp),
+    }
 
-    system_msg = (
-        "You are Praeparium’s senior preparedness writer. "
-        "Follow the STRUCTURE exactly; cite quantitative claims inline. "
-        "Return only final Markdown, no commentary."
-    )
 
-    # --- Model call ---
-    try:
-        resp = client.chat.completions.create(
-            model=model_name,
-            temperature=0.25,
-            top_p=0.9,
-            frequency_penalty=0.1,
-            presence_penalty=0.0,
-            messages=[
-                {"role": "system", "content": system_msg},
-                {"role": "user", "content": user_msg},
-            ],
-        )
-    except Exception as e:
-        print(f"[FAIL] OpenAI call failed: {e}")
-        return False
+def record_usage(req: Dict[str, Any], usage: Optional[Dict[str, Any]], source: str,
+                 latency_s: Optional[float] = None) -> None:
+    """Append the article's token usage (prompt/cached/completion) to the run log."""
+    log_run({
+        "sourcepack": req["path"],
+        "slug": req["sp"].get("slug"),
+        "model": req["model"],
+        "layout": req["layout"],
+        "source": source,  # model | stream | cache
+        "latency_s": round(latency_s, 3) if latency_s is not None else None,
+        **usage_fields(usage),
+    })
+
 
-    text = resp.choices[0].message.content if resp and resp.choices else ""
+def response_ok(text: Optional[str]) -> bool:
     if not text or len(text.strip()) < 400:
         print("[FAIL] Model returned empty or too-short content.")
         return False
+    return True
 
-    # --- Post-process to satisfy QA & EEAT ---
-    text = _fix_encoding_glitches(text)
-    text = _inject_byline(text)
 
-    products = sp.get("products", [])
-    columns  = sp.get("comparison_columns", [])
-    text = _ensure_single_comparison_table(text, products, columns)
-    text = _ensure_sources_section(text, sp.get("sources", []))
-    text = _append_internal_links(text)
+def _out_slug(sp: Dict[str, Any], slug: Optional[str] = None) -> str:
+    return slug or sp.get("slug") or "best-water-storage-containers"
+
+
+def _stream_completion(backend: Backend, req: Dict[str, Any], partial_path: pathlib.Path) -> Optional[str]:
+    """
+    Stream the completion into ``partial_path`` chunk by chunk while running
+    the cheap structural checks. The request is cancelled on the first fatal
+    finding. Returns the full text, or None when aborted/failed.
+    """
+    checker = StreamChecker()
+    parts: List[str] = []
+    partial_path.parent.mkdir(parents=True, exist_ok=True)
+    try:
+        stream = backend.stream(req["model"], req["messages"], **SAMPLING_PARAMS)
+    except Exception as e:
+        print(f"[FAIL] {backend.name} call failed: {e}")
+        return None
+
+    aborted = None
+    try:
+        with open(partial_path, "w", encoding="utf-8") as f:
+            for delta in stream:
+                parts.append(delta)
+                f.write(delta)
+                f.flush()
+                aborted = checker.feed(delta)
+                if aborted:
+                    break
+            else:
+                aborted = checker.close()
+    except Exception as e:
+        aborted = f"stream interrupted: {e}"
+    finally:
+        # Closing the stream drops the HTTP connection, which stops generation upstream
+        stream.close()
+
+    if aborted:
+        partial_path.unlink(missing_ok=True)
+        print(f"[FAIL] Generation aborted after {sum(map(len, parts))} chars: {aborted}")
+        return None
+    return "".join(parts)
+
+
+def finish_article(text: str, sp: Dict[str, Any], out_dir: str, slug: Optional[str] = None,
+                   output: Optional[OutputWriter] = None) -> pathlib.Path:
+    """
+    Post-process raw model output and write it to ``out_dir``.
+
+    Goes through ``output`` when given (the caller commits it); otherwise
+    the file is written and committed on its own. Either way an article
+    identical to the one on disk is left untouched.
+    """
+    # --- Post-process to satisfy QA & EEAT ---
+    # Single-pass equivalent of the _fix_encoding_glitches → _inject_byline →
+    # _ensure_single_comparison_table → _ensure_sources_section →
+    # _append_internal_links chain above (byte-identical output).
+    text = postprocess_article(text, sp)
 
     # --- Write output ---
     os.makedirs(out_dir, exist_ok=True)
-    slug = slug or sp.get("slug") or "best-water-storage-containers"
+    slug = _out_slug(sp, slug)
     out_path = pathlib.Path(out_dir) / f"{slug}.md"
 
-    with open(out_path, "w", encoding="utf-8") as f:
-        f.write(text)
+    if output is None:
+        with OutputWriter() as one:
+            status = one.write_text(out_path, text)
+    else:
+        status = output.write_text(out_path, text)
+
+    print(f"[OK] {'Unchanged' if status == 'unchanged' else 'Wrote'} {out_path}")
+    return out_path
+
+
+def write_from_sourcepack(sourcepack_path: str, out_dir: str, slug: Optional[str] = None,
+                          cache: Optional[ResponseCache] = None, stream: bool = False,
+                          backend: Optional[Backend] = None, retries: int = 4,
+                          hedge: bool = False) -> bool:
+    """
+    Generate a publishable article from a structured Source Pack (JSON),
+    using writer_prompt_v2.txt for reasoning + structure, then enforce:
+      • Byline
+      • Encoding cleanup
+      • One comparison table (if none found) from products/comparison_columns
+      • A '## Sources' section (deduped) when missing
+      • At least one internal interlink
+
+    Responses are looked up in ``cache`` (a default on-disk ResponseCache
+    when None) before the model is called, so reruns with unchanged inputs
+    only redo the post-processing.
+
+    With ``stream=True`` the raw output is written to ``<slug>.md.partial``
+    as it arrives and the request is cancelled as soon as the incremental
+    checks (missing H1, filler phrasing) find a fatal problem.
+
+    ``backend`` defaults to ``get_backend()`` (PRAEPARIUM_BACKEND), so the
+    same path runs against OpenAI, any compatible HTTP endpoint or a fake.
+    Calls go through a ResilientBackend: up to ``retries`` attempts with
+    jittered backoff, a per-endpoint circuit breaker and, with ``hedge``,
+    a second request once the first outlives the observed p95 latency.
+    """
+    req = prepare_request(sourcepack_path)
+    if req is None:
+        return False
 
-    print(f"[OK] Wrote {out_path}")
+    # --- Cache lookup ---
+    if cache is None:
+        cache = ResponseCache()
+    text = cache.get(req["key"])
+    if text is not None:
+        print(f"[CACHE] Hit for {sourcepack_path}")
+        record_usage(req, None, "cache")
+    else:
+        backend = backend or get_backend()
+        if backend is None:
+            return False
+        wrapper = None
+        if not isinstance(backend, ResilientBackend):
+            backend = wrapper = ResilientBackend(backend, policy=RetryPolicy(max_attempts=retries), hedge=hedge)
+
+        try:
+            # --- Model call ---
+            partial_path = pathlib.Path(out_dir) / f"{_out_slug(req['sp'], slug)}.md.partial"
+            started = time.monotonic()
+            if stream:
+                text = _stream_completion(backend, req, partial_path)
+                if text is None:
+                    return False
+                usage = None
+            else:
+                try:
+                    resp = backend.complete(req["model"], req["messages"], **SAMPLING_PARAMS)
+                except Exception as e:
+                    print(f"[FAIL] {backend.name} call failed: {e}")
+                    return False
+                text, usage = resp.text, resp.usage
+            record_usage(req, usage, "stream" if stream else "model", time.monotonic() - started)
+
+            print(f"[TIMING] {backend.latency_summary()}")
+            if not response_ok(text):
+                partial_path.unlink(missing_ok=True)
+                return False
+            cache.put(req["key"], text, meta={"model": req["model"], "sourcepack": sourcepack_path})
+            partial_path.unlink(missing_ok=True)
+        finally:
+            # The wrapper lives for this call only; the backend it wraps may be shared (serve)
+            if wrapper is not None:
+                wrapper.shutdown()
+
+    finish_article(text, req["sp"], out_dir, slug)
     return True
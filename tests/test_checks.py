@@ -0,0 +1,16 @@
+from praeparium.qa.checks import StreamChecker
+
+
+def _stream(chunks):
+    checker = StreamChecker()
+    for chunk in chunks:
+        err = checker.feed(chunk)
+        if err:
+            return err
+    return checker.close()
+
+
+def test_filler_split_at_chunk_end_waits_for_next_chunk():
+    assert _stream(["# T\n\nIn conclusion", "s are drawn."]) is None
+    assert "In conclusion" in _stream(["# T\n\nIn conclusion", " we stop."])
+    assert "In conclusion" in _stream(["# T\n\nIn conclusion"])
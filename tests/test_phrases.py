@@ -0,0 +1,27 @@
+from praeparium.qa import checks, jargon
+from praeparium.qa.phrases import PhraseMatcher
+
+
+def test_longer_phrase_does_not_hide_shorter_list_hits():
+    m = PhraseMatcher({"filler": ["In conclusion"], "user:house": ["in conclusion we"]})
+    hits = m.find("In conclusion we agree.")
+    assert [(h.text, h.lists) for h in hits] == [("In conclusion", ("filler",)),
+                                                 ("In conclusion we", ("user:house",))]
+    assert m.find("In conclusion we agree.", ["filler"])[0].text == "In conclusion"
+
+
+def test_shorter_phrase_needs_a_word_boundary():
+    m = PhraseMatcher({"a": ["move the needle"], "b": ["move the needle forward"]})
+    assert [h.text for h in m.find("move the needles forward")] == []
+    assert [h.text for h in m.find("We move the needle, forward.")] == ["move the needle"]
+
+
+def test_user_list_overlap_keeps_builtin_checks(tmp_path, monkeypatch):
+    phrases = tmp_path / "house.txt"
+    phrases.write_text("move the needle forward\nin conclusion we\n", encoding="utf-8")
+    monkeypatch.setenv("PRAEPARIUM_PHRASE_LISTS", str(phrases))
+    md = "# T\n\nIn conclusion we try to move the needle forward.\n"
+    assert jargon.find_jargon(md) == ["move the needle"]
+    errors = checks.audit_text(md)
+    assert any("filler phrase" in e and "In conclusion" in e for e in errors)
+    assert any("from house list" in e for e in errors)
@@ -0,0 +1,20 @@
+import yaml
+
+from praeparium.sop3.render import render_bundle
+
+
+def _bundle(tmp_path, items):
+    path = tmp_path / "bundle.yaml"
+    path.write_text(yaml.safe_dump({"items": items}), encoding="utf-8")
+    return str(path)
+
+
+def test_item_fields_named_like_engine_parameters(tmp_path):
+    # "name" and "block" are also TemplateEngine.generate's parameters
+    items = [{"type": "faq", "slug": "widget-faq", "title": "Widget FAQ",
+              "name": "Widget", "block": 3,
+              "faqs": [{"q": "What is it?", "a": "A widget."}]}]
+    out = tmp_path / "out"
+    assert render_bundle(_bundle(tmp_path, items), str(out))
+    md = (out / "widget-faq.md").read_text(encoding="utf-8")
+    assert "### What is it?" in md